@@ -1,113 +1,558 @@
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import execute_values
 from smartlibrary_classes import User, Member, Librarian, Book, BookClub
+from smartlibrary_pool import ConnectionPool
+from smartlibrary_search import CatalogSearch
+from smartlibrary_cache import ReadThroughCache, CacheInvalidationListener
+from smartlibrary_statements import StatementRegistry, PreparingConnection
+from smartlibrary_metrics import Metrics, InstrumentedCursor, InstrumentedCursorMixin, InstrumentedDictCursor, timed
+from smartlibrary_auth import PasswordHasher, SessionCache
+from smartlibrary_trending import TrendingBooks, catch_up
+from smartlibrary_replica import CatalogReplica, ReplicaSync
+from contextlib import contextmanager
 import datetime
+import threading
+import time
+
+
+# UPDATE THESE CREDENTIALS IF NEEDED
+DB_CONFIG = {
+    "dbname": "smartlibrary_db",
+    "user": "postgres",
+    "password": "password",  # Change to your DB password
+    "host": "localhost",
+    "port": "5432"
+}
+
+MAX_ACTIVE_LOANS = 3  # mirrors the prevent_excess_loans trigger
+LOAN_DAYS = 7
+
+BOOK_COLUMNS = "id, title, genre, publication_year, available"
+
+# (name, sql, params) of the hot queries, PREPAREd per connection by StatementRegistry.
+# smartlibrary_service.py runs the same SQL through asyncpg.
+HOT_STATEMENTS = [
+    ("user_by_username", "SELECT * FROM Users WHERE username = %(username)s", [("username", "text")]),
+    ("books_all", f"SELECT {BOOK_COLUMNS} FROM Books ORDER BY title", []),
+    ("books_first_page", f"SELECT {BOOK_COLUMNS} FROM Books ORDER BY title, id LIMIT %(page_size)s",
+     [("page_size", "int")]),
+    ("books_next_page", f"""
+        SELECT {BOOK_COLUMNS} FROM Books
+        WHERE (title, id) > (%(title)s, %(id)s)
+        ORDER BY title, id LIMIT %(page_size)s
+    """, [("title", "text"), ("id", "int"), ("page_size", "int")]),
+    ("create_loan", """
+        INSERT INTO Loans (book_id, user_id, borrow_date, due_date)
+        VALUES (%(book_id)s, %(user_id)s, %(borrow_date)s, %(due_date)s) RETURNING id
+    """, [("book_id", "int"), ("user_id", "int"), ("borrow_date", "date"), ("due_date", "date")]),
+    ("return_loan", """
+        UPDATE Loans SET return_date = CURRENT_DATE
+        WHERE id = %(loan_id)s AND return_date IS NULL RETURNING book_id
+    """, [("loan_id", "int")]),
+]
+
+# Dashboard counters and top 5 books in one round trip
+DASHBOARD_SQL = """
+    SELECT s.total_books, s.members, s.active_loans,
+           COALESCE((
+               SELECT json_agg(t) FROM (
+                   SELECT b.title, c.loan_count as count
+                   FROM BookLoanCounts c JOIN Books b ON b.id = c.book_id
+                   ORDER BY c.loan_count DESC, c.book_id LIMIT 5
+               ) t
+           ), '[]'::json) as top_books
+    FROM (SELECT SUM(total_books)::bigint AS total_books, SUM(members)::bigint AS members,
+                 SUM(active_loans)::bigint AS active_loans
+          FROM LibraryStats) s
+"""
+
+# Compare-and-set, so concurrent first logins of one legacy account write a single hash
+UPGRADE_PASSWORD_SQL = "UPDATE Users SET password_hash = %s WHERE username = %s AND password_hash = %s"
+
+
+def _pg_message(error):
+    # Extract only the message part of the error for better user display
+    return (error.pgerror or str(error)).split('\n')[0].replace('ERROR:', '').strip()
 
 
 class SmartLibManagerDAO:
-    def __init__(self):
-        # UPDATE THESE CREDENTIALS IF NEEDED
-        self.db_config = {
-            "dbname": "smartlibrary_db",
-            "user": "postgres",
-            "password": "password",  # Change to your DB password
-            "host": "localhost",
-            "port": "5432"
-        }
-        self.conn = None
-        self.cursor = None
-        self.connect()
+    def __init__(self, minconn=1, maxconn=10, pool_timeout=30.0, dashboard_ttl=2.0, db_config=None,
+                 cache_size=512, cache_ttl=300.0, listen_for_changes=True, prepared_statements=True,
+                 metrics=None, hash_workers=None, session_ttl=900.0, recommend_index=None, replica=None,
+                 replica_sync_interval=30.0, connect=True):
+        self.db_config = dict(DB_CONFIG)
+        if db_config:
+            self.db_config.update(db_config)  # e.g. a scratch database for benchmarks
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.pool_timeout = pool_timeout
+        self.pool = None
+        self._connected = threading.Event()  # set once connect() has finished, successfully or not
+        self.cursor_factory = InstrumentedDictCursor  # any RealDictCursor subclass, e.g. to record queries
+        self.tuple_cursor_factory = InstrumentedCursor  # plain tuple rows for bulk model mapping
+
+        # Per-method and per-query latency, rows and bytes, plus the slow-query log
+        self.metrics = metrics or Metrics()
+
+        # Password checks run in worker processes; a login's session token skips them
+        self.hasher = PasswordHasher(hash_workers)
+        self.sessions = SessionCache(session_ttl)
+
+        # "Readers also borrowed", from the index smartlibrary_recommend.py builds;
+        # numpy and scipy are imported on the first recommendation, not at startup
+        self.recommend_index = recommend_index
+        self._recommender = None
+        self._recommender_loaded = False
+        self._recommender_lock = threading.Lock()
+
+        # Most borrowed books per day/week/month and genre, from sketches fed with new loans
+        self.trending = TrendingBooks()
+        self._trending_lock = threading.Lock()
+        self._trending_dirty = True
+        self._trending_expires = 0.0
+
+        # Dashboard snapshot cache: refreshes that land within dashboard_ttl seconds
+        # of each other share one round trip.
+        self.dashboard_ttl = dashboard_ttl
+        self._dashboard_lock = threading.Lock()
+        self._dashboard_cache = None
+        self._dashboard_expires = 0.0
+
+        # Hot queries are PREPAREd once per pooled connection
+        self.statements = StatementRegistry(enabled=prepared_statements)
+        self._register_statements()
+        self.search = CatalogSearch(lambda: self._cursor(tuples=True))
+
+        # Optional local SQLite copy of the catalog and clubs (a path or a CatalogReplica):
+        # catalog and club reads use it, so they keep working while the primary is unreachable
+        self.replica = CatalogReplica(replica) if isinstance(replica, str) else replica
+        self.replica_sync_interval = replica_sync_interval
+        self.replica_sync = None
+
+        # Read-through cache for books, users and clubs. Other app instances' writes
+        # arrive as NOTIFY events from the triggers in migrations/0002_cache_notify.sql.
+        self.cache = ReadThroughCache(cache_size, cache_ttl)
+        self.listen_for_changes = listen_for_changes
+        self.cache_listener = None
+        if connect:
+            self.connect()  # otherwise the caller runs connect() later, e.g. on a worker thread
 
     def connect(self):
         try:
-            # Added autocommit to False for transaction control
-            self.conn = psycopg2.connect(**self.db_config)
-            self.conn.autocommit = False
-            self.cursor = self.conn.cursor(cursor_factory=RealDictCursor)
+            # Each DAO call checks out its own connection, so concurrent callers
+            # never share a cursor or an aborted transaction.
+            self.pool = ConnectionPool(self.db_config, self.minconn, self.maxconn, timeout=self.pool_timeout,
+                                       connection_factory=PreparingConnection,
+                                       on_connect=self.statements.prepare_all)
         except Exception as e:
             print(f"Database connection failed: {e}")
+            return
+        finally:
+            self._connected.set()
+        if self.listen_for_changes:
+            self.cache_listener = CacheInvalidationListener(self.db_config, self.on_change_notification,
+                                                            self.clear_caches)
+            self.cache_listener.start()
+        if self.replica is not None:
+            self.replica_sync = ReplicaSync(self.replica, self, self.on_replica_synced, self.replica_sync_interval)
+            self.replica_sync.start()
+
+    def _register_statements(self):
+        for name, sql, params in HOT_STATEMENTS:
+            self.statements.register(name, sql, params)
+
+    def close(self):
+        if self.cache_listener:
+            self.cache_listener.stop()
+        if self.replica_sync:
+            self.replica_sync.stop()
+        if self.pool:
+            self.pool.closeall()
+        self.hasher.close()
+
+    # --- CACHE ---
+    def on_change_notification(self, payload):
+        # payload is 'books', 'loans', 'clubs' or 'users:<username>'
+        entity, _, name = payload.partition(":")
+        if entity == "users":
+            self.cache.invalidate("users", ("users", name))
+        elif entity in ("books", "loans"):
+            self.cache.invalidate("books")  # availability is part of every book row
+            self.invalidate_dashboard()
+        elif entity == "clubs":
+            self.cache.invalidate("clubs")
+        if self.replica_sync and entity in ("books", "loans", "clubs"):
+            self.replica_sync.request()
+
+    def clear_caches(self):
+        self.cache.clear()
+        self.invalidate_dashboard()
+        if self.replica_sync:
+            self.replica_sync.request()
+
+    def on_replica_synced(self, report):
+        # Entries loaded from the replica before this sync are stale now
+        for entity in report.entities:
+            self.cache.invalidate(entity)
+
+    def cache_stats(self):
+        stats = self.cache.stats()
+        if self.cache_listener:
+            stats["notifications"] = self.cache_listener.notifications
+            stats["listener_reconnects"] = self.cache_listener.reconnects
+        return stats
+
+    def pool_metrics(self):
+        return self.pool.metrics() if self.pool else {}
+
+    def metrics_text(self):
+        # Prometheus text exposition: query/method histograms plus pool, cache and statement gauges
+        gauges = {}
+        for prefix, stats in (("pool", self.pool_metrics()), ("cache", self.cache_stats()),
+                              ("statements", self.statements.stats()), ("auth", self.hasher.stats()),
+                              ("sessions", self.sessions.stats()), ("trending", self.trending.stats()),
+                              ("replica", self.replica.stats() if self.replica else {})):
+            for name, value in stats.items():
+                if isinstance(value, (int, float)):
+                    gauges[f"{prefix}_{name}"] = value
+        return self.metrics.to_prometheus(gauges)
+
+    def _wait_for_pool(self):
+        # Calls made while a background connect() is still running wait for it
+        if self.pool is None:
+            self._connected.wait(self.pool_timeout)
+        if self.pool is None:
+            raise ValueError("Not connected to the database.")
+
+    @contextmanager
+    def _cursor(self, commit=False, tuples=False):
+        # tuples=True yields plain tuple rows: no dict per row, mapped with Model(*row)
+        self._wait_for_pool()
+        with self.pool.connection() as conn:
+            cursor = conn.cursor(cursor_factory=self.tuple_cursor_factory if tuples else self.cursor_factory)
+            if isinstance(cursor, InstrumentedCursorMixin):
+                cursor.metrics = self.metrics
+            try:
+                yield cursor
+                if commit:
+                    conn.commit()
+            except Exception:
+                if not conn.closed:
+                    conn.rollback()
+                raise
+            finally:
+                cursor.close()
 
     # --- USER CRUD ---
+    def _get_user_row(self, username):
+        with self._cursor() as cursor:
+            self.statements.execute(cursor, "user_by_username", {"username": username})
+            return cursor.fetchone()
+
+    @staticmethod
+    def _user_from_row(row):
+        if row['role_id'] == 1:
+            return Librarian(**row)
+        return Member(**row)
+
+    def _check_credentials(self, username, password):
+        # Returns the user row, or None. Plaintext and outdated hashes are replaced on success.
+        row = self.cache.get_or_load(("users", username), lambda: self._get_user_row(username))
+        if not row:
+            return None
+        ok, new_hash = self.hasher.check(password, row['password_hash'])
+        if not ok:
+            return None
+        if new_hash:
+            with self._cursor(commit=True) as cursor:
+                cursor.execute(UPGRADE_PASSWORD_SQL, (new_hash, username, row['password_hash']))
+                upgraded = cursor.rowcount == 1
+            self.cache.invalidate("users", ("users", username))
+            # A concurrent login that got there first wrote its own hash; sessions must carry that one
+            row = dict(row, password_hash=new_hash) if upgraded else (self._get_user_row(username) or row)
+        return row
+
+    @timed
     def authenticate_user(self, username, password):
-        query = "SELECT * FROM Users WHERE username = %s AND password_hash = %s"
-        self.cursor.execute(query, (username, password))
-        result = self.cursor.fetchone()
-        if result:
-            if result['role_id'] == 1:
-                return Librarian(**result)
-            return Member(**result)
-        return None
+        row = self._check_credentials(username, password)
+        return self._user_from_row(row) if row else None
+
+    @timed
+    def login(self, username, password):
+        # Returns (user, session_token), or (None, None) for bad credentials
+        row = self._check_credentials(username, password)
+        if not row:
+            return None, None
+        return self._user_from_row(row), self.sessions.issue(row)
+
+    @timed
+    def resume_session(self, token):
+        # The user a login token belongs to, without rehashing; None once it has
+        # expired, was logged out, or the account's password has changed since.
+        row = self.sessions.get(token)
+        if row is None:
+            return None
+        current = self.cache.get_or_load(("users", row['username']), lambda: self._get_user_row(row['username']))
+        if not current or current['password_hash'] != row['password_hash']:
+            self.sessions.revoke(token)
+            return None
+        return self._user_from_row(current)
+
+    def logout(self, token):
+        self.sessions.revoke(token)
 
     # --- BOOK CRUD ---
+    @timed
     def create_book(self, title, genre, year):
         query = "INSERT INTO Books (title, genre, publication_year) VALUES (%s, %s, %s) RETURNING id"
-        self.cursor.execute(query, (title, genre, year))
-        book_id = self.cursor.fetchone()['id']
-        self.conn.commit()
+        with self._cursor(commit=True) as cursor:
+            cursor.execute(query, (title, genre, year))
+            book_id = cursor.fetchone()['id']
+        self.cache.invalidate("books")
+        self.invalidate_dashboard()
         return book_id
 
+    @timed
     def get_all_books(self, search_query=""):
-        if search_query:
-            query = "SELECT * FROM Books WHERE title ILIKE %s ORDER BY title"
-            self.cursor.execute(query, (f"%{search_query}%",))
+        search_query = CatalogSearch.normalize(search_query)
+        return list(self.cache.get_or_load(("books", "list", search_query),
+                                           lambda: self._load_books(search_query)))
+
+    def _load_books(self, search_query):
+        # A search returns relevance-ranked matches on title, authors and genre
+        if self.replica is not None:
+            rows = self.replica.search(search_query, self.search.limit) if search_query else self.replica.all_books()
+        elif search_query:
+            rows = self.search.search(search_query)
         else:
-            query = "SELECT * FROM Books ORDER BY title"
-            self.cursor.execute(query)
+            with self._cursor(tuples=True) as cursor:
+                self.statements.execute(cursor, "books_all")
+                rows = cursor.fetchall()
+
+        # Tuple rows in Book's argument order: no intermediate dict per row
+        return [Book(*row) for row in rows]
+
+    @timed
+    def iter_books(self, search_query="", page_size=200):
+        # Yields lists of Book. Browsing pages by keyset on (title, id), so every page
+        # costs one short index range scan and no connection is held between pages.
+        if search_query:
+            yield self.get_all_books(search_query)  # ranked search is already bounded
+            return
+
+        def load_page(last):
+            if self.replica is not None:
+                return [Book(*row) for row in self.replica.books_page(last, page_size)]
+            with self._cursor(tuples=True) as cursor:
+                if last is None:
+                    self.statements.execute(cursor, "books_first_page", {"page_size": page_size})
+                else:
+                    self.statements.execute(cursor, "books_next_page",
+                                            {"title": last[0], "id": last[1], "page_size": page_size})
+                return [Book(*row) for row in cursor.fetchall()]
+
+        last = None
+        while True:
+            page = self.cache.get_or_load(("books", "page", last, page_size), lambda: load_page(last))
+            if not page:
+                return
+            yield list(page)
+            if len(page) < page_size:
+                return
+            last = (page[-1].title, page[-1].id)
+
+    # --- RECOMMENDATIONS ---
+    @property
+    def recommender(self):
+        with self._recommender_lock:
+            if not self._recommender_loaded:
+                self._recommender_loaded = True
+                try:
+                    from smartlibrary_recommend import Recommender
+                except ImportError:  # numpy/scipy are optional; without them there are no recommendations
+                    return None
+                self._recommender = Recommender(self.recommend_index) if self.recommend_index else Recommender()
+            return self._recommender
+
+    @timed
+    def get_also_borrowed(self, book_id, k=5):
+        # Books most often borrowed by patrons who borrowed book_id, best first
+        if self.recommender is None:
+            return []
+        return self._books_by_ids([b for b, _ in self.recommender.also_borrowed(book_id, k)])
 
-        books = []
-        for row in self.cursor.fetchall():
-            books.append(Book(**row))
-        return books
+    @timed
+    def get_recommendations(self, user_id, k=5):
+        # Suggestions for a patron from everything they've borrowed, best first
+        if self.recommender is None:
+            return []
+        return self._books_by_ids([b for b, _ in self.recommender.for_user(user_id, k)])
+
+    def _books_by_ids(self, ids):
+        if not ids:
+            return []
+
+        def load():
+            if self.replica is not None:
+                return {row[0]: Book(*row) for row in self.replica.books_by_ids(ids)}
+            with self._cursor(tuples=True) as cursor:
+                cursor.execute(f"SELECT {BOOK_COLUMNS} FROM Books WHERE id = ANY(%s)", (ids,))
+                return {row[0]: Book(*row) for row in cursor.fetchall()}
+
+        books = self.cache.get_or_load(("books", "ids", tuple(ids)), load)
+        return [books[i] for i in ids if i in books]  # in the given order; deleted books drop out
 
     # --- LOAN SYSTEM ---
+    @timed
     def create_loan(self, book_id, user_id):
         # The SQL Trigger handles the 'Max 3 Loans' and 'Availability' logic
         try:
             borrow_date = datetime.date.today()
-            due_date = borrow_date + datetime.timedelta(days=7)
-
-            query = """
-                INSERT INTO Loans (book_id, user_id, borrow_date, due_date) 
-                VALUES (%s, %s, %s, %s) RETURNING id
-            """
-            self.cursor.execute(query, (book_id, user_id, borrow_date, due_date))
-            loan_id = self.cursor.fetchone()['id']  # Ensure fetchone is before commit
-            self.conn.commit()
+            due_date = borrow_date + datetime.timedelta(days=LOAN_DAYS)
+
+            with self._cursor(commit=True) as cursor:
+                self.statements.execute(cursor, "create_loan", {
+                    "book_id": book_id, "user_id": user_id, "borrow_date": borrow_date, "due_date": due_date})
+                loan_id = cursor.fetchone()['id']  # Ensure fetchone is before commit
+            self.cache.invalidate("books")
+            self.invalidate_dashboard()
             return loan_id
         except psycopg2.Error as e:
-            self.conn.rollback()
-            # Extract only the message part of the error for better user display
-            raise ValueError(e.pgerror.split('\n')[0].replace('ERROR:', '').strip())
+            # The pooled cursor has already rolled back its own connection.
+            raise ValueError(_pg_message(e))
 
+    @timed
     def return_loan(self, loan_id):
-        try:
-            # The Trigger handles making the book available again
-            query = "UPDATE Loans SET return_date = CURRENT_DATE WHERE id = %s RETURNING book_id"
-            self.cursor.execute(query, (loan_id,))
-            if self.cursor.rowcount == 0:
+        # The Trigger handles making the book available again
+        with self._cursor(commit=True) as cursor:
+            self.statements.execute(cursor, "return_loan", {"loan_id": loan_id})
+            if cursor.rowcount == 0:
                 raise ValueError("No active loan found for this ID.")
-            self.conn.commit()
-        except Exception as e:
-            self.conn.rollback()
-            raise e
+        self.cache.invalidate("books")
+        self.invalidate_dashboard()
+
+    @timed
+    def create_loans(self, pairs):
+        # Borrows many (book_id, user_id) pairs in one transaction and one INSERT.
+        # Returns one {'book_id', 'user_id', 'loan_id', 'error'} dict per pair, in order;
+        # loan_id is None and error is set for every pair that was rejected.
+        pairs = [(int(book_id), int(user_id)) for book_id, user_id in pairs]
+        results = [{"book_id": b, "user_id": u, "loan_id": None, "error": None} for b, u in pairs]
+        if not pairs:
+            return results
+
+        borrow_date = datetime.date.today()
+        due_date = borrow_date + datetime.timedelta(days=LOAN_DAYS)
+        user_ids = sorted({u for _, u in pairs})
+        book_ids = sorted({b for b, _ in pairs})
+        try:
+            with self._cursor(commit=True) as cursor:
+                # Lock the borrowers so a concurrent batch can't slip past the same limit check
+                # (NO KEY UPDATE, the same lock the loan triggers take, so Loans' foreign keys aren't blocked)
+                cursor.execute("SELECT id FROM Users WHERE id = ANY(%s) ORDER BY id FOR NO KEY UPDATE", (user_ids,))
+                known_users = {row['id'] for row in cursor.fetchall()}
+                # and the books, so a concurrent borrow of the same copy waits for this one
+                cursor.execute("SELECT id, available FROM Books WHERE id = ANY(%s) ORDER BY id FOR NO KEY UPDATE",
+                               (book_ids,))
+                available = {row['id']: row['available'] for row in cursor.fetchall()}
+                cursor.execute("""
+                    SELECT user_id, COUNT(*) as active FROM Loans
+                    WHERE return_date IS NULL AND user_id = ANY(%s)
+                    GROUP BY user_id
+                """, (user_ids,))
+                active = {row['user_id']: row['active'] for row in cursor.fetchall()}
+
+                accepted, taken = [], set()
+                for i, (book_id, user_id) in enumerate(pairs):
+                    if user_id not in known_users:
+                        results[i]["error"] = "Unknown user ID."
+                    elif book_id not in available:
+                        results[i]["error"] = "Unknown book ID."
+                    elif book_id in taken:
+                        results[i]["error"] = "Duplicate book ID."
+                    elif not available[book_id]:
+                        results[i]["error"] = "Book is not available."
+                    elif active.get(user_id, 0) >= MAX_ACTIVE_LOANS:
+                        results[i]["error"] = f"User has reached the maximum limit of {MAX_ACTIVE_LOANS} active loans."
+                    else:
+                        active[user_id] = active.get(user_id, 0) + 1
+                        taken.add(book_id)
+                        accepted.append(i)
+
+                if accepted:
+                    # One statement, so the statement-level triggers run once for the whole batch
+                    rows = execute_values(
+                        cursor,
+                        "INSERT INTO Loans (book_id, user_id, borrow_date, due_date) VALUES %s RETURNING id",
+                        [(pairs[i][0], pairs[i][1], borrow_date, due_date) for i in accepted],
+                        page_size=len(accepted), fetch=True)
+                    for i, row in zip(accepted, rows):
+                        results[i]["loan_id"] = row['id']
+        except psycopg2.Error as e:
+            message = _pg_message(e)
+            for result in results:
+                if result["error"] is None:
+                    result["loan_id"] = None
+                    result["error"] = message
+        self.cache.invalidate("books")
+        self.invalidate_dashboard()
+        return results
+
+    @timed
+    def return_loans(self, loan_ids):
+        # Returns many loans in one transaction and one UPDATE.
+        # Returns one {'loan_id', 'error'} dict per ID, in order (error is None on success).
+        loan_ids = [int(loan_id) for loan_id in loan_ids]
+        if not loan_ids:
+            return []
+        unique_ids = list(dict.fromkeys(loan_ids))
+        try:
+            with self._cursor(commit=True) as cursor:
+                rows = execute_values(cursor, """
+                    UPDATE Loans SET return_date = CURRENT_DATE
+                    FROM (VALUES %s) AS v(id)
+                    WHERE Loans.id = v.id AND Loans.return_date IS NULL
+                    RETURNING Loans.id
+                """, [(loan_id,) for loan_id in unique_ids], page_size=len(unique_ids), fetch=True)
+            returned = {row['id'] for row in rows}
+            failure = "No active loan found for this ID."
+        except psycopg2.Error as e:
+            returned = set()
+            failure = _pg_message(e)
+
+        results, seen = [], set()
+        for loan_id in loan_ids:
+            if loan_id in seen:
+                error = "Duplicate loan ID."
+            else:
+                error = None if loan_id in returned else failure
+            seen.add(loan_id)
+            results.append({"loan_id": loan_id, "error": error})
+        self.cache.invalidate("books")
+        self.invalidate_dashboard()
+        return results
 
     # --- CLUBS ---
+    @timed
     def create_book_club(self, name, description, created_by):
         query = "INSERT INTO BookClubs (name, description, created_by) VALUES (%s, %s, %s) RETURNING id"
-        self.cursor.execute(query, (name, description, created_by))
-        club_id = self.cursor.fetchone()['id']
-        self.conn.commit()
+        with self._cursor(commit=True) as cursor:
+            cursor.execute(query, (name, description, created_by))
+            club_id = cursor.fetchone()['id']
+        self.cache.invalidate("clubs")
         return club_id
 
+    @timed
     def join_club(self, club_id, user_id):
         try:
             query = "INSERT INTO ClubMemberships (club_id, user_id) VALUES (%s, %s)"
-            self.cursor.execute(query, (club_id, user_id))
-            self.conn.commit()
+            with self._cursor(commit=True) as cursor:
+                cursor.execute(query, (club_id, user_id))
         except psycopg2.Error:
-            self.conn.rollback()
             raise ValueError("Could not join club (Already a member or invalid ID).")
+        self.cache.invalidate("clubs")
 
+    @timed
     def get_clubs_summary(self):
         query = """
             SELECT bc.id, bc.name, bc.description, COUNT(cm.user_id) as members
@@ -116,21 +561,72 @@ class SmartLibManagerDAO:
             GROUP BY bc.id, bc.name, bc.description
             ORDER BY bc.id
         """
-        self.cursor.execute(query)
-        return self.cursor.fetchall()
+
+        def load():
+            if self.replica is not None:
+                return self.replica.clubs_summary()
+            with self._cursor() as cursor:
+                cursor.execute(query)
+                return cursor.fetchall()
+
+        return list(self.cache.get_or_load(("clubs", "summary"), load))
 
     # --- STATS ---
+    @timed
     def get_count(self, query):
-        self.cursor.execute(query)
-        result = self.cursor.fetchone()
+        with self._cursor() as cursor:
+            cursor.execute(query)
+            result = cursor.fetchone()
         return result['count'] if result and 'count' in result else 0
 
+    @timed
     def get_top_books(self):
+        # BookLoanCounts is maintained by the loan triggers, so this is an index scan
         query = """
-            SELECT b.title, COUNT(l.id) as count
-            FROM Books b LEFT JOIN Loans l ON b.id = l.book_id
-            GROUP BY b.id, b.title
-            ORDER BY count DESC LIMIT 5
+            SELECT b.title, c.loan_count as count
+            FROM BookLoanCounts c JOIN Books b ON b.id = c.book_id
+            ORDER BY c.loan_count DESC, c.book_id LIMIT 5
         """
-        self.cursor.execute(query)
-        return self.cursor.fetchall()
\ No newline at end of file
+        with self._cursor() as cursor:
+            cursor.execute(query)
+            return cursor.fetchall()
+
+    @timed
+    def get_dashboard_snapshot(self):
+        # Returns {'total_books', 'members', 'active_loans', 'top_books'} in one round trip
+        with self._dashboard_lock:
+            if self._dashboard_cache is not None and time.monotonic() < self._dashboard_expires:
+                return self._dashboard_cache
+
+            with self._cursor() as cursor:
+                cursor.execute(DASHBOARD_SQL)
+                row = cursor.fetchone()
+
+            snapshot = dict(row) if row else {"total_books": 0, "members": 0, "active_loans": 0, "top_books": []}
+            self._dashboard_cache = snapshot
+            self._dashboard_expires = time.monotonic() + self.dashboard_ttl
+            return snapshot
+
+    def invalidate_dashboard(self):
+        with self._dashboard_lock:
+            self._dashboard_cache = None
+        self._trending_dirty = True  # loans changed: the next trending query catches up
+
+    @timed
+    def get_trending_books(self, window="week", k=5, genre=None):
+        # ([(Book, estimated loans)] most borrowed in 'day', 'week' or 'month', optionally in one genre,
+        #  [every genre seen so far]) - the genres come along so the GUI never takes the sketch lock
+        self.sync_trending()
+        ranked = self.trending.top(window, k, genre)
+        books = {book.id: book for book in self._books_by_ids([book_id for book_id, _ in ranked])}
+        return [(books[book_id], count) for book_id, count in ranked if book_id in books], self.trending.genres()
+
+    def sync_trending(self):
+        # The first call reads the last month of loans; later ones only loans made since,
+        # when a write or NOTIFY marked them stale or dashboard_ttl has passed
+        with self._trending_lock:
+            if self._trending_dirty or time.monotonic() >= self._trending_expires:
+                self._wait_for_pool()
+                self._trending_dirty = False
+                catch_up(self, self.trending)
+                self._trending_expires = time.monotonic() + self.dashboard_ttl
\ No newline at end of file
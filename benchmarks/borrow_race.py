@@ -0,0 +1,111 @@
+"""Two connections borrowing at once: the loan triggers must serialize, not deadlock.
+
+Each round opens two transactions that both already hold the KEY SHARE lock a
+Loans foreign-key check takes on the book (and on the borrower), then has both
+INSERT a loan at the same moment:
+
+    same book   exactly one borrow succeeds and the other gets "not available"
+    same user   two different books for one member; both succeed
+
+Exits non-zero on any other outcome (a deadlock in particular). Run against a
+scratch database loaded from smart_library.sql:
+
+    python benchmarks/borrow_race.py --dbname smartlibrary_bench --rounds 20
+"""
+import argparse
+import datetime
+import os
+import sys
+import threading
+
+import psycopg2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from SmartLibManager_dao import DB_CONFIG, LOAN_DAYS  # noqa: E402
+
+TIMEOUT = 30.0
+
+
+def borrow(conn, book_id, user_id, start, outcomes):
+    start.wait()
+    today = datetime.date.today()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("INSERT INTO Loans (book_id, user_id, borrow_date, due_date) VALUES (%s, %s, %s, %s)",
+                           (book_id, user_id, today, today + datetime.timedelta(days=LOAN_DAYS)))
+        conn.commit()
+        outcomes.append("ok")
+    except psycopg2.Error as e:
+        conn.rollback()
+        message = (e.diag.message_primary or str(e)).lower()
+        outcomes.append("not available" if "not available" in message
+                        else "deadlock" if "deadlock" in message else f"error: {message}")
+
+
+def race(conns, pairs):
+    # Both sides take the foreign-key checks' KEY SHARE locks first, then insert together
+    for conn, (book_id, user_id) in zip(conns, pairs):
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM Books WHERE id = %s FOR KEY SHARE", (book_id,))
+            cursor.execute("SELECT 1 FROM Users WHERE id = %s FOR KEY SHARE", (user_id,))
+    start, outcomes = threading.Barrier(len(conns)), []
+    threads = [threading.Thread(target=borrow, args=(conn, book_id, user_id, start, outcomes))
+               for conn, (book_id, user_id) in zip(conns, pairs)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(TIMEOUT)
+    if any(thread.is_alive() for thread in threads):
+        raise SystemExit(f"borrows still blocked after {TIMEOUT:g}s")
+    return sorted(outcomes)
+
+
+def return_all(conn, book_ids):
+    with conn.cursor() as cursor:
+        cursor.execute("UPDATE Loans SET return_date = CURRENT_DATE WHERE book_id = ANY(%s) AND return_date IS NULL",
+                       (book_ids,))
+    conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dbname", default="smartlibrary_bench")
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    conns = [psycopg2.connect(**dict(DB_CONFIG, dbname=args.dbname)) for _ in range(2)]
+    with conns[0].cursor() as cursor:
+        cursor.execute("SELECT id FROM Books WHERE available ORDER BY id LIMIT 2")
+        books = [row[0] for row in cursor.fetchall()]
+        cursor.execute("""
+            SELECT id FROM Users u WHERE role_id = 2
+              AND NOT EXISTS (SELECT 1 FROM Loans l WHERE l.user_id = u.id AND l.return_date IS NULL)
+            ORDER BY id LIMIT 2
+        """)
+        members = [row[0] for row in cursor.fetchall()]
+    conns[0].commit()
+    if len(books) < 2 or len(members) < 2:
+        raise SystemExit("need two available books and two members without active loans")
+
+    expected = {"same book": ["not available", "ok"], "same user": ["ok", "ok"]}
+    cases = {"same book": [(books[0], members[0]), (books[0], members[1])],
+             "same user": [(books[0], members[0]), (books[1], members[0])]}
+    failures = 0
+    for name, pairs in cases.items():
+        seen = {}
+        for _ in range(args.rounds):
+            outcomes = race(conns, pairs)
+            return_all(conns[0], books)
+            seen[tuple(outcomes)] = seen.get(tuple(outcomes), 0) + 1
+        ok = list(seen) == [tuple(expected[name])]
+        failures += not ok
+        print(f"{'ok' if ok else 'FAIL':4} {name:<10} {args.rounds} rounds: "
+              + ", ".join(f"{' + '.join(k)} x{n}" for k, n in seen.items()))
+    for conn in conns:
+        conn.close()
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""Measure bulk import throughput (rows/s) for a synthetic CSV collection.
+
+Load smart_library.sql into a scratch database first (the script adds rows):
+
+    python benchmarks/import_throughput.py --dbname smartlibrary_bench --rows 200000
+"""
+import argparse
+import csv
+import os
+import random
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from SmartLibManager_dao import SmartLibManagerDAO  # noqa: E402
+from smartlibrary_import import BookImporter  # noqa: E402
+
+WORDS = ("shadow river empire garden silent winter code machine dragon ocean night city "
+         "stone glass storm memory crown forest signal atlas harbor ember mirror engine").split()
+GENRES = ["Technology", "Sci-Fi", "Fantasy", "Mystery", "Biography", "Self-Help", "History", "Poetry"]
+
+
+def write_collection(path, rows, seed=1):
+    rng = random.Random(seed)
+    authors = [f"Author {i}" for i in range(2000)]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["title", "genre", "publication_year", "authors"])
+        for i in range(rows):
+            title = " ".join(rng.choice(WORDS).capitalize() for _ in range(rng.randint(2, 5)))
+            year = rng.randint(1900, 2024) if rng.random() > 0.01 else "unknown"  # ~1% bad rows
+            writer.writerow([f"{title} {i}", rng.choice(GENRES), year,
+                             "|".join(rng.sample(authors, rng.randint(1, 2)))])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dbname", default="smartlibrary_bench")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "collection.csv")
+        write_collection(path, args.rows)
+
+        dao = SmartLibManagerDAO(db_config={"dbname": args.dbname})
+        importer = BookImporter(dao, args.batch_size, progress=lambda r: print(f"\r{r}", end="", flush=True))
+        report = importer.import_file(path)
+        print(f"\r{report}")
+        dao.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Drive hundreds of parallel create_loan/return_loan calls through one pooled DAO.
+
+Run against a local database loaded from smart_library.sql:
+
+    python benchmarks/loan_concurrency.py --workers 32 --cycles 400
+
+Loan-limit and "not available" refusals are counted per kind; any other
+database error (a deadlock, say) is printed and fails the run.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from SmartLibManager_dao import SmartLibManagerDAO  # noqa: E402
+
+# The only refusals a borrow may meet (matched on the message, like patron_workload.classify)
+REJECTIONS = {"loan_limit": "maximum limit", "unavailable": "not available"}
+
+
+def borrow_and_return(dao, book_ids, member_ids):
+    try:
+        loan_id = dao.create_loan(random.choice(book_ids), random.choice(member_ids))
+    except ValueError as e:
+        for outcome, phrase in REJECTIONS.items():
+            if phrase in str(e).lower():
+                return outcome
+        raise  # a deadlock, serialization failure or lost connection is an error, not a rejection
+    dao.return_loan(loan_id)
+    return "ok"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--cycles", type=int, default=400)
+    parser.add_argument("--maxconn", type=int, default=10)
+    args = parser.parse_args()
+
+    dao = SmartLibManagerDAO(minconn=2, maxconn=args.maxconn)
+    book_ids = [b.id for b in dao.get_all_books()]
+    with dao._cursor() as cursor:
+        cursor.execute("SELECT id FROM Users WHERE role_id = 2")
+        member_ids = [row['id'] for row in cursor.fetchall()]
+
+    started = time.perf_counter()
+    outcomes = dict.fromkeys(["ok", *REJECTIONS, "error"], 0)
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = [executor.submit(borrow_and_return, dao, book_ids, member_ids) for _ in range(args.cycles)]
+        for future in futures:
+            try:
+                outcomes[future.result()] += 1
+            except Exception as e:
+                outcomes["error"] += 1
+                print(f"error: {e}")
+    elapsed = time.perf_counter() - started
+
+    with dao._cursor() as cursor:
+        cursor.execute("""
+            SELECT user_id, COUNT(*) AS active FROM Loans
+            WHERE return_date IS NULL GROUP BY user_id HAVING COUNT(*) > 3
+        """)
+        over_limit = cursor.fetchall()
+
+    metrics = dao.pool_metrics()
+    print(f"{args.cycles} cycles on {args.workers} threads in {elapsed:.2f}s "
+          f"({args.cycles / elapsed:.0f} cycles/s)")
+    print(f"outcomes: {outcomes}")
+    print(f"pool: {metrics}")
+    if over_limit:
+        print(f"users over the 3-loan limit: {[dict(r) for r in over_limit]}")
+    dao.close()
+
+    failed = outcomes["error"] or metrics["in_use"] or over_limit
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
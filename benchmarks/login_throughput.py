@@ -0,0 +1,115 @@
+"""Measure logins per second under concurrency with hashed passwords.
+
+Recreates the scratch database (unless --skip-load), seeds patrons with the
+legacy plaintext password 'pass123', then runs three phases on --threads
+threads through one DAO:
+
+    first     every patron's first login: verify plaintext, hash, store the hash
+    password  repeat logins by password against the stored hashes
+    session   repeat checks with the session token from the first login (no hashing)
+
+    python benchmarks/login_throughput.py --users 2000 --threads 32
+    python benchmarks/login_throughput.py --skip-load --hash-workers 0   # hash on the calling threads instead
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from SmartLibManager_dao import DB_CONFIG, SmartLibManagerDAO  # noqa: E402
+from smartlibrary_auth import SCHEME, hash_scheme  # noqa: E402
+from smartlibrary_migrate import migrate  # noqa: E402
+from seeding import load_schema, seed  # noqa: E402
+
+PASSWORD = "pass123"
+
+
+def run_phase(name, fn, args_list, threads):
+    def timed_call(args):
+        started = time.perf_counter()
+        ok = fn(*args)
+        return ok, time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(timed_call, args_list))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(seconds * 1000 for _, seconds in results)
+    failures = sum(1 for ok, _ in results if not ok)
+    q = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    print(f"{name:<9} {len(results):>6} checks in {elapsed:6.2f}s  {len(results) / elapsed:9.0f}/s  "
+          f"p50 {q[49]:7.2f} ms  p95 {q[94]:7.2f} ms  p99 {q[98]:7.2f} ms  failed {failures}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dbname", default="smartlibrary_bench")
+    parser.add_argument("--skip-load", action="store_true", help="reuse the database instead of recreating it")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--logins", type=int, default=4000, help="checks in the password and session phases")
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--hash-workers", type=int, help="hashing processes (default: one per core, 0 = inline)")
+    parser.add_argument("--maxconn", type=int, default=10)
+    args = parser.parse_args()
+
+    db_config = {"dbname": args.dbname}
+    if not args.skip_load:
+        load_schema(dict(DB_CONFIG, **db_config))
+    dao = SmartLibManagerDAO(minconn=2, maxconn=args.maxconn, db_config=db_config, hash_workers=args.hash_workers)
+    migrate(dao, log=lambda message: None)
+    seed(dao, 100, args.users, 0)
+    dao.hasher.start()
+
+    with dao._cursor() as cursor:
+        cursor.execute("SELECT username, password_hash FROM Users WHERE username LIKE 'patron\\_%'")
+        rows = cursor.fetchall()
+    legacy = [row['username'] for row in rows if hash_scheme(row['password_hash']) is None]
+    hashed = [row['username'] for row in rows if hash_scheme(row['password_hash']) is not None]
+    print(f"{len(rows)} patrons ({len(legacy)} plaintext), scheme {SCHEME}, "
+          f"{dao.hasher.workers} hashing process(es), {args.threads} threads")
+
+    tokens = []
+
+    def first_login(username):
+        user, token = dao.login(username, PASSWORD)
+        if token:
+            tokens.append(token)
+        return user is not None
+
+    def password_login(username):
+        return dao.authenticate_user(username, PASSWORD) is not None
+
+    def session_check(token):
+        return dao.resume_session(token) is not None
+
+    rng = random.Random(42)
+    failures = 0
+    if legacy:
+        failures += run_phase("first", first_login, [(u,) for u in legacy], args.threads)
+    else:
+        failures += run_phase("first", first_login, [(u,) for u in hashed[:args.threads * 4]], args.threads)
+    usernames = legacy + hashed
+    failures += run_phase("password", password_login,
+                          [(rng.choice(usernames),) for _ in range(args.logins)], args.threads)
+    failures += run_phase("session", session_check, [(rng.choice(tokens),) for _ in range(args.logins)],
+                          args.threads)
+
+    with dao._cursor() as cursor:
+        cursor.execute("SELECT password_hash FROM Users WHERE username LIKE 'patron\\_%'")
+        still_plain = sum(1 for row in cursor.fetchall() if hash_scheme(row['password_hash']) is None)
+    print(f"auth: {dao.hasher.stats()}")
+    print(f"sessions: {dao.sessions.stats()}")
+    print(f"patrons still plaintext: {still_plain}")
+    dao.close()
+    sys.exit(1 if failures or still_plain else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Materialize 1M books from dict rows (old path) and tuple rows (new path).
+
+Old path: RealDictCursor-style dict per row, then Book(**row) into a class with
+a per-instance __dict__. New path: tuple per row, then Book(*row) into the
+slotted Book. Runs without a database. Each path builds its rows (a dict or a
+tuple per row, the way its cursor returns them) inside its own measurement, from
+the same shared column values.
+
+    python benchmarks/model_materialize.py --rows 1000000
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from smartlibrary_classes import Book  # noqa: E402
+
+COLUMNS = ("id", "title", "genre", "publication_year", "available")
+
+
+class DictBook:
+    # The pre-__slots__ Book, kept here for comparison
+    def __init__(self, id, title, genre, publication_year, available=True):
+        self._id = id
+        self._title = title
+        self._genre = genre
+        self._publication_year = publication_year
+        self._available = available
+
+    @property
+    def title(self): return self._title
+
+
+def row_values(n):
+    genres = ["Technology", "Sci-Fi", "Fantasy", "Mystery"]
+    return [[i, f"Title {i}", genres[i % 4], 1900 + i % 125, i % 3 != 0] for i in range(n)]
+
+
+def measure(label, build):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - started
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<28} {elapsed:6.2f}s  {len(result) / elapsed:>10,.0f} rows/s  "
+          f"retained {current / 2**20:7.1f} MiB  peak {peak / 2**20:7.1f} MiB")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000000)
+    args = parser.parse_args()
+
+    # The values (ids, strings) are shared and built up front; the per-row containers are
+    # each path's own work, so both build theirs inside the measurement
+    values = row_values(args.rows)
+
+    def old_path():
+        dict_rows = [dict(zip(COLUMNS, row)) for row in values]  # what RealDictCursor.fetchall() hands back
+        return [DictBook(**row) for row in dict_rows]
+
+    def new_path():
+        tuple_rows = [tuple(row) for row in values]  # what the tuple cursor's fetchall() hands back
+        return [Book(*row) for row in tuple_rows]
+
+    old = measure("dict rows -> Book(**row)", old_path)
+    del old
+    new = measure("tuple rows -> slotted Book", new_path)
+    assert new[-1].title == values[-1][1]
+
+
+if __name__ == '__main__':
+    main()
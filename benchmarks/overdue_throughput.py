@@ -0,0 +1,101 @@
+"""Throughput, memory and resumability of the overdue-notice job.
+
+Recreates the scratch database (unless --skip-load), applies the migrations,
+seeds --users patrons with two overdue loans each, then:
+
+    1. starts a run and interrupts it after --interrupt-after batches,
+    2. resumes it from the checkpoint and lets it finish,
+    3. runs it again (must be a no-op) and once more with --restart (all conflicts),
+
+and checks that every overdue loan ended up with exactly one notice.
+
+    python benchmarks/overdue_throughput.py --users 150000 --workers 4 --itersize 5000
+"""
+import argparse
+import datetime
+import os
+import resource
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from SmartLibManager_dao import DB_CONFIG, SmartLibManagerDAO  # noqa: E402
+from smartlibrary_migrate import migrate  # noqa: E402
+from smartlibrary_overdue import OverdueProcessor  # noqa: E402
+from seeding import load_schema, seed  # noqa: E402
+
+
+def seed_overdue(dao, users):
+    with dao._cursor(commit=True) as cursor:
+        cursor.execute("SELECT COUNT(*) AS count FROM Loans WHERE return_date IS NULL AND due_date < CURRENT_DATE")
+        if cursor.fetchone()['count'] >= 2 * users:
+            return
+        print(f"seeding {2 * users} overdue loans ...")
+        cursor.execute("SELECT min(id) AS first FROM Users WHERE username LIKE 'patron\\_%%'")
+        first_user = cursor.fetchone()['first']
+        # Two books per patron, from the books still on the shelf (one copy can't be out twice)
+        cursor.execute("""
+            INSERT INTO Loans (book_id, user_id, borrow_date, due_date)
+            SELECT b.id, %(fu)s + b.n / 2,
+                   CURRENT_DATE - 10 - (b.n / 2 + b.n %% 2) %% 90, CURRENT_DATE - 3 - (b.n / 2 + b.n %% 2) %% 90
+            FROM (SELECT id, (row_number() OVER (ORDER BY id) - 1)::int AS n FROM Books WHERE available) b
+            WHERE b.n < 2 * %(users)s
+        """, {"fu": first_user, "users": users})
+
+
+def max_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dbname", default="smartlibrary_bench")
+    parser.add_argument("--skip-load", action="store_true", help="reuse the database instead of recreating it")
+    parser.add_argument("--users", type=int, default=50000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--itersize", type=int, default=5000)
+    parser.add_argument("--interrupt-after", type=int, default=10, help="batches before the simulated crash")
+    args = parser.parse_args()
+
+    db_config = {"dbname": args.dbname}
+    if not args.skip_load:
+        load_schema(dict(DB_CONFIG, **db_config))
+    dao = SmartLibManagerDAO(minconn=2, maxconn=args.workers + 2, db_config=db_config, listen_for_changes=False)
+    migrate(dao, log=lambda message: None)
+    seed(dao, 3 * args.users, args.users, 0)  # enough books for two overdue loans per patron
+    seed_overdue(dao, args.users)
+    as_of = datetime.date.today()
+    print(f"baseline max RSS {max_rss_mb():.0f} MB")
+
+    crashed = []
+
+    def crash_after(report):
+        if report.batches >= args.interrupt_after and not crashed:
+            crashed.append(report.batches)
+            raise KeyboardInterrupt
+
+    runs = [
+        ("interrupted", OverdueProcessor(dao, args.batch_size, args.workers, args.itersize, progress=crash_after), True),
+        ("resumed", OverdueProcessor(dao, args.batch_size, args.workers, args.itersize), False),
+        ("repeat", OverdueProcessor(dao, args.batch_size, args.workers, args.itersize), False),
+    ]
+    for label, processor, restart in runs:
+        report = processor.run(as_of, restart=restart)
+        print(f"{label:<12} {report}  max RSS {max_rss_mb():.0f} MB")
+    report = OverdueProcessor(dao, args.batch_size, args.workers, args.itersize).run(as_of, restart=True)
+    print(f"{'restart':<12} {report}  max RSS {max_rss_mb():.0f} MB")
+
+    with dao._cursor() as cursor:
+        cursor.execute("""
+            SELECT (SELECT COUNT(*) FROM Loans WHERE return_date IS NULL AND due_date < %(d)s) AS overdue,
+                   (SELECT COUNT(*) FROM OverdueNotices WHERE notice_date = %(d)s) AS notices
+        """, {"d": as_of})
+        counts = cursor.fetchone()
+    print(f"overdue loans {counts['overdue']}, notices for {as_of}: {counts['notices']}")
+    dao.close()
+    sys.exit(0 if counts['overdue'] == counts['notices'] else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,367 @@
+"""Replay a mixed patron workload through SmartLibManagerDAO and record the results as JSON.
+
+Recreates the scratch database from smart_library.sql (plus migrations), seeds
+it at the requested scale, then runs many simulated patrons concurrently, each
+on its own thread, searching, borrowing (and running into the 3-loan trigger),
+returning, joining clubs, logging in and refreshing the dashboard:
+
+    python benchmarks/patron_workload.py --dbname smartlibrary_bench --books 100000 \\
+        --users 5000 --loans 500000 --patrons 64 --duration 60 --output before.json
+    python benchmarks/patron_workload.py --skip-load --output after.json --compare before.json
+
+Reports throughput, p50/p95/p99 latency and outcomes per operation, lock waits
+sampled from pg_locks, and deadlocks from pg_stat_database. Exits non-zero if
+any operation failed unexpectedly or deadlocked, the database counted a
+deadlock, or a patron ended up over the loan limit.
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+import psycopg2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from SmartLibManager_dao import DB_CONFIG, SmartLibManagerDAO, MAX_ACTIVE_LOANS  # noqa: E402
+from smartlibrary_migrate import migrate  # noqa: E402
+from seeding import REPO, load_schema, seed  # noqa: E402
+
+DEFAULT_MIX = "search=45,borrow=15,return=12,dashboard=12,login=10,join_club=6"
+SEARCH_TERMS = ["synthetic", "title", "synthetic title 42", "technology", "mystery", "fantasy",
+                "biography", "sci-fi", "title 7", "synthetik", "tittle"]
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in OPERATIONS:
+            raise SystemExit(f"unknown operation '{name}' (choose from {', '.join(OPERATIONS)})")
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+def classify(message):
+    message = message.lower()
+    if "deadlock" in message:
+        return "deadlock"
+    if "maximum limit" in message:
+        return "loan_limit"
+    if "not available" in message or "already" in message or "no active loan" in message:
+        return "rejected"
+    return "error"
+
+
+# --- OPERATIONS (each returns an outcome name, or None when it doesn't apply) ---
+class Patron:
+    def __init__(self, dao, user, book_ids, club_ids, rng, hot_books, loans):
+        self.dao = dao
+        self.user = user  # dict with id, username
+        self.book_ids = book_ids
+        self.club_ids = club_ids
+        self.rng = rng
+        self.hot_books = hot_books
+        self.loans = loans  # ids of this patron's active loans
+
+    def pick_book(self):
+        # A fifth of borrows go for the same few popular titles, so patrons contend for them
+        if self.rng.random() < 0.2:
+            return self.rng.choice(self.hot_books)
+        return self.rng.choice(self.book_ids)
+
+    def search(self):
+        self.dao.get_all_books(self.rng.choice(SEARCH_TERMS))
+        return "ok"
+
+    def borrow(self):
+        try:
+            self.loans.append(self.dao.create_loan(self.pick_book(), self.user["id"]))
+        except ValueError as e:
+            return classify(str(e))
+        return "ok"
+
+    def return_(self):
+        if not self.loans:
+            return None
+        try:
+            self.dao.return_loan(self.loans.pop(self.rng.randrange(len(self.loans))))
+        except ValueError as e:
+            return classify(str(e))
+        return "ok"
+
+    def dashboard(self):
+        self.dao.get_dashboard_snapshot()
+        return "ok"
+
+    def login(self):
+        return "ok" if self.dao.authenticate_user(self.user["username"], "pass123") else "error"
+
+    def join_club(self):
+        if not self.club_ids:
+            return "rejected"
+        try:
+            self.dao.join_club(self.rng.choice(self.club_ids), self.user["id"])
+        except ValueError as e:
+            return classify(str(e))
+        return "ok"
+
+
+OPERATIONS = {"search": Patron.search, "borrow": Patron.borrow, "return": Patron.return_,
+              "dashboard": Patron.dashboard, "login": Patron.login, "join_club": Patron.join_club}
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}  # op -> [seconds]
+        self.outcomes = {}  # op -> {outcome: count}
+        self.failures = []
+
+    def record(self, op, outcome, elapsed):
+        with self.lock:
+            self.latencies.setdefault(op, []).append(elapsed)
+            counts = self.outcomes.setdefault(op, {})
+            counts[outcome] = counts.get(outcome, 0) + 1
+
+
+def run_patron(patron, mix, recorder, deadline):
+    ops = list(mix)
+    weights = [mix[o] for o in ops]
+    while time.perf_counter() < deadline:
+        op = patron.rng.choices(ops, weights)[0]
+        started = time.perf_counter()
+        try:
+            outcome = OPERATIONS[op](patron)
+            if outcome is None:
+                continue
+        except Exception as e:
+            outcome = classify(str(e))
+            with recorder.lock:
+                if len(recorder.failures) < 20:
+                    recorder.failures.append(f"{op}: {e}")
+        recorder.record(op, outcome, time.perf_counter() - started)
+
+
+class LockMonitor(threading.Thread):
+    """Samples ungranted locks in the benchmark database every `interval` seconds.
+
+    Uses its own connection so sampling never waits behind the patrons for the pool.
+    """
+
+    def __init__(self, db_config, interval=0.1):
+        super().__init__(daemon=True)
+        self.db_config = db_config
+        self.interval = interval
+        self.samples = []
+        self._stop_event = threading.Event()
+
+    def run(self):
+        conn = psycopg2.connect(**self.db_config)
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cursor:
+                while not self._stop_event.wait(self.interval):
+                    cursor.execute("""
+                        SELECT COUNT(*) FROM pg_locks l
+                        JOIN pg_stat_activity a ON a.pid = l.pid
+                        WHERE NOT l.granted AND a.datname = current_database()
+                    """)
+                    self.samples.append(cursor.fetchone()[0])
+        finally:
+            conn.close()
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def deadlock_count(dao):
+    with dao._cursor() as cursor:
+        cursor.execute("SELECT deadlocks FROM pg_stat_database WHERE datname = current_database()")
+        return cursor.fetchone()['deadlocks']
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_fixture(dao, patrons, rng):
+    with dao._cursor() as cursor:
+        cursor.execute("SELECT id, username FROM Users WHERE role_id = 2 AND username LIKE 'patron\\_%%' "
+                       "ORDER BY id LIMIT %s", (patrons,))
+        users = [dict(r) for r in cursor.fetchall()]
+        cursor.execute("SELECT id FROM Books ORDER BY id")
+        book_ids = [r['id'] for r in cursor.fetchall()]
+        cursor.execute("SELECT id FROM BookClubs ORDER BY id")
+        club_ids = [r['id'] for r in cursor.fetchall()]
+        # Loans still open from the seed or an earlier run can be returned too
+        cursor.execute("SELECT user_id, array_agg(id) AS ids FROM Loans WHERE return_date IS NULL "
+                       "AND user_id = ANY(%s) GROUP BY user_id", ([u['id'] for u in users],))
+        loans = {r['user_id']: r['ids'] for r in cursor.fetchall()}
+    if len(users) < patrons:
+        raise SystemExit(f"only {len(users)} seeded patrons; raise --users or lower --patrons")
+    return users, book_ids, club_ids, rng.sample(book_ids, min(10, len(book_ids))), loans
+
+
+def summarize(recorder, elapsed):
+    operations = {}
+    for op, samples in sorted(recorder.latencies.items()):
+        operations[op] = {
+            "count": len(samples),
+            "per_second": len(samples) / elapsed,
+            "mean_ms": statistics.fmean(samples) * 1000,
+            "p50_ms": percentile(samples, 50) * 1000,
+            "p95_ms": percentile(samples, 95) * 1000,
+            "p99_ms": percentile(samples, 99) * 1000,
+            "max_ms": max(samples) * 1000,
+            "outcomes": recorder.outcomes[op],
+        }
+    return operations
+
+
+def print_report(result):
+    print(f"{result['total_operations']} operations from {result['config']['patrons']} patrons in "
+          f"{result['elapsed_s']:.1f}s: {result['throughput_per_s']:.0f} ops/s")
+    print(f"{'operation':<11}{'count':>8}{'ops/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}  outcomes")
+    for op, s in result["operations"].items():
+        print(f"{op:<11}{s['count']:>8}{s['per_second']:>8.0f}{s['p50_ms']:>9.1f}{s['p95_ms']:>9.1f}"
+              f"{s['p99_ms']:>9.1f}  {s['outcomes']}")
+    locks = result["locks"]
+    print(f"lock waits: {locks['samples_with_waiters']}/{locks['samples']} samples had waiters "
+          f"(max {locks['max_waiting']}), deadlocks: {locks['deadlocks']}")
+    print(f"pool: {result['pool']}")
+
+
+def compare(result, baseline_path):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"\nvs {baseline_path} (commit {baseline.get('commit')}):")
+    change = (result["throughput_per_s"] / baseline["throughput_per_s"] - 1) * 100 if baseline["throughput_per_s"] else 0
+    print(f"  throughput {baseline['throughput_per_s']:.0f} -> {result['throughput_per_s']:.0f} ops/s ({change:+.1f}%)")
+    for op, s in result["operations"].items():
+        old = baseline["operations"].get(op)
+        if old:
+            print(f"  {op:<11} p95 {old['p95_ms']:7.1f} -> {s['p95_ms']:7.1f} ms   "
+                  f"p99 {old['p99_ms']:7.1f} -> {s['p99_ms']:7.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dbname", default="smartlibrary_bench")
+    parser.add_argument("--skip-load", action="store_true", help="reuse the database instead of recreating it")
+    parser.add_argument("--books", type=int, default=20000)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--loans", type=int, default=100000, help="historical (returned) loans")
+    parser.add_argument("--clubs", type=int, default=50)
+    parser.add_argument("--patrons", type=int, default=32, help="concurrent simulated patrons (threads)")
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"operation weights (default {DEFAULT_MIX})")
+    parser.add_argument("--maxconn", type=int, default=10)
+    parser.add_argument("--cache-ttl", type=float, default=300.0, help="0 disables the DAO read-through cache")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="JSON results path (default workload-<commit>-<time>.json)")
+    parser.add_argument("--compare", help="earlier JSON results to compare against")
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+
+    db_config = {"dbname": args.dbname}
+    if not args.skip_load:
+        load_schema(dict(DB_CONFIG, **db_config))
+    dao = SmartLibManagerDAO(minconn=2, maxconn=args.maxconn, db_config=db_config, cache_ttl=args.cache_ttl)
+    migrate(dao, log=lambda message: None)
+    seed(dao, args.books, args.users, args.loans, clubs=args.clubs, memberships=args.users)
+
+    rng = random.Random(args.seed)
+    users, book_ids, club_ids, hot_books, loans = load_fixture(dao, args.patrons, rng)
+    patrons = [Patron(dao, user, book_ids, club_ids, random.Random(args.seed + i), hot_books,
+                      list(loans.get(user['id'], [])))
+               for i, user in enumerate(users)]
+
+    recorder = Recorder()
+    monitor = LockMonitor(dao.db_config)
+    deadlocks_before = deadlock_count(dao)
+    monitor.start()
+    started = time.perf_counter()
+    deadline = started + args.duration
+    threads = [threading.Thread(target=run_patron, args=(p, mix, recorder, deadline)) for p in patrons]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    monitor.stop()
+    deadlocks = deadlock_count(dao) - deadlocks_before
+
+    with dao._cursor() as cursor:
+        cursor.execute("""
+            SELECT user_id, COUNT(*) AS active FROM Loans
+            WHERE return_date IS NULL GROUP BY user_id HAVING COUNT(*) > %s
+        """, (MAX_ACTIVE_LOANS,))
+        over_limit = [dict(r) for r in cursor.fetchall()]
+        cursor.execute("SELECT version()")
+        server_version = cursor.fetchone()['version']
+
+    operations = summarize(recorder, elapsed)
+    total = sum(s["count"] for s in operations.values())
+    commit = git_commit()
+    result = {
+        "commit": commit,
+        "recorded_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "server": server_version,
+        "config": {k: getattr(args, k) for k in ("books", "users", "loans", "clubs", "patrons", "duration",
+                                                  "mix", "maxconn", "cache_ttl", "seed")},
+        "elapsed_s": elapsed,
+        "total_operations": total,
+        "throughput_per_s": total / elapsed,
+        "operations": operations,
+        "locks": {
+            "samples": len(monitor.samples),
+            "samples_with_waiters": sum(1 for n in monitor.samples if n),
+            "max_waiting": max(monitor.samples, default=0),
+            "mean_waiting": statistics.fmean(monitor.samples) if monitor.samples else 0.0,
+            "deadlocks": deadlocks,
+        },
+        "pool": dao.pool_metrics(),
+        "cache": dao.cache_stats(),
+        "over_loan_limit": over_limit,
+        "failures": recorder.failures,
+    }
+    dao.close()
+
+    print_report(result)
+    for failure in recorder.failures:
+        print(f"  failure: {failure}")
+    if over_limit:
+        print(f"patrons over the {MAX_ACTIVE_LOANS}-loan limit: {over_limit}")
+    output = args.output or f"workload-{commit or 'nogit'}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2, default=str)
+    print(f"results written to {output}")
+    if args.compare:
+        compare(result, args.compare)
+
+    errors = sum(s["outcomes"].get("error", 0) for s in operations.values())
+    aborted = sum(s["outcomes"].get("deadlock", 0) for s in operations.values())
+    if deadlocks or aborted:
+        print(f"deadlocks: {deadlocks} counted by the server, {aborted} operations aborted by one")
+    sys.exit(1 if errors or deadlocks or aborted or over_limit else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+"""Query-plan regression check for every DAO query on a large synthetic dataset.
+
+Seeds a scratch database (load smart_library.sql into it first), applies the
+migrations, records the SQL each public DAO method sends, then runs
+EXPLAIN (ANALYZE, BUFFERS) on it. Writes are undone before their EXPLAIN, so
+replaying them sees the same state the call did. Exits non-zero if a plan
+sequentially scans a table it is not allowed to, or exceeds its latency budget.
+
+    python benchmarks/plan_regression.py --dbname smartlibrary_bench --books 200000
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import uuid
+
+from psycopg2 import extensions
+from psycopg2.extras import RealDictCursor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from SmartLibManager_dao import SmartLibManagerDAO  # noqa: E402
+from smartlibrary_migrate import migrate  # noqa: E402
+from seeding import seed  # noqa: E402
+
+# Tables small enough (or read in full by design) that a Seq Scan is the right plan
+ALWAYS_ALLOWED = {"librarystats", "roles"}
+PATRON_PASSWORD = "pass123"  # seeding.py's patrons
+PARTITION = re.compile(r"^loans_(p\d{4}_\d{2}|default)$")  # monthly Loans partitions count as loans
+
+
+class RecordingCursor:
+    recorded = None  # list set by the harness
+
+    def execute(self, query, vars=None):
+        if RecordingCursor.recorded is not None:
+            RecordingCursor.recorded.append(self.mogrify(query, vars).decode())
+        return super().execute(query, vars)
+
+
+class RecordingDictCursor(RecordingCursor, RealDictCursor):
+    pass
+
+
+class RecordingTupleCursor(RecordingCursor, extensions.cursor):
+    pass
+
+
+def sample_ids(dao):
+    # A patron with no active loans, two active loans, an available book and a club
+    with dao._cursor() as cursor:
+        cursor.execute("""
+            SELECT id, username, password_hash FROM Users u
+            WHERE role_id = 2 AND NOT EXISTS (SELECT 1 FROM Loans l WHERE l.user_id = u.id AND l.return_date IS NULL)
+            ORDER BY id DESC LIMIT 1
+        """)
+        user = cursor.fetchone()
+        cursor.execute("SELECT id FROM Loans WHERE return_date IS NULL ORDER BY id LIMIT 2")
+        loan_ids = [row['id'] for row in cursor.fetchall()]
+        cursor.execute("SELECT id FROM Books WHERE available ORDER BY id DESC LIMIT 1")
+        book_id = cursor.fetchone()['id']
+        cursor.execute("SELECT id FROM BookClubs ORDER BY id LIMIT 1")
+        club_id = cursor.fetchone()['id']
+    return user, loan_ids, book_id, club_id
+
+
+def delete_row(dao, table, **where):
+    with dao._cursor(commit=True) as cursor:
+        cursor.execute(f"DELETE FROM {table} WHERE " + " AND ".join(f"{column} = %({column})s" for column in where),
+                       where)
+
+
+def cases(dao, user, loan_ids, book_id, club_id):
+    pages = dao.iter_books(page_size=200)
+    token = dao.login(user['username'], PATRON_PASSWORD)[1]
+    club_name = f"Plan check {uuid.uuid4().hex[:8]}"
+
+    def returned(results):
+        dao.return_loans([r['loan_id'] for r in results if r['loan_id'] is not None])
+
+    # (name, call, tables allowed to Seq Scan, budget in ms, undo(result) or None)
+    return [
+        ("authenticate_user", lambda: dao.authenticate_user(user['username'], user['password_hash']), set(), 5, None),
+        ("login", lambda: dao.login(user['username'], PATRON_PASSWORD), set(), 5, None),
+        ("resume_session", lambda: dao.resume_session(token), set(), 5, None),
+        ("logout", lambda: dao.logout(token), set(), 5, None),
+        ("create_book", lambda: dao.create_book("Plan Check", "Technology", 2024), set(), 10,
+         lambda new_id: delete_row(dao, "Books", id=new_id)),
+        ("get_all_books", dao.get_all_books, {"books"}, 1000, None),
+        ("search", lambda: dao.get_all_books("synthetic 4242"), set(), 50, None),
+        ("search typo", lambda: dao.get_all_books("synthetik"), set(), 50, None),
+        ("iter_books first page", lambda: next(pages), set(), 10, None),
+        ("iter_books next page", lambda: next(pages), set(), 10, None),
+        ("get_also_borrowed", lambda: dao.get_also_borrowed(book_id), set(), 10, None),
+        ("get_recommendations", lambda: dao.get_recommendations(user['id']), set(), 10, None),
+        ("create_loan", lambda: dao.create_loan(book_id, user['id']), set(), 20, dao.return_loan),
+        ("return_loan", lambda: dao.return_loan(loan_ids[0]), set(), 20, None),
+        ("create_loans", lambda: dao.create_loans([(book_id, user['id'])]), set(), 20, returned),
+        ("return_loans", lambda: dao.return_loans(loan_ids[1:]), set(), 20, None),
+        ("create_book_club", lambda: dao.create_book_club(club_name, "Plan check", user['id']), set(), 10,
+         lambda new_id: delete_row(dao, "BookClubs", id=new_id)),
+        ("join_club", lambda: dao.join_club(club_id, user['id']), set(), 10,
+         lambda _: delete_row(dao, "ClubMemberships", club_id=club_id, user_id=user['id'])),
+        ("get_clubs_summary", dao.get_clubs_summary, {"bookclubs", "clubmemberships"}, 20, None),
+        ("get_dashboard_snapshot", lambda: (dao.invalidate_dashboard(), dao.get_dashboard_snapshot()), set(), 10, None),
+        ("get_top_books", dao.get_top_books, set(), 10, None),
+        ("active loan count",
+         lambda: dao.get_count("SELECT COUNT(*) as count FROM Loans WHERE return_date IS NULL"), set(), 50, None),
+        # The first call reads the last month of loans in bulk, by design
+        ("get_trending_books", dao.get_trending_books, {"loans", "books"}, 500, None),
+    ]
+
+
+def seq_scans(plan, found=None):
+    found = [] if found is None else found
+    # A Seq Scan that read no blocks was over an empty table, e.g. a future month's Loans partition
+    if plan.get("Node Type") == "Seq Scan" and plan.get("Shared Hit Blocks", 0) + plan.get("Shared Read Blocks", 0):
+        relation = plan.get("Relation Name", "?").lower()
+        found.append("loans" if PARTITION.match(relation) else relation)
+    for child in plan.get("Plans", []):
+        seq_scans(child, found)
+    return found
+
+
+def explain(dao, sql):
+    # Rolled back afterwards, so EXPLAIN ANALYZE of writes leaves no trace
+    with dao.pool.connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql)
+            result = cursor.fetchone()[0][0]
+        conn.rollback()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dbname", default="smartlibrary_bench")
+    parser.add_argument("--books", type=int, default=200000)
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--loans", type=int, default=1000000)
+    parser.add_argument("--budget-scale", type=float, default=1.0, help="multiply every latency budget")
+    parser.add_argument("--verbose", action="store_true", help="print every plan")
+    args = parser.parse_args()
+
+    dao = SmartLibManagerDAO(db_config={"dbname": args.dbname})
+    migrate(dao)
+    seed(dao, args.books, args.users, args.loans)
+    user, loan_ids, book_id, club_id = sample_ids(dao)
+
+    dao.cursor_factory = RecordingDictCursor
+    dao.tuple_cursor_factory = RecordingTupleCursor
+    failures = 0
+    for name, call, allowed, budget, undo in cases(dao, user, loan_ids, book_id, club_id):
+        dao.clear_caches()  # measure the database, not the read-through cache
+        RecordingCursor.recorded = []
+        value = call()
+        statements, RecordingCursor.recorded = RecordingCursor.recorded, None
+        if undo is not None:
+            undo(value)
+        if not statements:
+            print(f"{'-':4} {name:<24} no queries sent (cache, session store or no recommendation index)")
+        for sql in statements:
+            result = explain(dao, sql)
+            elapsed = result["Execution Time"] + result["Planning Time"]
+            bad = [t for t in seq_scans(result["Plan"]) if t not in allowed | ALWAYS_ALLOWED]
+            over = elapsed > budget * args.budget_scale
+            status = "FAIL" if bad or over else "ok"
+            failures += status == "FAIL"
+            print(f"{status:4} {name:<24} {elapsed:8.2f}ms (budget {budget * args.budget_scale:.0f}ms)"
+                  + (f"  seq scan on {', '.join(bad)}" if bad else ""))
+            if args.verbose or status == "FAIL":
+                print("     " + " ".join(sql.split())[:200])
+                if args.verbose:
+                    print(json.dumps(result["Plan"], indent=2))
+    dao.close()
+    print(f"{failures} plan regression(s)")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Compare DAO transactions per second with and without prepared statements.
+
+Each transaction is one of the hot paths: login lookup, catalog page, search,
+or a borrow + return pair. All but search go through the registry (search is
+planned per call, so it runs the same in both modes). Caches are bypassed so
+every call reaches the server.
+
+    python benchmarks/prepared_statements.py --dbname smartlibrary_bench --seconds 10
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from SmartLibManager_dao import SmartLibManagerDAO  # noqa: E402
+
+
+def workload(dao, usernames, book_ids, member_ids, rng):
+    choice = rng.random()
+    if choice < 0.3:
+        dao._get_user_row(rng.choice(usernames))
+    elif choice < 0.6:
+        next(dao.iter_books(page_size=50))
+    elif choice < 0.8:
+        dao.search.search(rng.choice(["dune", "code", "hobbit", "mystery", "tolkien"]))
+    else:
+        try:
+            loan_id = dao.create_loan(rng.choice(book_ids), rng.choice(member_ids))
+        except ValueError:
+            return
+        dao.return_loan(loan_id)
+
+
+def run(dbname, prepared, seconds, seed):
+    dao = SmartLibManagerDAO(db_config={"dbname": dbname}, listen_for_changes=False,
+                             prepared_statements=prepared, cache_size=0)
+    with dao._cursor() as cursor:
+        cursor.execute("SELECT username FROM Users")
+        usernames = [r['username'] for r in cursor.fetchall()]
+        cursor.execute("SELECT id FROM Users WHERE role_id = 2")
+        member_ids = [r['id'] for r in cursor.fetchall()]
+        cursor.execute("SELECT id FROM Books ORDER BY id LIMIT 1000")
+        book_ids = [r['id'] for r in cursor.fetchall()]
+
+    rng = random.Random(seed)
+    done = 0
+    deadline = time.perf_counter() + seconds
+    started = time.perf_counter()
+    while time.perf_counter() < deadline:
+        workload(dao, usernames, book_ids, member_ids, rng)
+        done += 1
+    elapsed = time.perf_counter() - started
+    stats = dao.statements.stats()
+    dao.close()
+    return done / elapsed, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dbname", default="smartlibrary_bench")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    args = parser.parse_args()
+
+    plain, _ = run(args.dbname, False, args.seconds, seed=1)
+    prepared, stats = run(args.dbname, True, args.seconds, seed=1)
+    print(f"plain SQL   {plain:8.0f} tx/s")
+    print(f"prepared    {prepared:8.0f} tx/s  ({(prepared / plain - 1) * 100:+.1f}%)  {stats}")
+
+
+if __name__ == '__main__':
+    main()
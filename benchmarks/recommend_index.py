@@ -0,0 +1,93 @@
+"""Build time, incremental update time and query latency of the recommendation index.
+
+By default the loans are synthetic (Zipf-distributed book popularity, uneven
+patron activity), generated in memory so millions of them cost seconds:
+
+    python benchmarks/recommend_index.py --loans 5000000 --users 200000 --books 100000
+    python benchmarks/recommend_index.py --dbname smartlibrary_bench   # read the loans from a database instead
+
+Reports the full build, an incremental update of --new-loans loans, saving,
+and p50/p99 latency of also_borrowed and for_user lookups on the memory-mapped
+index.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from smartlibrary_recommend import CoOccurrenceIndex, Recommender, read_pairs  # noqa: E402
+
+
+def synthetic_loans(rng, loans, users, books):
+    # A few very popular books and a long tail; some patrons borrow far more than others
+    book_ids = (rng.zipf(1.3, loans) - 1) % books + 1
+    patron_ids = (rng.pareto(1.5, loans) * users / 20).astype(np.int64) % users + 1
+    return patron_ids, book_ids
+
+
+def timed(label, fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    print(f"{label:<28} {time.perf_counter() - started:8.2f}s")
+    return result
+
+
+def latency(label, fn, keys):
+    samples = []
+    for key in keys:
+        started = time.perf_counter()
+        fn(key)
+        samples.append((time.perf_counter() - started) * 1000)
+    q = statistics.quantiles(samples, n=100)
+    print(f"{label:<28} p50 {q[49]:.3f} ms  p99 {q[98]:.3f} ms  ({len(samples)} lookups)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--loans", type=int, default=2000000)
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--books", type=int, default=50000)
+    parser.add_argument("--new-loans", type=int, default=10000, help="loans folded in by the incremental update")
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--dbname", help="build from this database's loans instead of synthetic ones")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    if args.dbname:
+        from SmartLibManager_dao import SmartLibManagerDAO
+        dao = SmartLibManagerDAO(db_config={"dbname": args.dbname}, listen_for_changes=False)
+        users, books, last_loan_id = timed("read loans (COPY)", read_pairs, dao)
+        dao.close()
+    else:
+        users, books = synthetic_loans(rng, args.loans, args.users, args.books)
+        last_loan_id = len(users)
+    print(f"{len(users)} loans, {len(np.unique(users))} patrons, {len(np.unique(books))} books")
+
+    index = CoOccurrenceIndex()
+    timed("full build", index.add_pairs, users, books, last_loan_id)
+    print(f"{'':<28} {index.incidence.nnz} patron/book pairs, {index.cooc.nnz} co-occurrences")
+
+    new_users, new_books = synthetic_loans(rng, args.new_loans, int(users.max()), int(books.max()))
+    added = timed(f"update (+{args.new_loans} loans)", index.add_pairs, new_users, new_books,
+                  last_loan_id + args.new_loans)
+    print(f"{'':<28} {added} new patron/book pairs")
+
+    with tempfile.TemporaryDirectory() as index_dir:
+        timed("save", index.save, index_dir)
+        recommender = Recommender(index_dir)
+        known_books = rng.choice(np.unique(books), args.lookups)
+        known_users = rng.choice(np.unique(users), args.lookups)
+        recommender.also_borrowed(int(known_books[0]))  # map the files before timing
+        latency("also_borrowed (top 5)", lambda b: recommender.also_borrowed(int(b), 5), known_books)
+        latency("for_user (top 5)", lambda u: recommender.for_user(int(u), 5), known_users)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Catalog search and club list latency: local SQLite replica vs the primary over a WAN.
+
+Needs migrations/0005_replica_changes.sql applied to the database. The primary
+is usually on the same machine here, so --rtt-ms adds that much delay to every
+round trip to it, emulating a branch terminal's link:
+
+    python benchmarks/replica_latency.py --dbname smartlibrary_bench --rtt-ms 40
+    python benchmarks/replica_latency.py --books 200000 --rtt-ms 80   # seed more books first
+
+Reports the initial full copy, p50/p99 of searches (query words sampled from
+the catalog's titles) and of the club list on both sides, and how long a
+sync takes to pick up --changes book updates made on the primary.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from SmartLibManager_dao import SmartLibManagerDAO  # noqa: E402
+from smartlibrary_replica import CatalogReplica  # noqa: E402
+from search_latency import seed  # noqa: E402
+
+
+def wan_cursor(base, rtt_ms):
+    class WanCursor(base):
+        def execute(self, query, vars=None):
+            time.sleep(rtt_ms / 1000)
+            return super().execute(query, vars)
+    return WanCursor
+
+
+def latency(label, fn, args):
+    samples = []
+    for arg in args:
+        started = time.perf_counter()
+        fn(arg)
+        samples.append((time.perf_counter() - started) * 1000)
+    q = statistics.quantiles(samples, n=100)
+    print(f"{label:<26} p50 {q[49]:8.2f} ms  p99 {q[98]:8.2f} ms  ({len(samples)} calls)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dbname", default="smartlibrary_bench")
+    parser.add_argument("--books", type=int, default=0, help="seed this many extra books first")
+    parser.add_argument("--rtt-ms", type=float, default=40.0, help="emulated round trip to the primary")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--changes", type=int, default=100)
+    args = parser.parse_args()
+
+    dao = SmartLibManagerDAO(db_config={"dbname": args.dbname}, listen_for_changes=False)
+    if args.books:
+        seed(dao, args.books)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "replica.sqlite3")
+        replica = CatalogReplica(path)
+        report = replica.sync(dao)
+        print(f"initial copy: {report} ({os.path.getsize(path) / 1e6:.1f} MB)")
+
+        rng = random.Random(7)
+        titles = [row[1] for row in replica.all_books()]
+        words = [w for t in rng.sample(titles, min(len(titles), 2000)) for w in t.split() if len(w) > 3]
+        queries = [" ".join(rng.sample(words, rng.choice((1, 1, 2)))) for _ in range(args.queries)]
+
+        dao.tuple_cursor_factory = wan_cursor(dao.tuple_cursor_factory, args.rtt_ms)
+        dao.cursor_factory = wan_cursor(dao.cursor_factory, args.rtt_ms)
+
+        def remote_clubs(_):
+            dao.cache.invalidate("clubs")  # measure the query, not the DAO's cache
+            return dao.get_clubs_summary()
+
+        latency(f"search remote (+{args.rtt_ms:g}ms)", dao.search.search, queries)
+        latency("search local", replica.search, queries)
+        latency(f"club list remote (+{args.rtt_ms:g}ms)", remote_clubs, range(50))
+        latency("club list local", lambda _: replica.clubs_summary(), range(50))
+
+        with dao._cursor(commit=True) as cursor:
+            cursor.execute("UPDATE Books SET publication_year = publication_year WHERE id IN "
+                           "(SELECT id FROM Books ORDER BY random() LIMIT %s)", (args.changes,))
+        report = replica.sync(dao)
+        print(f"delta sync: {report}")
+        replica.close()
+    dao.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""Seed a synthetic catalog and compare ILIKE vs indexed catalog search latency.
+
+Load smart_library.sql into a scratch database first (the script adds rows):
+
+    python benchmarks/search_latency.py --dbname smartlibrary_bench --books 1000000
+
+Reported separately for common terms (one title word or author surname, some
+with a typo, each matching several percent of the catalog) and selective ones
+(two title words and a surname, matching well under 0.1%). The synthetic titles
+use only a few dozen words, so a selective query here is three common words
+AND-ed together and its cost is mostly the GIN index intersecting their long
+posting lists; a common one is bounded by CatalogSearch.CANDIDATES.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+from psycopg2.extras import execute_values
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from SmartLibManager_dao import SmartLibManagerDAO  # noqa: E402
+
+WORDS = ("shadow river empire garden silent winter code machine dragon ocean night city "
+         "stone glass storm memory crown forest signal atlas harbor ember mirror engine "
+         "orchard lantern voyage cipher meadow summit").split()
+GENRES = ["Technology", "Sci-Fi", "Fantasy", "Mystery", "Biography", "Self-Help", "History", "Poetry"]
+FIRST = "Ada Alan Grace Ursula Octavia Isaac Mary Jorge Italo Toni Haruki Chinua".split()
+LAST = "Lovelace Turing Hopper LeGuin Butler Asimov Shelley Borges Calvino Morrison Murakami Achebe".split()
+
+
+def seed(dao, books, batch=10000):
+    with dao._cursor(commit=True) as cursor:
+        execute_values(cursor, "INSERT INTO Authors (name) VALUES %s ON CONFLICT (name) DO NOTHING",
+                       [(f"{f} {l}",) for f in FIRST for l in LAST])
+        cursor.execute("SELECT id FROM Authors")
+        author_ids = [r['id'] for r in cursor.fetchall()]
+
+    rng = random.Random(42)
+    for start in range(0, books, batch):
+        rows = [(" ".join(rng.choice(WORDS).capitalize() for _ in range(rng.randint(2, 4))),
+                 rng.choice(GENRES), rng.randint(1900, 2024))
+                for _ in range(min(batch, books - start))]
+        with dao._cursor(commit=True) as cursor:
+            ids = execute_values(cursor, "INSERT INTO Books (title, genre, publication_year) VALUES %s RETURNING id",
+                                 rows, page_size=batch, fetch=True)
+            execute_values(cursor, "INSERT INTO BookAuthors (book_id, author_id) VALUES %s",
+                           [(r['id'], rng.choice(author_ids)) for r in ids], page_size=batch)
+        print(f"\rseeded {start + len(rows)}/{books}", end="", flush=True)
+    print()
+    with dao._cursor(commit=True) as cursor:
+        cursor.execute("ANALYZE Books")
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def measure(label, run, queries):
+    samples = []
+    for q in queries:
+        started = time.perf_counter()
+        run(q)
+        samples.append((time.perf_counter() - started) * 1000)
+    print(f"{label:<18} p50={percentile(samples, 50):8.2f}ms  p99={percentile(samples, 99):8.2f}ms  "
+          f"mean={statistics.mean(samples):8.2f}ms")
+
+
+def ilike_search(dao, q):
+    with dao._cursor() as cursor:
+        cursor.execute("SELECT id, title, genre, publication_year, available FROM Books "
+                       "WHERE title ILIKE %s ORDER BY title", (f"%{q}%",))
+        return cursor.fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dbname", default="smartlibrary_bench")
+    parser.add_argument("--books", type=int, default=1000000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--skip-seed", action="store_true")
+    args = parser.parse_args()
+
+    dao = SmartLibManagerDAO(db_config={"dbname": args.dbname})
+    if not args.skip_seed:
+        seed(dao, args.books)
+
+    rng = random.Random(7)
+    common = []
+    for _ in range(args.queries):
+        word = rng.choice(WORDS + LAST)
+        if rng.random() < 0.3:  # simulate a typo
+            i = rng.randrange(len(word))
+            word = word[:i] + word[i + 1:]
+        common.append(word)
+    selective = [f"{' '.join(rng.sample(WORDS, 2))} {rng.choice(LAST)}" for _ in range(args.queries)]
+
+    for name, queries in (("common", common), ("selective", selective)):
+        measure(f"ILIKE {name}", lambda q: ilike_search(dao, q), queries)
+        measure(f"indexed {name}", lambda q: dao.search.search(q), queries)
+    dao.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Shared setup for the benchmarks: (re)create a scratch database from
+smart_library.sql and fill it with synthetic books, patrons, loans and clubs.
+
+Seeded patrons are 'patron_<n>' with password 'pass123'.
+"""
+import os
+
+import psycopg2
+from psycopg2 import extensions
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCHEMA_PATH = os.path.join(REPO, "smart_library.sql")
+
+
+def load_schema(db_config, schema_path=SCHEMA_PATH):
+    # Drops and recreates db_config['dbname'], then runs the schema script in it
+    dbname = db_config["dbname"]
+    admin = psycopg2.connect(**dict(db_config, dbname="postgres"))
+    admin.set_isolation_level(extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+    try:
+        with admin.cursor() as cursor:
+            cursor.execute(f'DROP DATABASE IF EXISTS "{dbname}"')
+            cursor.execute(f'CREATE DATABASE "{dbname}"')
+    finally:
+        admin.close()
+
+    with open(schema_path, encoding="utf-8") as f:
+        script = "\n".join(line for line in f.read().splitlines() if not line.startswith("CREATE DATABASE"))
+    conn = psycopg2.connect(**db_config)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(script)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def seed(dao, books, users, loans, clubs=0, memberships=0):
+    with dao._cursor(commit=True) as cursor:
+        cursor.execute("SELECT COUNT(*) as count FROM Books")
+        if cursor.fetchone()['count'] >= books:
+            return
+        print(f"seeding {books} books, {users} users, {loans} loans, {clubs} clubs ...")
+        cursor.execute("""
+            INSERT INTO Books (title, genre, publication_year)
+            SELECT 'Synthetic Title ' || g || ' ' || md5(g::text),
+                   (ARRAY['Technology','Sci-Fi','Fantasy','Mystery','Biography'])[1 + g %% 5],
+                   1900 + g %% 125
+            FROM generate_series(1, %s) g
+        """, (books,))
+        cursor.execute("""
+            INSERT INTO Users (username, password_hash, role_id, email, full_name)
+            SELECT 'patron_' || g, 'pass123', 2, 'patron_' || g || '@example.com', 'Patron ' || g
+            FROM generate_series(1, %s) g
+        """, (users,))
+        # Seeded ids are contiguous, so loans can be spread over them arithmetically
+        cursor.execute("SELECT max(id) - %s + 1 as first FROM Books", (books,))
+        first_book = cursor.fetchone()['first']
+        cursor.execute("SELECT max(id) - %s + 1 as first FROM Users", (users,))
+        first_user = cursor.fetchone()['first']
+        # Historical (returned) loans spread over every book and patron
+        cursor.execute("""
+            INSERT INTO Loans (book_id, user_id, borrow_date, due_date, return_date)
+            SELECT %(fb)s + (g::bigint * 7919) %% %(books)s, %(fu)s + (g::bigint * 104729) %% %(users)s,
+                   CURRENT_DATE - (g %% 1500), CURRENT_DATE - (g %% 1500) + 7, CURRENT_DATE - (g %% 1500) + 3
+            FROM generate_series(1, %(loans)s) g
+        """, {"fb": first_book, "fu": first_user, "books": books, "users": users, "loans": loans})
+        # One active loan for a tenth of the patrons, each on a different book
+        cursor.execute("""
+            INSERT INTO Loans (book_id, user_id, borrow_date, due_date)
+            SELECT %(fb)s + g / 10, %(fu)s + g, CURRENT_DATE, CURRENT_DATE + 7
+            FROM generate_series(0, LEAST(%(users)s, 10 * %(books)s) - 1, 10) g
+        """, {"fb": first_book, "fu": first_user, "books": books, "users": users})
+        if clubs:
+            cursor.execute("""
+                INSERT INTO BookClubs (name, description, created_by)
+                SELECT 'Synthetic Club ' || g, 'Seeded for benchmarks', (SELECT min(id) FROM Users WHERE role_id = 1)
+                FROM generate_series(1, %s) g
+            """, (clubs,))
+            cursor.execute("""
+                INSERT INTO ClubMemberships (club_id, user_id)
+                SELECT c.first + (g::bigint * 13) %% %(clubs)s, %(fu)s + (g::bigint * 7877) %% %(users)s
+                FROM generate_series(1, %(memberships)s) g,
+                     (SELECT max(id) - %(clubs)s + 1 AS first FROM BookClubs) c
+                ON CONFLICT DO NOTHING
+            """, {"clubs": clubs, "fu": first_user, "users": users, "memberships": memberships})
+    conn = dao.pool.getconn()
+    try:
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute("VACUUM ANALYZE")
+    finally:
+        conn.autocommit = False
+        dao.pool.putconn(conn)
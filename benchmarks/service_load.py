@@ -0,0 +1,162 @@
+"""Load generator for smartlibrary_service.py: requests/s and tail latency per endpoint.
+
+Start the service against a scratch database loaded from smart_library.sql, then:
+
+    python smartlibrary_service.py --dbname smartlibrary_bench --port 8080
+    python benchmarks/service_load.py --port 8080 --clients 200 --duration 30
+
+Each client keeps one HTTP connection open and loops over a weighted mix of
+search, dashboard, login and borrow+return. 503s (the service shedding load)
+and 409s (loan limit / book already out) are counted separately from errors.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+QUERIES = ["python", "dune", "history", "code", "mystery", "space", "sql", "clean code",
+           "pragmatic", "foundation", "sherlock", "habits", "sapiens", "neuromancer"]
+MIX = [("search", 70), ("dashboard", 10), ("auth", 10), ("borrow_return", 10)]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class Client:
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method, path, body=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        data = json.dumps(body).encode() if body is not None else b""
+        self.writer.write((f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+                           f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n").encode() + data)
+        await self.writer.drain()
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("server closed the connection")
+        status = int(status_line.split()[1])
+        length, close = 0, False
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode().partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+            elif name.lower() == "connection" and value.strip().lower() == "close":
+                close = True
+        payload = json.loads(await self.reader.readexactly(length)) if length else None
+        if close:
+            self.close()
+        return status, payload
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = {}  # operation -> [seconds]
+        self.statuses = {}  # status -> count
+        self.errors = 0
+
+    def record(self, op, status, elapsed):
+        self.latencies.setdefault(op, []).append(elapsed)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+
+
+async def run_client(client, args, book_ids, member, stats, deadline, rng):
+    ops = [op for op, _ in MIX]
+    weights = [w for _, w in MIX]
+    while time.perf_counter() < deadline:
+        op = rng.choices(ops, weights)[0]
+        started = time.perf_counter()
+        try:
+            if op == "search":
+                status, _ = await client.request("GET", f"/search?q={rng.choice(QUERIES).replace(' ', '+')}&limit=20")
+            elif op == "dashboard":
+                status, _ = await client.request("GET", "/dashboard")
+            elif op == "auth":
+                status, _ = await client.request("POST", "/auth", {"username": member[0], "password": member[1]})
+            else:
+                status, payload = await client.request("POST", "/loans", {"book_id": rng.choice(book_ids),
+                                                                          "token": member[2]})
+                if status == 200:
+                    status, _ = await client.request("POST", "/returns", {"loan_id": payload["loan_id"],
+                                                                          "token": member[2]})
+        except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError):
+            stats.errors += 1
+            client.close()
+            continue
+        stats.record(op, status, time.perf_counter() - started)
+
+
+async def main_async(args):
+    setup = Client(args.host, args.port)
+    members = []
+    for credentials in args.member:
+        username, _, password = credentials.partition(":")
+        status, user = await setup.request("POST", "/auth", {"username": username, "password": password})
+        if status != 200:
+            raise SystemExit(f"login failed for {username}: {user}")
+        members.append((username, password, user["token"]))
+    book_ids = set()
+    for q in QUERIES:
+        status, payload = await setup.request("GET", f"/search?q={q.replace(' ', '+')}&limit=100")
+        book_ids.update(b["id"] for b in payload["results"])
+    setup.close()
+    if not book_ids:
+        raise SystemExit("no books found; load smart_library.sql into the service's database first")
+    book_ids = sorted(book_ids)
+
+    stats = Stats()
+    clients = [Client(args.host, args.port) for _ in range(args.clients)]
+    deadline = time.perf_counter() + args.duration
+    started = time.perf_counter()
+    await asyncio.gather(*(run_client(c, args, book_ids, members[i % len(members)], stats, deadline,
+                                      random.Random(i)) for i, c in enumerate(clients)))
+    elapsed = time.perf_counter() - started
+    for c in clients:
+        c.close()
+
+    total = sum(len(v) for v in stats.latencies.values())
+    print(f"{args.clients} clients, {elapsed:.1f}s: {total} requests, {total / elapsed:.0f} req/s, "
+          f"{stats.errors} connection errors")
+    print(f"status codes: {dict(sorted(stats.statuses.items()))}")
+    print(f"{'operation':<15}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for op, samples in sorted(stats.latencies.items()):
+        print(f"{op:<15}{len(samples):>8}{percentile(samples, 50) * 1000:>10.1f}"
+              f"{percentile(samples, 95) * 1000:>10.1f}{percentile(samples, 99) * 1000:>10.1f}"
+              f"{max(samples) * 1000:>10.1f}")
+
+    health = Client(args.host, args.port)
+    _, payload = await health.request("GET", "/health")
+    health.close()
+    print(f"service: {json.dumps(payload)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--member", action="append",
+                        help="username:password of a member to borrow as (repeatable)")
+    args = parser.parse_args()
+    args.member = args.member or ["mem_john:pass123", "mem_jane:pass123", "mem_peter:pass123", "mem_tony:pass123"]
+    asyncio.run(main_async(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Desktop app startup: time to the login screen and from login to the first tab.
+
+Drives smartlibraryapp.SmartLibraryApp off screen (QT_QPA_PLATFORM=offscreen)
+the way a user would: waits for the login form, logs in, and waits for the
+catalog's first page. Times come from the app's own StartupProfiler, measured
+from the moment smartlibraryapp is imported:
+
+    python benchmarks/startup_time.py --dbname smartlibrary_bench
+    python benchmarks/startup_time.py --username mem_john --password password
+
+Run it a few times; the first run after a reboot also pays for a cold disk cache.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+
+def wait_for(app, window, phase, timeout):
+    deadline = time.monotonic() + timeout
+    while phase not in window.profiler.marks:
+        if time.monotonic() > deadline:
+            raise SystemExit(f"no '{phase}' after {timeout:g}s: {window.profiler.report()}")
+        app.processEvents()
+        time.sleep(0.001)
+
+
+def main():
+    import smartlibraryapp  # first, so the profile starts where the app's does
+    import SmartLibManager_dao
+    from PyQt5.QtWidgets import QApplication, QMessageBox
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dbname", default="smartlibrary_bench")
+    parser.add_argument("--username", default="admin_sarah")
+    parser.add_argument("--password", default="admin123")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+
+    SmartLibManager_dao.DB_CONFIG["dbname"] = args.dbname
+    QMessageBox.information = lambda *a, **kw: None  # the welcome box would block the event loop
+
+    app = QApplication(sys.argv)
+    window = smartlibraryapp.SmartLibraryApp()
+    window.show()
+    wait_for(app, window, "login_screen", args.timeout)
+
+    window.username_edit.setText(args.username)
+    window.password_edit.setText(args.password)
+    window.authenticate()
+    wait_for(app, window, "logged_in", args.timeout)
+    wait_for(app, window, "first_tab", args.timeout)
+
+    marks = window.profiler.marks
+    print(window.profiler.report())
+    print(f"time to login screen  {marks['login_screen']:.3f}s")
+    print(f"login to first tab    {marks['first_tab'] - marks['logged_in']:.3f}s")
+    window.close()
+
+
+if __name__ == '__main__':  # the password hasher's worker processes re-import this script
+    main()
@@ -0,0 +1,130 @@
+"""Accuracy, memory and speed of the trending-books sketches against exact counts.
+
+By default the loans are synthetic (Zipf-distributed popularity that shifts
+over the month, genres by book), counted exactly in memory alongside:
+
+    python benchmarks/trending_accuracy.py --loans 1000000 --books 50000 -k 10
+    python benchmarks/trending_accuracy.py --dbname smartlibrary_bench   # exact counts from GROUP BY instead
+
+For every window, overall and for the --genres most common genres, reports
+top-k precision (a reported book counts as correct if its true count reaches
+the true k-th count, so ties don't penalise) and the relative error of the
+reported counts. Also reports ingest rate, query latency and sketch memory.
+"""
+import argparse
+import datetime
+import os
+import statistics
+import sys
+import time
+from collections import Counter
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from smartlibrary_trending import WINDOWS, TrendingBooks, catch_up  # noqa: E402
+
+GENRES = ["Fiction", "Fantasy", "Mystery", "Science", "History", "Romance", "Children", "Poetry"]
+
+
+def synthetic_loans(rng, loans, books, today):
+    # (loan_id, book_id, genre, borrow_date) over the last 30 days; recent days are
+    # busier and each day's favourites are shifted, so the windows disagree
+    ages = np.minimum((rng.exponential(12, loans)).astype(np.int64), WINDOWS["month"] - 1)
+    ranks = (rng.zipf(1.3, loans) - 1) % books
+    book_ids = (ranks + ages * 7919) % books + 1
+    genres = [GENRES[b % len(GENRES)] if b % 11 else None for b in range(books + 1)]
+    dates = [today - datetime.timedelta(days=int(a)) for a in range(WINDOWS["month"])]
+    return [(i + 1, int(b), genres[b], dates[a]) for i, (b, a) in enumerate(zip(book_ids, ages))]
+
+
+def exact_from_rows(rows, today):
+    counts = {}
+    for _, book_id, genre, borrow_date in rows:
+        age = (today - borrow_date).days
+        for window, days in WINDOWS.items():
+            if age < days:
+                for key in {None, genre}:
+                    counts.setdefault((window, key), Counter())[book_id] += 1
+    return lambda window, genre: counts.get((window, genre), Counter())
+
+
+def exact_from_sql(dao, today):
+    def exact(window, genre):
+        with dao._cursor(tuples=True) as cursor:
+            cursor.execute("""
+                SELECT l.book_id, COUNT(*) FROM Loans l JOIN Books b ON b.id = l.book_id
+                WHERE l.borrow_date > %(today)s - %(days)s
+                  AND (%(all)s OR b.genre IS NOT DISTINCT FROM %(genre)s)
+                GROUP BY l.book_id
+            """, {"today": today, "days": WINDOWS[window], "all": genre is None, "genre": genre})
+            return Counter(dict(cursor.fetchall()))
+    return exact
+
+
+def score(reported, exact, k):
+    true_top = exact.most_common(k)
+    if not true_top:
+        return None
+    kth = true_top[-1][1]
+    hits = sum(1 for book_id, _ in reported if exact[book_id] >= kth)
+    errors = [(count - exact[book_id]) / max(1, exact[book_id]) for book_id, count in reported]
+    return hits / len(true_top), max(errors, default=0.0), statistics.mean(errors) if errors else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--loans", type=int, default=500000)
+    parser.add_argument("--books", type=int, default=20000)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--genres", type=int, default=3, help="also score the top-k of this many genres")
+    parser.add_argument("--queries", type=int, default=10000)
+    parser.add_argument("--dbname", help="rebuild from this database's Loans and compare with SQL counts")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    today = datetime.date.today()
+    trending = TrendingBooks(clock=lambda: today)
+    if args.dbname:
+        from SmartLibManager_dao import SmartLibManagerDAO
+        dao = SmartLibManagerDAO(db_config={"dbname": args.dbname}, listen_for_changes=False)
+        started = time.perf_counter()
+        rows = catch_up(dao, trending)
+        elapsed = time.perf_counter() - started
+        exact = exact_from_sql(dao, today)
+    else:
+        dao = None
+        rng = np.random.default_rng(args.seed)
+        loans = synthetic_loans(rng, args.loans, args.books, today)
+        exact = exact_from_rows(loans, today)
+        started = time.perf_counter()
+        for start in range(0, len(loans), 10000):
+            trending.record_loans(loans[start:start + 10000])
+        rows, elapsed = len(loans), time.perf_counter() - started
+    print(f"ingest {rows} loans in {elapsed:.2f}s ({rows / elapsed if elapsed else 0:.0f} loans/s)")
+    stats = trending.stats()
+    print(f"{stats['buckets']} day buckets, {stats['sketch_bytes'] / 1e6:.1f} MB of Count-Min counters")
+
+    genres = [g for g, _ in Counter({g: exact("month", g).total() for g in trending.genres()}).most_common(args.genres)]
+    print(f"{'window':<8} {'genre':<12} {'precision@' + str(args.k):>13} {'max err':>9} {'mean err':>9}")
+    for window in WINDOWS:
+        for genre in [None] + genres:
+            result = score(trending.top(window, args.k, genre), exact(window, genre), args.k)
+            if result is None:
+                continue
+            precision, max_error, mean_error = result
+            print(f"{window:<8} {genre or 'all':<12} {precision:>13.2f} {max_error:>8.1%} {mean_error:>8.1%}")
+
+    keys = [(w, g) for w in WINDOWS for g in [None] + genres]
+    started = time.perf_counter()
+    for i in range(args.queries):
+        window, genre = keys[i % len(keys)]
+        trending.top(window, 5, genre)
+    print(f"top-5 query {(time.perf_counter() - started) / args.queries * 1e6:.1f} us")
+    if dao is not None:
+        dao.close()
+
+
+if __name__ == '__main__':
+    main()
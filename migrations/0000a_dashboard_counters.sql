@@ -0,0 +1,110 @@
+-- 0000a: Dashboard counters for databases created before smart_library.sql had them.
+-- LibraryStats holds book/member/active-loan counts in 16 slot rows (each backend
+-- adds to slot pg_backend_pid() % 16; the dashboard reads the sum), BookLoanCounts
+-- the all-time borrow count per book. The Books and Users triggers are installed
+-- here; active_loans and BookLoanCounts are kept by the loan triggers of 0000c.
+--
+-- Safe on a database that already has them (a fresh smart_library.sql install):
+-- counters are only backfilled into tables this migration creates, and an
+-- earlier single-row LibraryStats is converted to slots keeping its totals.
+
+DO $$
+BEGIN
+    IF to_regclass('bookloancounts') IS NULL THEN
+        CREATE TABLE BookLoanCounts (
+            book_id INT PRIMARY KEY,
+            loan_count BIGINT NOT NULL DEFAULT 0,
+            FOREIGN KEY (book_id) REFERENCES Books(id) ON DELETE CASCADE
+        );
+        INSERT INTO BookLoanCounts (book_id, loan_count)
+        SELECT b.id, COUNT(l.book_id) FROM Books b LEFT JOIN Loans l ON l.book_id = b.id GROUP BY b.id;
+    END IF;
+
+    IF to_regclass('librarystats') IS NULL THEN
+        CREATE TABLE LibraryStats (
+            slot INT PRIMARY KEY CHECK (slot >= 0 AND slot < 16),
+            total_books BIGINT NOT NULL DEFAULT 0,
+            members BIGINT NOT NULL DEFAULT 0,
+            active_loans BIGINT NOT NULL DEFAULT 0
+        );
+        INSERT INTO LibraryStats (slot, total_books, members, active_loans)
+        SELECT 0, (SELECT COUNT(*) FROM Books), (SELECT COUNT(*) FROM Users WHERE role_id = 2),
+               (SELECT COUNT(*) FROM Loans WHERE return_date IS NULL);
+    ELSIF NOT EXISTS (SELECT 1 FROM information_schema.columns
+                      WHERE table_name = 'librarystats' AND column_name = 'slot') THEN
+        -- Single-row LibraryStats (id = 1): its row becomes slot 1
+        ALTER TABLE LibraryStats DROP CONSTRAINT IF EXISTS librarystats_id_check;
+        ALTER TABLE LibraryStats ALTER COLUMN id DROP DEFAULT;
+        ALTER TABLE LibraryStats RENAME COLUMN id TO slot;
+        ALTER TABLE LibraryStats ADD CONSTRAINT librarystats_slot_check CHECK (slot >= 0 AND slot < 16);
+    END IF;
+END;
+$$;
+
+INSERT INTO LibraryStats (slot) SELECT generate_series(0, 15) ON CONFLICT DO NOTHING;
+
+CREATE INDEX IF NOT EXISTS idx_bookloancounts_count ON BookLoanCounts (loan_count DESC, book_id);
+
+CREATE OR REPLACE FUNCTION bump_library_stats(d_books BIGINT, d_members BIGINT, d_loans BIGINT) RETURNS VOID AS $$
+    UPDATE LibraryStats
+    SET total_books = total_books + d_books, members = members + d_members, active_loans = active_loans + d_loans
+    WHERE slot = pg_backend_pid() % 16
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION track_book_stats() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM bump_library_stats((SELECT COUNT(*) FROM changed_books), 0, 0);
+        INSERT INTO BookLoanCounts (book_id) SELECT id FROM changed_books;
+    ELSE
+        PERFORM bump_library_stats(-(SELECT COUNT(*) FROM changed_books), 0, 0);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS tr_book_stats ON Books;  -- the earlier row-level version
+DROP TRIGGER IF EXISTS tr_book_stats_ins ON Books;
+CREATE TRIGGER tr_book_stats_ins AFTER INSERT ON Books
+REFERENCING NEW TABLE AS changed_books
+FOR EACH STATEMENT EXECUTE FUNCTION track_book_stats();
+
+DROP TRIGGER IF EXISTS tr_book_stats_del ON Books;
+CREATE TRIGGER tr_book_stats_del AFTER DELETE ON Books
+REFERENCING OLD TABLE AS changed_books
+FOR EACH STATEMENT EXECUTE FUNCTION track_book_stats();
+
+CREATE OR REPLACE FUNCTION track_member_stats() RETURNS TRIGGER AS $$
+DECLARE
+    delta BIGINT;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT COUNT(*) INTO delta FROM new_users WHERE role_id = 2;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT -COUNT(*) INTO delta FROM old_users WHERE role_id = 2;
+    ELSE
+        SELECT COUNT(*) FILTER (WHERE n.role_id = 2) - COUNT(*) FILTER (WHERE o.role_id = 2) INTO delta
+        FROM new_users n JOIN old_users o ON o.id = n.id;
+    END IF;
+    IF delta <> 0 THEN
+        PERFORM bump_library_stats(0, delta, 0);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS tr_member_stats ON Users;  -- the earlier row-level version
+DROP TRIGGER IF EXISTS tr_member_stats_ins ON Users;
+CREATE TRIGGER tr_member_stats_ins AFTER INSERT ON Users
+REFERENCING NEW TABLE AS new_users
+FOR EACH STATEMENT EXECUTE FUNCTION track_member_stats();
+
+DROP TRIGGER IF EXISTS tr_member_stats_del ON Users;
+CREATE TRIGGER tr_member_stats_del AFTER DELETE ON Users
+REFERENCING OLD TABLE AS old_users
+FOR EACH STATEMENT EXECUTE FUNCTION track_member_stats();
+
+DROP TRIGGER IF EXISTS tr_member_stats_upd ON Users;
+CREATE TRIGGER tr_member_stats_upd AFTER UPDATE ON Users
+REFERENCING OLD TABLE AS old_users NEW TABLE AS new_users
+FOR EACH STATEMENT EXECUTE FUNCTION track_member_stats();
@@ -0,0 +1,72 @@
+-- 0000b: Catalog search columns, triggers and indexes for databases created before
+-- smart_library.sql had them, plus the catalog's keyset-paging and import-dedup
+-- indexes. search_text and search_vector are filled in for every book that
+-- doesn't have them yet, so this is a no-op on a fresh smart_library.sql install.
+
+-- Trigram matching for typo-tolerant catalog search
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+ALTER TABLE Books ADD COLUMN IF NOT EXISTS search_text TEXT;
+ALTER TABLE Books ADD COLUMN IF NOT EXISTS search_vector TSVECTOR;
+
+-- Trigger: Rebuild a book's search document (title A, authors B, genre C)
+CREATE OR REPLACE FUNCTION refresh_book_search() RETURNS TRIGGER AS $$
+DECLARE
+    author_names TEXT;
+BEGIN
+    SELECT COALESCE(string_agg(a.name, ' ' ORDER BY a.name), '') INTO author_names
+    FROM BookAuthors ba JOIN Authors a ON a.id = ba.author_id
+    WHERE ba.book_id = NEW.id;
+
+    NEW.search_text := concat_ws(' ', NEW.title, author_names, NEW.genre);
+    NEW.search_vector :=
+        setweight(to_tsvector('english', COALESCE(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('english', author_names), 'B') ||
+        setweight(to_tsvector('english', COALESCE(NEW.genre, '')), 'C');
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS tr_book_search ON Books;
+CREATE TRIGGER tr_book_search BEFORE INSERT OR UPDATE OF title, genre ON Books
+FOR EACH ROW EXECUTE FUNCTION refresh_book_search();
+
+-- Trigger: Re-index the books whose author links change, once per statement
+CREATE OR REPLACE FUNCTION refresh_book_search_on_link() RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE Books SET title = title WHERE id IN (SELECT book_id FROM changed_links);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS tr_bookauthors_search ON BookAuthors;  -- the earlier row-level version
+DROP TRIGGER IF EXISTS tr_bookauthors_search_ins ON BookAuthors;
+CREATE TRIGGER tr_bookauthors_search_ins AFTER INSERT ON BookAuthors
+REFERENCING NEW TABLE AS changed_links
+FOR EACH STATEMENT EXECUTE FUNCTION refresh_book_search_on_link();
+
+DROP TRIGGER IF EXISTS tr_bookauthors_search_del ON BookAuthors;
+CREATE TRIGGER tr_bookauthors_search_del AFTER DELETE ON BookAuthors
+REFERENCING OLD TABLE AS changed_links
+FOR EACH STATEMENT EXECUTE FUNCTION refresh_book_search_on_link();
+
+-- Trigger: Re-index every book by an author who is renamed
+CREATE OR REPLACE FUNCTION refresh_book_search_on_author() RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE Books SET title = title
+    WHERE id IN (SELECT book_id FROM BookAuthors WHERE author_id = NEW.id);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS tr_author_search ON Authors;
+CREATE TRIGGER tr_author_search AFTER UPDATE OF name ON Authors
+FOR EACH ROW EXECUTE FUNCTION refresh_book_search_on_author();
+
+-- Backfill through tr_book_search
+UPDATE Books SET title = title WHERE search_vector IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_books_title_id ON Books (title, id);  -- keyset paging of the catalog
+CREATE INDEX IF NOT EXISTS idx_books_title_lower ON Books (lower(title), publication_year);  -- bulk import dedup
+CREATE INDEX IF NOT EXISTS idx_books_search_vector ON Books USING GIN (search_vector);
+CREATE INDEX IF NOT EXISTS idx_books_search_trgm ON Books USING GIN (search_text gin_trgm_ops);
@@ -0,0 +1,99 @@
+-- 0000c: Statement-level loan triggers for databases created before
+-- smart_library.sql had them: availability (one active loan per book), the
+-- three-loan limit, and the active_loans / BookLoanCounts counters of 0000a, each
+-- run once per INSERT or UPDATE over its transition tables. Replaces the
+-- original row-level triggers of the same names; safe to re-run.
+
+-- Trigger: Reject a borrow of a book that is already out (including the same
+-- book twice in one statement) and update book availability to FALSE.
+-- The books are locked FOR NO KEY UPDATE, which doesn't conflict with the KEY
+-- SHARE locks the Loans foreign-key checks already hold, so a concurrent borrow
+-- of the same copy waits here for the first one to commit and then counts its
+-- loan (FOR UPDATE would deadlock the two).
+CREATE OR REPLACE FUNCTION update_book_on_borrow() RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM 1 FROM Books
+    WHERE id IN (SELECT book_id FROM new_loans WHERE return_date IS NULL)
+    ORDER BY id FOR NO KEY UPDATE;
+
+    IF EXISTS (
+        SELECT 1 FROM Loans l
+        WHERE l.return_date IS NULL
+          AND l.book_id IN (SELECT book_id FROM new_loans WHERE return_date IS NULL)
+        GROUP BY l.book_id
+        HAVING COUNT(*) > 1
+    ) THEN
+        RAISE EXCEPTION 'Book is not available.';
+    END IF;
+
+    UPDATE Books SET available = FALSE
+    WHERE id IN (SELECT book_id FROM new_loans WHERE return_date IS NULL);
+
+    UPDATE BookLoanCounts c SET loan_count = c.loan_count + n.borrowed
+    FROM (SELECT book_id, COUNT(*) AS borrowed FROM new_loans GROUP BY book_id) n
+    WHERE c.book_id = n.book_id;
+
+    PERFORM bump_library_stats(0, 0, (SELECT COUNT(*) FROM new_loans WHERE return_date IS NULL));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS tr_book_borrow ON Loans;
+CREATE TRIGGER tr_book_borrow AFTER INSERT ON Loans
+REFERENCING NEW TABLE AS new_loans
+FOR EACH STATEMENT EXECUTE FUNCTION update_book_on_borrow();
+
+-- Trigger: Update book availability to TRUE on return
+-- (transition tables can't be combined with UPDATE OF <column>, so the
+-- function picks out the rows whose return_date went from NULL to a date)
+CREATE OR REPLACE FUNCTION update_book_on_return() RETURNS TRIGGER AS $$
+DECLARE
+    returned BIGINT;
+BEGIN
+    SELECT COUNT(*) INTO returned
+    FROM new_loans n JOIN old_loans o ON o.id = n.id
+    WHERE n.return_date IS NOT NULL AND o.return_date IS NULL;
+
+    IF returned > 0 THEN
+        UPDATE Books SET available = TRUE
+        WHERE id IN (
+            SELECT n.book_id FROM new_loans n JOIN old_loans o ON o.id = n.id
+            WHERE n.return_date IS NOT NULL AND o.return_date IS NULL
+        );
+        PERFORM bump_library_stats(0, 0, -returned);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS tr_book_return ON Loans;
+CREATE TRIGGER tr_book_return AFTER UPDATE ON Loans
+REFERENCING OLD TABLE AS old_loans NEW TABLE AS new_loans
+FOR EACH STATEMENT EXECUTE FUNCTION update_book_on_return();
+
+-- Trigger: Max 3 loans (checked once per statement for every borrower in it,
+-- with the borrowers locked so concurrent borrows can't both pass the check;
+-- FOR NO KEY UPDATE, like the books above, to stay clear of the foreign-key locks)
+CREATE OR REPLACE FUNCTION prevent_excess_loans() RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM 1 FROM Users
+    WHERE id IN (SELECT user_id FROM new_loans WHERE return_date IS NULL)
+    ORDER BY id FOR NO KEY UPDATE;
+
+    IF EXISTS (
+        SELECT 1 FROM Loans l
+        WHERE l.return_date IS NULL
+          AND l.user_id IN (SELECT user_id FROM new_loans WHERE return_date IS NULL)
+        GROUP BY l.user_id
+        HAVING COUNT(*) > 3
+    ) THEN
+        RAISE EXCEPTION 'User has reached the maximum limit of 3 active loans.';
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS enforce_loan_limit ON Loans;
+CREATE TRIGGER enforce_loan_limit AFTER INSERT ON Loans
+REFERENCING NEW TABLE AS new_loans
+FOR EACH STATEMENT EXECUTE FUNCTION prevent_excess_loans();
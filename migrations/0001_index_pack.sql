@@ -0,0 +1,18 @@
+-- 0001: Secondary indexes for the DAO's hot paths.
+-- Applied by smartlibrary_migrate.py on top of smart_library.sql.
+
+-- Active loans per borrower: the 3-loan limit trigger and create_loans' pre-check
+CREATE INDEX IF NOT EXISTS idx_loans_user_active ON Loans (user_id) WHERE return_date IS NULL;
+
+-- Active-loan counts and "who has this book" lookups, answerable from the index alone
+CREATE INDEX IF NOT EXISTS idx_loans_active_book ON Loans (book_id) WHERE return_date IS NULL;
+
+-- Loans -> Books joins (history per book, FK checks when a book is deleted)
+CREATE INDEX IF NOT EXISTS idx_loans_book ON Loans (book_id) INCLUDE (id);
+
+-- Users filtered by role (member counts and listings)
+CREATE INDEX IF NOT EXISTS idx_users_role ON Users (role_id) INCLUDE (id);
+
+-- Reverse side of the many-to-many tables (author re-indexing, membership cascades)
+CREATE INDEX IF NOT EXISTS idx_bookauthors_author ON BookAuthors (author_id);
+CREATE INDEX IF NOT EXISTS idx_clubmemberships_user ON ClubMemberships (user_id);
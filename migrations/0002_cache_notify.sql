@@ -0,0 +1,45 @@
+-- 0002: NOTIFY smartlibrary_cache whenever cached reference data changes, so every
+-- running DAO can drop exactly the entries that went stale.
+-- Payloads: 'books', 'loans', 'clubs', 'users:<username>'.
+-- Identical payloads within one transaction are delivered once, so batch writes
+-- cost a single notification.
+
+CREATE OR REPLACE FUNCTION notify_cache_entity() RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('smartlibrary_cache', TG_ARGV[0]);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS tr_books_cache_notify ON Books;
+CREATE TRIGGER tr_books_cache_notify AFTER INSERT OR UPDATE OR DELETE ON Books
+FOR EACH STATEMENT EXECUTE FUNCTION notify_cache_entity('books');
+
+DROP TRIGGER IF EXISTS tr_loans_cache_notify ON Loans;
+CREATE TRIGGER tr_loans_cache_notify AFTER INSERT OR UPDATE OR DELETE ON Loans
+FOR EACH STATEMENT EXECUTE FUNCTION notify_cache_entity('loans');
+
+DROP TRIGGER IF EXISTS tr_clubs_cache_notify ON BookClubs;
+CREATE TRIGGER tr_clubs_cache_notify AFTER INSERT OR UPDATE OR DELETE ON BookClubs
+FOR EACH STATEMENT EXECUTE FUNCTION notify_cache_entity('clubs');
+
+DROP TRIGGER IF EXISTS tr_memberships_cache_notify ON ClubMemberships;
+CREATE TRIGGER tr_memberships_cache_notify AFTER INSERT OR UPDATE OR DELETE ON ClubMemberships
+FOR EACH STATEMENT EXECUTE FUNCTION notify_cache_entity('clubs');
+
+-- Users are cached per username, so notify per row with the affected name(s)
+CREATE OR REPLACE FUNCTION notify_cache_user() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM pg_notify('smartlibrary_cache', 'users:' || OLD.username);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM pg_notify('smartlibrary_cache', 'users:' || NEW.username);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS tr_users_cache_notify ON Users;
+CREATE TRIGGER tr_users_cache_notify AFTER INSERT OR UPDATE OR DELETE ON Users
+FOR EACH ROW EXECUTE FUNCTION notify_cache_user();
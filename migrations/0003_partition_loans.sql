@@ -0,0 +1,190 @@
+-- 0003: Range-partition Loans by borrow_date (one partition per month) and add
+-- LoansArchive for closed loans moved out by smartlibrary_archive.py.
+--
+-- Inserts route to the month's partition (loans_default catches anything the
+-- maintenance job hasn't created a partition for yet), so create_loan and
+-- return_loan are unchanged. Top Books and the dashboard read BookLoanCounts
+-- and LibraryStats, which archiving never decrements, so they stay exact
+-- without reading the archive.
+
+-- Partitioned tables need the partition key in the primary key
+ALTER TABLE Loans RENAME TO loans_legacy;
+ALTER TABLE loans_legacy RENAME CONSTRAINT loans_pkey TO loans_legacy_pkey;
+ALTER TABLE loans_legacy RENAME CONSTRAINT fk_book TO fk_legacy_book;
+ALTER TABLE loans_legacy RENAME CONSTRAINT fk_user TO fk_legacy_user;
+DROP INDEX IF EXISTS idx_loans_user_active;
+DROP INDEX IF EXISTS idx_loans_active_book;
+DROP INDEX IF EXISTS idx_loans_book;
+
+CREATE TABLE Loans (
+    id INT NOT NULL DEFAULT nextval('loans_id_seq'),
+    book_id INT NOT NULL,
+    user_id INT NOT NULL,
+    borrow_date DATE DEFAULT CURRENT_DATE NOT NULL,
+    due_date DATE NOT NULL,
+    return_date DATE, -- NULL means currently borrowed
+    PRIMARY KEY (id, borrow_date),
+    CONSTRAINT fk_book FOREIGN KEY (book_id) REFERENCES Books(id) ON DELETE RESTRICT,
+    CONSTRAINT fk_user FOREIGN KEY (user_id) REFERENCES Users(id) ON DELETE RESTRICT
+) PARTITION BY RANGE (borrow_date);
+
+ALTER SEQUENCE loans_id_seq OWNED BY Loans.id;
+
+CREATE TABLE loans_default PARTITION OF Loans DEFAULT;
+
+-- Creates the partition for the month containing month_start (no-op if it exists).
+-- Rows for that month already sitting in loans_default are moved into it.
+CREATE OR REPLACE FUNCTION create_loan_partition(month_start DATE) RETURNS BOOLEAN AS $$
+DECLARE
+    lower_bound DATE := date_trunc('month', month_start)::date;
+    upper_bound DATE := (date_trunc('month', month_start) + INTERVAL '1 month')::date;
+    part TEXT := 'loans_p' || to_char(month_start, 'YYYY_MM');
+BEGIN
+    IF to_regclass(part) IS NOT NULL THEN
+        RETURN FALSE;
+    END IF;
+    EXECUTE format('CREATE TABLE %I (LIKE Loans INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', part);
+    EXECUTE format('WITH moved AS (DELETE FROM loans_default WHERE borrow_date >= %L AND borrow_date < %L RETURNING *)
+                    INSERT INTO %I SELECT * FROM moved', lower_bound, upper_bound, part);
+    EXECUTE format('ALTER TABLE Loans ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                   part, lower_bound, upper_bound);
+    RETURN TRUE;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Monthly partitions from the current month to months_ahead months out, plus one
+-- for every month that has rows stranded in loans_default; returns how many were created
+CREATE OR REPLACE FUNCTION ensure_loan_partitions(months_ahead INT DEFAULT 3) RETURNS INT AS $$
+DECLARE
+    created INT := 0;
+    m INT;
+    stranded DATE;
+BEGIN
+    FOR stranded IN SELECT DISTINCT date_trunc('month', borrow_date)::date FROM loans_default LOOP
+        IF create_loan_partition(stranded) THEN
+            created := created + 1;
+        END IF;
+    END LOOP;
+    FOR m IN 0..months_ahead LOOP
+        IF create_loan_partition((date_trunc('month', CURRENT_DATE) + make_interval(months => m))::date) THEN
+            created := created + 1;
+        END IF;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- One partition per month that has loans, plus the coming months
+DO $$
+DECLARE
+    month_start DATE;
+BEGIN
+    FOR month_start IN SELECT DISTINCT date_trunc('month', borrow_date)::date FROM loans_legacy LOOP
+        PERFORM create_loan_partition(month_start);
+    END LOOP;
+    PERFORM ensure_loan_partitions(3);
+END;
+$$;
+
+-- Copy before the loan triggers exist, so availability and counters aren't applied twice
+INSERT INTO Loans (id, book_id, user_id, borrow_date, due_date, return_date)
+SELECT id, book_id, user_id, borrow_date, due_date, return_date FROM loans_legacy;
+
+DROP TABLE loans_legacy;
+
+CREATE INDEX idx_loans_user_active ON Loans (user_id) WHERE return_date IS NULL;
+CREATE INDEX idx_loans_active_book ON Loans (book_id) WHERE return_date IS NULL;
+CREATE INDEX idx_loans_book ON Loans (book_id) INCLUDE (id);
+
+CREATE TRIGGER tr_book_borrow AFTER INSERT ON Loans
+REFERENCING NEW TABLE AS new_loans
+FOR EACH STATEMENT EXECUTE FUNCTION update_book_on_borrow();
+
+CREATE TRIGGER tr_book_return AFTER UPDATE ON Loans
+REFERENCING OLD TABLE AS old_loans NEW TABLE AS new_loans
+FOR EACH STATEMENT EXECUTE FUNCTION update_book_on_return();
+
+CREATE TRIGGER enforce_loan_limit AFTER INSERT ON Loans
+REFERENCING NEW TABLE AS new_loans
+FOR EACH STATEMENT EXECUTE FUNCTION prevent_excess_loans();
+
+CREATE TRIGGER tr_loans_cache_notify AFTER INSERT OR UPDATE OR DELETE ON Loans
+FOR EACH STATEMENT EXECUTE FUNCTION notify_cache_entity('loans');
+
+-- Closed loans, one partition per year. Rows are never updated, so partitions
+-- are packed full (fillfactor 100), written in book order and indexed by BRIN
+-- on borrow_date only; smartlibrary_archive.py freezes them after each run.
+CREATE TABLE LoansArchive (
+    id INT NOT NULL,
+    book_id INT NOT NULL,
+    user_id INT NOT NULL,
+    borrow_date DATE NOT NULL,
+    due_date DATE NOT NULL,
+    return_date DATE NOT NULL,
+    PRIMARY KEY (id, borrow_date)
+) PARTITION BY RANGE (borrow_date);
+
+CREATE INDEX idx_loansarchive_borrow_date ON LoansArchive USING brin (borrow_date);
+
+CREATE OR REPLACE FUNCTION create_loan_archive_partition(year_start DATE) RETURNS VOID AS $$
+DECLARE
+    part TEXT := 'loans_archive_y' || to_char(year_start, 'YYYY');
+BEGIN
+    IF to_regclass(part) IS NULL THEN
+        EXECUTE format('CREATE TABLE %I PARTITION OF LoansArchive FOR VALUES FROM (%L) TO (%L) WITH (fillfactor = 100)',
+                       part, date_trunc('year', year_start)::date,
+                       (date_trunc('year', year_start) + INTERVAL '1 year')::date);
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Monthly Loans partitions that end before CURRENT_DATE - older_than, oldest first
+CREATE OR REPLACE FUNCTION archivable_loan_partitions(older_than INTERVAL DEFAULT INTERVAL '1 year')
+RETURNS TABLE (partition_name TEXT, month_start DATE) AS $$
+    SELECT c.relname::text, to_date(substr(c.relname, 8), 'YYYY_MM')
+    FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = 'loans'::regclass AND c.relname ~ '^loans_p[0-9]{4}_[0-9]{2}$'
+      AND to_date(substr(c.relname, 8), 'YYYY_MM') + INTERVAL '1 month'
+          <= date_trunc('month', CURRENT_DATE - older_than)
+    ORDER BY 2
+$$ LANGUAGE sql STABLE;
+
+-- Moves one partition's closed loans into LoansArchive and drops the partition
+-- if nothing is left (loans still out stay where they are). Works on the
+-- partition directly, so none of the Loans triggers fire and the rolled-up
+-- counters are untouched.
+CREATE OR REPLACE FUNCTION archive_loan_partition(part TEXT)
+RETURNS TABLE (archived BIGINT, dropped BOOLEAN) AS $$
+DECLARE
+    remaining BOOLEAN;
+BEGIN
+    PERFORM create_loan_archive_partition(to_date(substr(part, 8), 'YYYY_MM'));
+    EXECUTE format('WITH moved AS (DELETE FROM %I WHERE return_date IS NOT NULL RETURNING *)
+                    INSERT INTO LoansArchive (id, book_id, user_id, borrow_date, due_date, return_date)
+                    SELECT id, book_id, user_id, borrow_date, due_date, return_date FROM moved
+                    ORDER BY book_id, borrow_date, id
+                    ON CONFLICT DO NOTHING', part);
+    GET DIAGNOSTICS archived = ROW_COUNT;
+    EXECUTE format('SELECT EXISTS (SELECT 1 FROM %I)', part) INTO remaining;
+    IF NOT remaining THEN
+        EXECUTE format('DROP TABLE %I', part);
+    END IF;
+    dropped := NOT remaining;
+    RETURN NEXT;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Everything in one transaction, for running by hand from psql:
+--   SELECT * FROM archive_closed_loans(INTERVAL '1 year');
+CREATE OR REPLACE FUNCTION archive_closed_loans(older_than INTERVAL DEFAULT INTERVAL '1 year')
+RETURNS TABLE (partition_name TEXT, archived BIGINT, dropped BOOLEAN) AS $$
+DECLARE
+    part RECORD;
+BEGIN
+    FOR part IN SELECT * FROM archivable_loan_partitions(older_than) LOOP
+        partition_name := part.partition_name;
+        SELECT a.archived, a.dropped INTO archived, dropped FROM archive_loan_partition(part.partition_name) a;
+        RETURN NEXT;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,33 @@
+-- 0004: Overdue notices written by smartlibrary_overdue.py, and its per-run checkpoint.
+
+-- One notice per overdue loan per run date; re-running a date never duplicates one.
+-- loan_id has no foreign key: Loans' key is (id, borrow_date) since 0003 and
+-- loans move to LoansArchive once returned.
+CREATE TABLE OverdueNotices (
+    loan_id INT NOT NULL,
+    notice_date DATE NOT NULL,
+    user_id INT NOT NULL REFERENCES Users(id) ON DELETE CASCADE,
+    book_id INT NOT NULL REFERENCES Books(id) ON DELETE CASCADE,
+    due_date DATE NOT NULL,
+    days_overdue INT NOT NULL,
+    fine NUMERIC(8, 2) NOT NULL,
+    message TEXT NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT now(),
+    PRIMARY KEY (loan_id, notice_date)
+);
+
+CREATE INDEX idx_overduenotices_user ON OverdueNotices (user_id, notice_date);
+
+-- Progress of each run: every loan id up to last_loan_id has its notice written
+CREATE TABLE OverdueRuns (
+    as_of DATE PRIMARY KEY,
+    last_loan_id INT NOT NULL DEFAULT 0,
+    rows_processed BIGINT NOT NULL DEFAULT 0,
+    notices_written BIGINT NOT NULL DEFAULT 0,
+    started_at TIMESTAMP NOT NULL DEFAULT now(),
+    updated_at TIMESTAMP NOT NULL DEFAULT now(),
+    finished_at TIMESTAMP
+);
+
+-- Active loans in id order, so a run streams (and resumes) by loan id without a sort
+CREATE INDEX idx_loans_active_id ON Loans (id) INCLUDE (due_date) WHERE return_date IS NULL;
@@ -0,0 +1,58 @@
+-- 0005: Change log read by smartlibrary_replica.py, so branch terminals can keep a
+-- local SQLite copy of the catalog and clubs current by fetching only what changed.
+-- Rows name the replicated entity and its id:
+--   'books'   Books row, or a book whose BookAuthors changed
+--   'authors' Authors row
+--   'clubs'   BookClubs row, or a club whose membership (member count) changed
+-- Pruned by python smartlibrary_replica.py --prune; a replica that fell behind the
+-- pruned range resynchronizes in full.
+
+CREATE TABLE ReplicaChanges (
+    seq BIGSERIAL PRIMARY KEY,
+    entity TEXT NOT NULL,
+    row_id INT NOT NULL,
+    changed_at TIMESTAMP NOT NULL DEFAULT now()
+);
+
+CREATE INDEX idx_replicachanges_changed_at ON ReplicaChanges (changed_at);
+
+-- Statement-level with transition tables: a bulk import or a batch of loans logs
+-- one INSERT ... SELECT, not a trigger call per row.
+-- TG_ARGV: entity, id column
+CREATE OR REPLACE FUNCTION log_replica_change() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        EXECUTE format('INSERT INTO ReplicaChanges (entity, row_id) SELECT DISTINCT %L, %I FROM old_rows',
+                       TG_ARGV[0], TG_ARGV[1]);
+    ELSE
+        EXECUTE format('INSERT INTO ReplicaChanges (entity, row_id) SELECT DISTINCT %L, %I FROM new_rows',
+                       TG_ARGV[0], TG_ARGV[1]);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    t RECORD;
+BEGIN
+    FOR t IN SELECT * FROM (VALUES
+        ('books', 'books', 'id'),
+        ('authors', 'authors', 'id'),
+        ('bookauthors', 'books', 'book_id'),
+        ('bookclubs', 'clubs', 'id'),
+        ('clubmemberships', 'clubs', 'club_id')
+    ) AS v(tbl, entity, id_column)
+    LOOP
+        EXECUTE format('CREATE TRIGGER tr_%s_replica_ins AFTER INSERT ON %I REFERENCING NEW TABLE AS new_rows '
+                       'FOR EACH STATEMENT EXECUTE FUNCTION log_replica_change(%L, %L)',
+                       t.tbl, t.tbl, t.entity, t.id_column);
+        EXECUTE format('CREATE TRIGGER tr_%s_replica_upd AFTER UPDATE ON %I REFERENCING NEW TABLE AS new_rows '
+                       'FOR EACH STATEMENT EXECUTE FUNCTION log_replica_change(%L, %L)',
+                       t.tbl, t.tbl, t.entity, t.id_column);
+        EXECUTE format('CREATE TRIGGER tr_%s_replica_del AFTER DELETE ON %I REFERENCING OLD TABLE AS old_rows '
+                       'FOR EACH STATEMENT EXECUTE FUNCTION log_replica_change(%L, %L)',
+                       t.tbl, t.tbl, t.entity, t.id_column);
+    END LOOP;
+END;
+$$;
@@ -1,5 +1,8 @@
 CREATE DATABASE smart_library;
 
+-- Trigram matching for typo-tolerant catalog search
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
 CREATE TABLE Roles (
     id SERIAL PRIMARY KEY,
     name VARCHAR(50) UNIQUE NOT NULL
@@ -29,9 +32,16 @@ CREATE TABLE Books (
     title VARCHAR(200) NOT NULL,
     genre VARCHAR(50),
     publication_year INT,
-    available BOOLEAN DEFAULT TRUE NOT NULL 
+    available BOOLEAN DEFAULT TRUE NOT NULL,
+    search_text TEXT,          -- title + author names + genre, maintained by tr_book_search
+    search_vector TSVECTOR     -- weighted full-text document, maintained by tr_book_search
 );
 
+CREATE INDEX idx_books_title_id ON Books (title, id);  -- keyset paging of the catalog
+CREATE INDEX idx_books_title_lower ON Books (lower(title), publication_year);  -- bulk import dedup
+CREATE INDEX idx_books_search_vector ON Books USING GIN (search_vector);
+CREATE INDEX idx_books_search_trgm ON Books USING GIN (search_text gin_trgm_ops);
+
 -- BookAuthors (Many-to-Many)
 CREATE TABLE BookAuthors (
     book_id INT NOT NULL,
@@ -73,44 +83,234 @@ CREATE TABLE ClubMemberships (
     FOREIGN KEY (user_id) REFERENCES Users(id) ON DELETE CASCADE
 );
 
+-- LibraryStats (counters kept current by triggers, read by the dashboard as the
+-- sum of all slots). Each backend adds its deltas to slot pg_backend_pid() % 16,
+-- so concurrent borrows and returns don't queue on a single row lock.
+CREATE TABLE LibraryStats (
+    slot INT PRIMARY KEY CHECK (slot >= 0 AND slot < 16),
+    total_books BIGINT NOT NULL DEFAULT 0,
+    members BIGINT NOT NULL DEFAULT 0,
+    active_loans BIGINT NOT NULL DEFAULT 0
+);
+
+INSERT INTO LibraryStats (slot) SELECT generate_series(0, 15);
+
+-- BookLoanCounts (all-time borrow count per book, so Top Books never scans Loans)
+CREATE TABLE BookLoanCounts (
+    book_id INT PRIMARY KEY,
+    loan_count BIGINT NOT NULL DEFAULT 0,
+    FOREIGN KEY (book_id) REFERENCES Books(id) ON DELETE CASCADE
+);
+
+CREATE INDEX idx_bookloancounts_count ON BookLoanCounts (loan_count DESC, book_id);
+
 -- 3. TRIGGERS & FUNCTIONS
 
--- Trigger: Update book availability to FALSE on borrow
+-- Adds to this backend's LibraryStats slot
+CREATE OR REPLACE FUNCTION bump_library_stats(d_books BIGINT, d_members BIGINT, d_loans BIGINT) RETURNS VOID AS $$
+    UPDATE LibraryStats
+    SET total_books = total_books + d_books, members = members + d_members, active_loans = active_loans + d_loans
+    WHERE slot = pg_backend_pid() % 16
+$$ LANGUAGE sql;
+
+-- Loan triggers are statement-level and read the transition tables, so a batch
+-- of loans costs one UPDATE per table instead of one per row.
+
+-- Trigger: Reject a borrow of a book that is already out (including the same
+-- book twice in one statement) and update book availability to FALSE.
+-- The books are locked FOR NO KEY UPDATE, which doesn't conflict with the KEY
+-- SHARE locks the Loans foreign-key checks already hold, so a concurrent borrow
+-- of the same copy waits here for the first one to commit and then counts its
+-- loan (FOR UPDATE would deadlock the two).
 CREATE OR REPLACE FUNCTION update_book_on_borrow() RETURNS TRIGGER AS $$
 BEGIN
-    UPDATE Books SET available = FALSE WHERE id = NEW.book_id;
-    RETURN NEW;
+    PERFORM 1 FROM Books
+    WHERE id IN (SELECT book_id FROM new_loans WHERE return_date IS NULL)
+    ORDER BY id FOR NO KEY UPDATE;
+
+    IF EXISTS (
+        SELECT 1 FROM Loans l
+        WHERE l.return_date IS NULL
+          AND l.book_id IN (SELECT book_id FROM new_loans WHERE return_date IS NULL)
+        GROUP BY l.book_id
+        HAVING COUNT(*) > 1
+    ) THEN
+        RAISE EXCEPTION 'Book is not available.';
+    END IF;
+
+    UPDATE Books SET available = FALSE
+    WHERE id IN (SELECT book_id FROM new_loans WHERE return_date IS NULL);
+
+    UPDATE BookLoanCounts c SET loan_count = c.loan_count + n.borrowed
+    FROM (SELECT book_id, COUNT(*) AS borrowed FROM new_loans GROUP BY book_id) n
+    WHERE c.book_id = n.book_id;
+
+    PERFORM bump_library_stats(0, 0, (SELECT COUNT(*) FROM new_loans WHERE return_date IS NULL));
+    RETURN NULL;
 END;
 $$ LANGUAGE plpgsql;
 
 CREATE TRIGGER tr_book_borrow AFTER INSERT ON Loans
-FOR EACH ROW EXECUTE FUNCTION update_book_on_borrow();
+REFERENCING NEW TABLE AS new_loans
+FOR EACH STATEMENT EXECUTE FUNCTION update_book_on_borrow();
 
 -- Trigger: Update book availability to TRUE on return
+-- (transition tables can't be combined with UPDATE OF <column>, so the
+-- function picks out the rows whose return_date went from NULL to a date)
 CREATE OR REPLACE FUNCTION update_book_on_return() RETURNS TRIGGER AS $$
+DECLARE
+    returned BIGINT;
 BEGIN
-    IF NEW.return_date IS NOT NULL AND OLD.return_date IS NULL THEN
-        UPDATE Books SET available = TRUE WHERE id = NEW.book_id;
+    SELECT COUNT(*) INTO returned
+    FROM new_loans n JOIN old_loans o ON o.id = n.id
+    WHERE n.return_date IS NOT NULL AND o.return_date IS NULL;
+
+    IF returned > 0 THEN
+        UPDATE Books SET available = TRUE
+        WHERE id IN (
+            SELECT n.book_id FROM new_loans n JOIN old_loans o ON o.id = n.id
+            WHERE n.return_date IS NOT NULL AND o.return_date IS NULL
+        );
+        PERFORM bump_library_stats(0, 0, -returned);
     END IF;
-    RETURN NEW;
+    RETURN NULL;
 END;
 $$ LANGUAGE plpgsql;
 
-CREATE TRIGGER tr_book_return AFTER UPDATE OF return_date ON Loans
-FOR EACH ROW EXECUTE FUNCTION update_book_on_return();
+CREATE TRIGGER tr_book_return AFTER UPDATE ON Loans
+REFERENCING OLD TABLE AS old_loans NEW TABLE AS new_loans
+FOR EACH STATEMENT EXECUTE FUNCTION update_book_on_return();
 
--- Trigger: Max 3 loans
+-- Trigger: Max 3 loans (checked once per statement for every borrower in it,
+-- with the borrowers locked so concurrent borrows can't both pass the check;
+-- FOR NO KEY UPDATE, like the books above, to stay clear of the foreign-key locks)
 CREATE OR REPLACE FUNCTION prevent_excess_loans() RETURNS TRIGGER AS $$
 BEGIN
-    IF (SELECT COUNT(*) FROM Loans WHERE user_id = NEW.user_id AND return_date IS NULL) >= 3 THEN
+    PERFORM 1 FROM Users
+    WHERE id IN (SELECT user_id FROM new_loans WHERE return_date IS NULL)
+    ORDER BY id FOR NO KEY UPDATE;
+
+    IF EXISTS (
+        SELECT 1 FROM Loans l
+        WHERE l.return_date IS NULL
+          AND l.user_id IN (SELECT user_id FROM new_loans WHERE return_date IS NULL)
+        GROUP BY l.user_id
+        HAVING COUNT(*) > 3
+    ) THEN
         RAISE EXCEPTION 'User has reached the maximum limit of 3 active loans.';
     END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER enforce_loan_limit AFTER INSERT ON Loans
+REFERENCING NEW TABLE AS new_loans
+FOR EACH STATEMENT EXECUTE FUNCTION prevent_excess_loans();
+
+-- Trigger: Keep the book counter and per-book loan counts in step with Books, once per statement
+CREATE OR REPLACE FUNCTION track_book_stats() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM bump_library_stats((SELECT COUNT(*) FROM changed_books), 0, 0);
+        INSERT INTO BookLoanCounts (book_id) SELECT id FROM changed_books;
+    ELSE
+        PERFORM bump_library_stats(-(SELECT COUNT(*) FROM changed_books), 0, 0);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER tr_book_stats_ins AFTER INSERT ON Books
+REFERENCING NEW TABLE AS changed_books
+FOR EACH STATEMENT EXECUTE FUNCTION track_book_stats();
+
+CREATE TRIGGER tr_book_stats_del AFTER DELETE ON Books
+REFERENCING OLD TABLE AS changed_books
+FOR EACH STATEMENT EXECUTE FUNCTION track_book_stats();
+
+-- Trigger: Keep the member counter in step with Users (role 2 = Member)
+-- (statement-level like the loan triggers; an UPDATE compares each row's old and new role)
+CREATE OR REPLACE FUNCTION track_member_stats() RETURNS TRIGGER AS $$
+DECLARE
+    delta BIGINT;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT COUNT(*) INTO delta FROM new_users WHERE role_id = 2;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT -COUNT(*) INTO delta FROM old_users WHERE role_id = 2;
+    ELSE
+        SELECT COUNT(*) FILTER (WHERE n.role_id = 2) - COUNT(*) FILTER (WHERE o.role_id = 2) INTO delta
+        FROM new_users n JOIN old_users o ON o.id = n.id;
+    END IF;
+    IF delta <> 0 THEN
+        PERFORM bump_library_stats(0, delta, 0);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER tr_member_stats_ins AFTER INSERT ON Users
+REFERENCING NEW TABLE AS new_users
+FOR EACH STATEMENT EXECUTE FUNCTION track_member_stats();
+
+CREATE TRIGGER tr_member_stats_del AFTER DELETE ON Users
+REFERENCING OLD TABLE AS old_users
+FOR EACH STATEMENT EXECUTE FUNCTION track_member_stats();
+
+CREATE TRIGGER tr_member_stats_upd AFTER UPDATE ON Users
+REFERENCING OLD TABLE AS old_users NEW TABLE AS new_users
+FOR EACH STATEMENT EXECUTE FUNCTION track_member_stats();
+
+-- Trigger: Rebuild a book's search document (title A, authors B, genre C)
+CREATE OR REPLACE FUNCTION refresh_book_search() RETURNS TRIGGER AS $$
+DECLARE
+    author_names TEXT;
+BEGIN
+    SELECT COALESCE(string_agg(a.name, ' ' ORDER BY a.name), '') INTO author_names
+    FROM BookAuthors ba JOIN Authors a ON a.id = ba.author_id
+    WHERE ba.book_id = NEW.id;
+
+    NEW.search_text := concat_ws(' ', NEW.title, author_names, NEW.genre);
+    NEW.search_vector :=
+        setweight(to_tsvector('english', COALESCE(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('english', author_names), 'B') ||
+        setweight(to_tsvector('english', COALESCE(NEW.genre, '')), 'C');
     RETURN NEW;
 END;
 $$ LANGUAGE plpgsql;
 
-CREATE TRIGGER enforce_loan_limit BEFORE INSERT ON Loans
-FOR EACH ROW EXECUTE FUNCTION prevent_excess_loans();
+CREATE TRIGGER tr_book_search BEFORE INSERT OR UPDATE OF title, genre ON Books
+FOR EACH ROW EXECUTE FUNCTION refresh_book_search();
+
+-- Trigger: Re-index the books whose author links change, once per statement, so
+-- a bulk import rewrites each new book once rather than once per author
+-- (a trigger with a transition table can only have one event, hence two)
+CREATE OR REPLACE FUNCTION refresh_book_search_on_link() RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE Books SET title = title WHERE id IN (SELECT book_id FROM changed_links);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER tr_bookauthors_search_ins AFTER INSERT ON BookAuthors
+REFERENCING NEW TABLE AS changed_links
+FOR EACH STATEMENT EXECUTE FUNCTION refresh_book_search_on_link();
+
+CREATE TRIGGER tr_bookauthors_search_del AFTER DELETE ON BookAuthors
+REFERENCING OLD TABLE AS changed_links
+FOR EACH STATEMENT EXECUTE FUNCTION refresh_book_search_on_link();
+
+-- Trigger: Re-index every book by an author who is renamed
+CREATE OR REPLACE FUNCTION refresh_book_search_on_author() RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE Books SET title = title
+    WHERE id IN (SELECT book_id FROM BookAuthors WHERE author_id = NEW.id);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER tr_author_search AFTER UPDATE OF name ON Authors
+FOR EACH ROW EXECUTE FUNCTION refresh_book_search_on_author();
 
 -- 4. INSERT DATA
 
@@ -0,0 +1,86 @@
+"""Nightly Loans partition maintenance (needs migrations/0003_partition_loans.sql).
+
+    python smartlibrary_archive.py                          # archive closed loans older than a year
+    python smartlibrary_archive.py --older-than-days 180 --months-ahead 6
+    python smartlibrary_archive.py --dry-run                # list what would move
+
+Creates the coming months' Loans partitions, then moves the closed loans of
+every monthly partition older than the cutoff into LoansArchive, one partition
+per transaction, and drops partitions that end up empty. Archive partitions
+that received rows are frozen and analyzed afterwards. Schedule it from cron:
+
+    15 3 * * *  cd /opt/smartlibrary && python smartlibrary_archive.py
+"""
+import argparse
+import time
+
+import psycopg2
+
+
+def archive(dao, older_than_days=365, months_ahead=3, dry_run=False, log=print):
+    with dao._cursor(commit=not dry_run) as cursor:
+        if not dry_run:
+            cursor.execute("SELECT ensure_loan_partitions(%s) AS created", (months_ahead,))
+            created = cursor.fetchone()['created']
+            if created:
+                log(f"created {created} upcoming Loans partition(s)")
+        cursor.execute("SELECT partition_name, month_start FROM archivable_loan_partitions(%s * INTERVAL '1 day')",
+                       (older_than_days,))
+        candidates = cursor.fetchall()
+
+    results = []
+    touched_years = set()
+    for row in candidates:
+        if dry_run:
+            log(f"would archive {row['partition_name']}")
+            continue
+        started = time.perf_counter()
+        with dao._cursor(commit=True) as cursor:
+            cursor.execute("SELECT archived, dropped FROM archive_loan_partition(%s)", (row['partition_name'],))
+            result = cursor.fetchone()
+        results.append((row['partition_name'], result['archived'], result['dropped']))
+        if result['archived']:
+            touched_years.add(row['month_start'].year)
+        log(f"{row['partition_name']}: archived {result['archived']} closed loan(s)"
+            f"{', dropped partition' if result['dropped'] else ', kept for loans still out'}"
+            f" ({time.perf_counter() - started:.2f}s)")
+
+    if touched_years:
+        # VACUUM can't run inside a transaction block
+        conn = dao.pool.getconn()
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                for year in sorted(touched_years):
+                    cursor.execute(f"VACUUM (FREEZE, ANALYZE) loans_archive_y{year:04d}")
+        finally:
+            conn.autocommit = False
+            dao.pool.putconn(conn)
+    return results
+
+
+def main():
+    from SmartLibManager_dao import SmartLibManagerDAO
+
+    parser = argparse.ArgumentParser(description="Create upcoming Loans partitions and archive closed loans.")
+    parser.add_argument("--older-than-days", type=int, default=365, help="keep this much closed history in Loans")
+    parser.add_argument("--months-ahead", type=int, default=3, help="create Loans partitions this far ahead")
+    parser.add_argument("--dbname", help="defaults to the DAO's database")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    dao = SmartLibManagerDAO(db_config={"dbname": args.dbname} if args.dbname else None, listen_for_changes=False)
+    try:
+        results = archive(dao, args.older_than_days, args.months_ahead, args.dry_run)
+    except psycopg2.Error as e:
+        print(f"Archiving failed: {(e.pgerror or str(e)).strip()}")
+        raise SystemExit(1)
+    finally:
+        dao.close()
+    if not args.dry_run:
+        print(f"archived {sum(r[1] for r in results)} loan(s) from {len(results)} partition(s), "
+              f"dropped {sum(1 for r in results if r[2])}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,251 @@
+"""Password hashing and in-memory login sessions.
+
+New hashes are argon2id when argon2-cffi is installed, else bcrypt when bcrypt
+is installed, else hashlib.scrypt from the standard library. Rows still holding
+a plaintext password (everything in smart_library.sql) keep working: the first
+successful login replaces them with a hash.
+
+A hash costs tens of milliseconds of CPU on purpose, so PasswordHasher runs
+check_password in a process pool sized to the cores instead of on the caller's
+thread or interpreter. A successful login also gets a session token from
+SessionCache, and checks that present the token skip hashing entirely.
+"""
+import base64
+import hashlib
+import hmac
+import multiprocessing
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+
+try:
+    import argon2
+    from argon2.exceptions import InvalidHashError, VerificationError
+except ImportError:  # optional: pip install argon2-cffi
+    argon2 = None
+
+try:
+    import bcrypt
+except ImportError:  # optional: pip install bcrypt
+    bcrypt = None
+
+# scrypt cost: 16 MiB and roughly 30-50 ms per hash on current hardware
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+BCRYPT_ROUNDS = 12
+
+_argon2 = argon2.PasswordHasher() if argon2 else None
+
+if _argon2:
+    SCHEME = "argon2"
+elif bcrypt:
+    SCHEME = "bcrypt"
+else:
+    SCHEME = "scrypt"
+
+
+def hash_scheme(stored):
+    # 'argon2', 'bcrypt', 'scrypt', or None for a legacy plaintext password
+    if stored.startswith("$argon2"):
+        return "argon2"
+    if stored.startswith(("$2a$", "$2b$", "$2y$")):
+        return "bcrypt"
+    if stored.startswith("scrypt$"):
+        return "scrypt"
+    return None
+
+
+def _b64(data):
+    return base64.b64encode(data).decode("ascii")
+
+
+def _scrypt(password, salt, n, r, p):
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r * p, dklen=32)
+
+
+def hash_password(password):
+    if SCHEME == "argon2":
+        return _argon2.hash(password)
+    if SCHEME == "bcrypt":
+        return bcrypt.hashpw(password.encode(), bcrypt.gensalt(BCRYPT_ROUNDS)).decode("ascii")
+    salt = os.urandom(16)
+    digest = _scrypt(password, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64(salt)}${_b64(digest)}"
+
+
+def _verify(password, stored, scheme):
+    if scheme is None:
+        return hmac.compare_digest(stored.encode(), password.encode())
+    if scheme == "argon2":
+        if _argon2 is None:
+            raise ValueError("This account's password hash needs argon2-cffi (pip install argon2-cffi).")
+        try:
+            return _argon2.verify(stored, password)
+        except (VerificationError, InvalidHashError):
+            return False
+    if scheme == "bcrypt":
+        if bcrypt is None:
+            raise ValueError("This account's password hash needs bcrypt (pip install bcrypt).")
+        return bcrypt.checkpw(password.encode(), stored.encode())
+    try:
+        _, n, r, p, salt, digest = stored.split("$")
+        expected = base64.b64decode(digest)
+        actual = _scrypt(password, base64.b64decode(salt), int(n), int(r), int(p))
+    except ValueError:
+        return False
+    return hmac.compare_digest(actual, expected)
+
+
+def _needs_rehash(stored, scheme):
+    if scheme != SCHEME:
+        return True
+    if scheme == "argon2":
+        return _argon2.check_needs_rehash(stored)
+    if scheme == "scrypt":
+        return stored.split("$")[1:4] != [str(SCRYPT_N), str(SCRYPT_R), str(SCRYPT_P)]
+    return False
+
+
+def check_password(password, stored):
+    # Returns (ok, new_hash). new_hash is set when the password was right but is
+    # stored as plaintext or with an outdated scheme/cost, and should replace it.
+    scheme = hash_scheme(stored)
+    if not _verify(password, stored, scheme):
+        return False, None
+    return True, hash_password(password) if _needs_rehash(stored, scheme) else None
+
+
+def _mp_context():
+    # The DAO already runs threads (cache listener, Qt workers), which fork() doesn't mix with
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+class PasswordHasher:
+    """Runs check_password/hash_password in a pool of worker processes.
+
+    The pool starts on first use (or start()), with one process per core by
+    default; workers=0 hashes on the calling thread instead. Calls block the
+    calling thread, which in the app is a DaoExecutor worker, never the UI.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self._lock = threading.Lock()
+        self._pool = None
+        self.checks = 0
+        self.failures = 0
+        self.upgrades = 0
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(self.workers, mp_context=_mp_context())
+            return self._pool
+
+    def start(self):
+        # Spin the workers up ahead of the first login; returns immediately
+        if self.workers:
+            pool = self._executor()
+            for _ in range(self.workers):
+                pool.submit(os.getpid)
+
+    def _submit(self, fn, *args):
+        if self.workers:
+            return self._executor().submit(fn, *args)
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def submit_check(self, password, stored):
+        # Future of check_password's (ok, new_hash); asyncio callers wrap it with asyncio.wrap_future
+        future = self._submit(check_password, password, stored)
+        future.add_done_callback(self._count)
+        return future
+
+    def _count(self, future):
+        if future.cancelled() or future.exception() is not None:
+            return
+        ok, new_hash = future.result()
+        with self._lock:
+            self.checks += 1
+            if not ok:
+                self.failures += 1
+            elif new_hash:
+                self.upgrades += 1
+
+    def check(self, password, stored):
+        return self.submit_check(password, stored).result()
+
+    def hash(self, password):
+        return self._submit(hash_password, password).result()
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def stats(self):
+        return {"scheme": SCHEME, "workers": self.workers, "checks": self.checks,
+                "failures": self.failures, "upgrades": self.upgrades}
+
+
+class SessionCache:
+    """Thread-safe map of random session tokens to the user row they were issued for.
+
+    A token is valid for ttl seconds after it was issued; past maxsize live
+    sessions the oldest are dropped. Nothing is persisted, so restarting the
+    process logs everyone out.
+    """
+
+    def __init__(self, ttl=900.0, maxsize=10000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()  # token -> (row, expires_at)
+        self.issued = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def issue(self, row):
+        token = secrets.token_urlsafe(32)
+        with self._lock:
+            self._sessions[token] = (row, time.monotonic() + self.ttl)
+            self.issued += 1
+            while len(self._sessions) > self.maxsize:
+                self._sessions.popitem(last=False)
+                self.evictions += 1
+        return token
+
+    def get(self, token):
+        with self._lock:
+            entry = self._sessions.get(token)
+            if entry is not None:
+                if time.monotonic() < entry[1]:
+                    self.hits += 1
+                    return entry[0]
+                del self._sessions[token]
+            self.misses += 1
+            return None
+
+    def revoke(self, token):
+        with self._lock:
+            self._sessions.pop(token, None)
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._sessions), "issued": self.issued, "hits": self.hits,
+                    "misses": self.misses, "evictions": self.evictions}
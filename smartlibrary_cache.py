@@ -0,0 +1,140 @@
+import select
+import threading
+import time
+from collections import OrderedDict
+
+import psycopg2
+from psycopg2 import extensions
+
+CHANNEL = "smartlibrary_cache"
+
+
+class ReadThroughCache:
+    """Thread-safe LRU + TTL cache keyed by (entity, ...) tuples.
+
+    Entries are dropped when they are least recently used past maxsize, when they
+    are older than ttl seconds, or when their entity (or exact key) is
+    invalidated. A load that races with an invalidation of its entity is
+    returned to the caller but not stored, so a stale result never sticks.
+    """
+
+    def __init__(self, maxsize=512, ttl=300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (value, expires_at)
+        self._versions = {}  # entity -> bumped on every invalidation
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get_or_load(self, key, loader):
+        entity = key[0]
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if time.monotonic() < expires_at:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            version = self._versions.get(entity, 0)
+
+        value = loader()
+
+        with self._lock:
+            if self._versions.get(entity, 0) == version:
+                self._entries[key] = (value, time.monotonic() + self.ttl)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return value
+
+    def invalidate(self, entity, key=None):
+        # Drops one exact key, or every key of the entity when key is None
+        with self._lock:
+            self._versions[entity] = self._versions.get(entity, 0) + 1
+            if key is not None:
+                dropped = [key] if key in self._entries else []
+            else:
+                dropped = [k for k in self._entries if k[0] == entity]
+            for k in dropped:
+                del self._entries[k]
+            self.invalidations += len(dropped)
+
+    def clear(self):
+        with self._lock:
+            for entity in {k[0] for k in self._entries} | set(self._versions):
+                self._versions[entity] = self._versions.get(entity, 0) + 1
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+class CacheInvalidationListener(threading.Thread):
+    """LISTENs on the smartlibrary_cache channel and hands payloads to on_notify.
+
+    Runs on its own autocommit connection outside the pool. If the connection
+    drops or on_notify raises, notifications may have been missed, so on_reset
+    is called (the DAO clears its caches) before listening again.
+    """
+
+    def __init__(self, db_config, on_notify, on_reset, poll_interval=5.0, retry_delay=2.0):
+        super().__init__(name="cache-invalidation", daemon=True)
+        self.db_config = db_config
+        self.on_notify = on_notify
+        self.on_reset = on_reset
+        self.poll_interval = poll_interval
+        self.retry_delay = retry_delay
+        self._stop_event = threading.Event()
+        self.notifications = 0
+        self.reconnects = 0
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(**self.db_config)
+                conn.set_isolation_level(extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cursor:
+                    cursor.execute(f"LISTEN {CHANNEL}")
+                while not self._stop_event.is_set():
+                    if select.select([conn], [], [], self.poll_interval) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        self.notifications += 1
+                        self.on_notify(notify.payload)
+            except Exception as e:  # a dropped socket can also surface as OSError/ValueError from select
+                if self._stop_event.is_set():
+                    break
+                print(f"Cache listener failed ({e!r}); clearing caches and retrying.")
+                self.reconnects += 1
+                self.on_reset()
+                self._stop_event.wait(self.retry_delay)
+            finally:
+                if conn is not None and not conn.closed:
+                    conn.close()
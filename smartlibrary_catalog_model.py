@@ -0,0 +1,108 @@
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QVariant, pyqtSignal
+from PyQt5.QtGui import QColor
+
+
+class CatalogTableModel(QAbstractTableModel):
+    """Catalog rows pulled page by page from SmartLibManagerDAO.iter_books.
+
+    The view asks canFetchMore/fetchMore as the user scrolls, so only the pages
+    that have been looked at are ever materialised. With an executor, pages are
+    fetched off the GUI thread and a new load() supersedes any page in flight.
+    page_loaded is emitted whenever a fetch settles, including the empty or
+    failed fetch that ends the catalog.
+    """
+
+    page_loaded = pyqtSignal()
+
+    HEADERS = ["ID", "Title", "Genre", "Year", "Status"]
+    AVAILABLE_COLOR = QColor("#4CAF50")
+    BORROWED_COLOR = QColor("#F44336")
+
+    def __init__(self, dao, executor=None, page_size=200, parent=None):
+        super().__init__(parent)
+        self.dao = dao
+        self.executor = executor
+        self.page_size = page_size
+        self._books = []
+        self._pages = None  # generator of lists of Book
+        self._fetching = False
+
+    def load(self, search_query=""):
+        self.beginResetModel()
+        self._books = []
+        self._pages = self.dao.iter_books(search_query, page_size=self.page_size)
+        self._fetching = False
+        self.endResetModel()
+        self.fetchMore(QModelIndex())  # first page, so the view paints something right away
+
+    def book_at(self, row):
+        return self._books[row]
+
+    # --- QAbstractTableModel ---
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._books)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return QVariant()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return QVariant()
+        b = self._books[index.row()]
+        col = index.column()
+        if role == Qt.DisplayRole:
+            if col == 0:
+                return str(b.id)
+            if col == 1:
+                return b.title
+            if col == 2:
+                return b.genre
+            if col == 3:
+                return str(b.publication_year)
+            return "Available" if b.available else "Borrowed"
+        if role == Qt.BackgroundRole and col == 4:
+            return self.AVAILABLE_COLOR if b.available else self.BORROWED_COLOR
+        return QVariant()
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._pages is not None and not self._fetching
+
+    def fetchMore(self, parent=QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+        pages = self._pages
+        if self.executor is None:
+            self._append_page(pages, next(pages, None))
+            return
+        self._fetching = True
+        self.executor.submit("catalog", next, pages, None, span="catalog_page",
+                             on_result=lambda page: self._append_page(pages, page),
+                             on_error=lambda e: self._fetch_failed(pages, e))
+
+    def _append_page(self, pages, page):
+        if pages is not self._pages:
+            return  # a newer load() replaced this generator
+        self._fetching = False
+        if not page:
+            self._pages = None
+            self.page_loaded.emit()
+            return
+        first = len(self._books)
+        self.beginInsertRows(QModelIndex(), first, first + len(page) - 1)
+        self._books.extend(page)
+        self.endInsertRows()
+        if len(page) < self.page_size:
+            self._pages = None
+        self.page_loaded.emit()
+
+    def _fetch_failed(self, pages, error):
+        if pages is self._pages:
+            self._fetching = False
+            self._pages = None
+            print(f"Error loading catalog: {error}")
+            self.page_loaded.emit()
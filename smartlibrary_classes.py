@@ -1,6 +1,12 @@
 import datetime
 
+# Models use __slots__: no per-instance __dict__, so large result sets (the catalog)
+# cost a fraction of the memory. Constructor argument order matches the column
+# order of the DAO's SELECTs, so tuple rows map straight in with Model(*row).
+
 class User:
+    __slots__ = ("_id", "_username", "_password_hash", "_role_id", "_email", "_full_name")
+
     def __init__(self, id, username, password_hash, role_id, email, full_name):
         self._id = id
         self._username = username
@@ -21,16 +27,22 @@ class User:
     def email(self): return self._email
 
 class Member(User):
+    __slots__ = ()
+
     def __init__(self, id, username, password_hash, role_id, email, full_name):
         super().__init__(id, username, password_hash, role_id, email, full_name)
         # Note: loan_count is calculated via SQL, not stored permanently in the object
         # to ensure data consistency with the database.
 
 class Librarian(User):
+    __slots__ = ()
+
     def __init__(self, id, username, password_hash, role_id, email, full_name):
         super().__init__(id, username, password_hash, role_id, email, full_name)
 
 class Book:
+    __slots__ = ("_id", "_title", "_genre", "_publication_year", "_available")
+
     def __init__(self, id, title, genre, publication_year, available=True):
         self._id = id
         self._title = title
@@ -50,6 +62,8 @@ class Book:
     def available(self): return self._available
 
 class BookClub:
+    __slots__ = ("_id", "_name", "_description", "_created_by")
+
     def __init__(self, id, name, description, created_by):
         self._id = id
         self._name = name
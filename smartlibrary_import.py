@@ -0,0 +1,272 @@
+"""Streaming bulk import of books (CSV, JSONL or MARC-like text) via COPY.
+
+    python smartlibrary_import.py branch_collection.csv --batch-size 5000
+
+Records flow through a generator pipeline (read -> validate -> batch), each
+batch is COPY'd into a temporary staging table and merged into Books, Authors
+and BookAuthors in one statement per table. Rows that fail validation are
+reported with their line number and skipped; the rest of the batch still loads.
+A batch the database rejects is split in half and retried until the failing
+rows are isolated, so those are reported line by line too.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import time
+
+import psycopg2
+
+MAX_TITLE = 200
+MAX_GENRE = 50
+MAX_AUTHOR = 100
+AUTHOR_SEPARATOR = "|"
+
+
+class ImportReport:
+    def __init__(self):
+        self.rows_read = 0
+        self.rows_staged = 0
+        self.books_inserted = 0
+        self.duplicates = 0
+        self.errors = []  # (line_no, message)
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows_read / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        return (f"read {self.rows_read}, inserted {self.books_inserted}, duplicates {self.duplicates}, "
+                f"errors {len(self.errors)} in {self.elapsed:.1f}s ({self.rows_per_second:.0f} rows/s)")
+
+
+# --- READERS (yield (line_no, raw dict)) ---
+def read_csv(stream):
+    # Header row: title,genre,publication_year[,authors] with authors separated by '|'
+    for line_no, row in enumerate(csv.DictReader(stream), start=2):
+        yield line_no, row
+
+
+def read_jsonl(stream):
+    for line_no, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_no, json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_no, {"_error": f"invalid JSON: {e.msg}"}
+
+
+MARC_FIELDS = {"245": "title", "100": "authors", "700": "authors", "650": "genre", "260": "publication_year"}
+
+
+def read_marc(stream):
+    # Blank-line separated records of "TAG $a value" lines, e.g.
+    #   245 $a Dune
+    #   100 $a Frank Herbert
+    #   650 $a Sci-Fi
+    #   260 $c 1965
+    record, start = {}, None
+    for line_no, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            if record:
+                yield start, record
+            record, start = {}, None
+            continue
+        start = start or line_no
+        tag, _, rest = line.partition(" ")
+        field = MARC_FIELDS.get(tag)
+        if not field:
+            continue
+        value = rest.split("$", 1)[-1][1:].strip() if "$" in rest else rest.strip()
+        if field == "authors":
+            record.setdefault("authors", []).append(value)
+        else:
+            record.setdefault(field, value)
+    if record:
+        yield start, record
+
+
+READERS = {"csv": read_csv, "jsonl": read_jsonl, "marc": read_marc}
+
+
+# --- PIPELINE STAGES ---
+def validate(rows, report):
+    for line_no, raw in rows:
+        report.rows_read += 1
+        if "_error" in raw:
+            report.errors.append((line_no, raw["_error"]))
+            continue
+        title = (raw.get("title") or "").strip()
+        genre = (raw.get("genre") or "").strip() or None
+        year = raw.get("publication_year")
+        authors = raw.get("authors") or []
+        if isinstance(authors, str):
+            authors = authors.split(AUTHOR_SEPARATOR)
+        authors = [a.strip().replace(AUTHOR_SEPARATOR, " ") for a in authors if a and a.strip()]
+
+        if not title:
+            report.errors.append((line_no, "missing title"))
+            continue
+        if len(title) > MAX_TITLE:
+            report.errors.append((line_no, f"title longer than {MAX_TITLE} characters"))
+            continue
+        if genre and len(genre) > MAX_GENRE:
+            report.errors.append((line_no, f"genre longer than {MAX_GENRE} characters"))
+            continue
+        if any(len(a) > MAX_AUTHOR for a in authors):
+            report.errors.append((line_no, f"author name longer than {MAX_AUTHOR} characters"))
+            continue
+        if year in (None, ""):
+            year = None
+        else:
+            try:
+                year = int(year)
+            except (TypeError, ValueError):
+                report.errors.append((line_no, f"invalid publication_year {year!r}"))
+                continue
+        yield line_no, title, genre, year, AUTHOR_SEPARATOR.join(authors)
+
+
+def batched(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class BookImporter:
+    STAGING_DDL = """
+        CREATE TEMP TABLE IF NOT EXISTS book_import_staging (
+            line_no INT,
+            title TEXT,
+            genre TEXT,
+            publication_year INT,
+            authors TEXT
+        ) ON COMMIT DELETE ROWS
+    """
+
+    MERGE_AUTHORS = """
+        INSERT INTO Authors (name)
+        SELECT DISTINCT trim(n) FROM book_import_staging s,
+               unnest(string_to_array(s.authors, '|')) n
+        WHERE trim(n) <> ''
+        ON CONFLICT (name) DO NOTHING
+    """
+
+    # Deduplicate on (lower(title), publication_year) against the catalog and within the batch
+    MERGE_BOOKS = """
+        INSERT INTO Books (title, genre, publication_year)
+        SELECT title, genre, publication_year FROM (
+            SELECT DISTINCT ON (lower(s.title), s.publication_year) s.line_no, s.title, s.genre, s.publication_year
+            FROM book_import_staging s
+            WHERE NOT EXISTS (
+                SELECT 1 FROM Books b
+                WHERE lower(b.title) = lower(s.title)
+                  AND b.publication_year IS NOT DISTINCT FROM s.publication_year
+            )
+            ORDER BY lower(s.title), s.publication_year, s.line_no
+        ) fresh
+        ORDER BY line_no
+    """
+
+    MERGE_LINKS = """
+        INSERT INTO BookAuthors (book_id, author_id)
+        SELECT DISTINCT b.id, a.id
+        FROM book_import_staging s
+        JOIN Books b ON lower(b.title) = lower(s.title)
+                    AND b.publication_year IS NOT DISTINCT FROM s.publication_year
+        CROSS JOIN unnest(string_to_array(s.authors, '|')) n
+        JOIN Authors a ON a.name = trim(n)
+        ON CONFLICT DO NOTHING
+    """
+
+    def __init__(self, dao, batch_size=5000, progress=None):
+        self.dao = dao
+        self.batch_size = batch_size
+        self.progress = progress  # called with the ImportReport after every batch
+
+    def import_file(self, path, fmt=None):
+        fmt = fmt or os.path.splitext(path)[1].lstrip(".").lower()
+        if fmt not in READERS:
+            raise ValueError(f"Unsupported import format '{fmt}' (use csv, jsonl or marc).")
+        with open(path, newline="", encoding="utf-8") as stream:
+            return self.import_rows(READERS[fmt](stream))
+
+    def import_rows(self, rows):
+        report = ImportReport()
+        with self.dao.metrics.operation("import_books"):
+            for batch in batched(validate(rows, report), self.batch_size):
+                self._load(batch, report)
+                report.elapsed = time.perf_counter() - report.started
+                if self.progress:
+                    self.progress(report)
+        report.elapsed = time.perf_counter() - report.started
+        self.dao.cache.invalidate("books")
+        self.dao.invalidate_dashboard()
+        return report
+
+    def _load(self, batch, report):
+        try:
+            self._load_batch(batch, report)
+        except psycopg2.Error as e:
+            if len(batch) == 1:
+                message = (e.pgerror or str(e)).split('\n')[0].replace('ERROR:', '').strip()
+                report.errors.append((batch[0][0], message))
+                return
+            middle = len(batch) // 2
+            self._load(batch[:middle], report)
+            self._load(batch[middle:], report)
+
+    def _load_batch(self, batch, report):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for line_no, title, genre, year, authors in batch:
+            writer.writerow((line_no, title, genre if genre is not None else "", "" if year is None else year, authors))
+        buffer.seek(0)
+
+        with self.dao._cursor(commit=True) as cursor:
+            cursor.execute(self.STAGING_DDL)
+            cursor.copy_expert(
+                "COPY book_import_staging (line_no, title, genre, publication_year, authors) "
+                "FROM STDIN WITH (FORMAT csv)", buffer)
+            cursor.execute(self.MERGE_AUTHORS)
+            cursor.execute(self.MERGE_BOOKS)
+            inserted = cursor.rowcount
+            cursor.execute(self.MERGE_LINKS)
+
+        report.rows_staged += len(batch)
+        report.books_inserted += inserted
+        report.duplicates += len(batch) - inserted
+
+
+def main():
+    from SmartLibManager_dao import SmartLibManagerDAO
+
+    parser = argparse.ArgumentParser(description="Bulk import books into SmartLibrary.")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=sorted(READERS), help="defaults to the file extension")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    dao = SmartLibManagerDAO()
+    importer = BookImporter(dao, args.batch_size, progress=lambda r: print(f"\r{r}", end="", flush=True))
+    report = importer.import_file(args.path, args.format)
+    print(f"\r{report}")
+    for line_no, message in report.errors[:50]:
+        print(f"  line {line_no}: {message}")
+    if len(report.errors) > 50:
+        print(f"  ... and {len(report.errors) - 50} more")
+    dao.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,344 @@
+"""Latency histograms, counters and a slow-query log for the DAO, the UI and the service.
+
+SmartLibManagerDAO hands out InstrumentedDictCursor / InstrumentedCursor, which
+time every statement and count the rows and (approximate) bytes fetched, all
+labelled with the DAO method running them (see timed()). Statements slower than
+Metrics.slow_query_seconds are logged with their SQL and EXPLAIN plan.
+Metrics.to_prometheus() renders everything in the Prometheus text format.
+"""
+import functools
+import inspect
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import extensions
+from psycopg2.extras import RealDictCursor
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+METRIC_HELP = {
+    "query_seconds": ("histogram", "Wall time of each SQL statement, by the DAO method that ran it."),
+    "queries_total": ("counter", "SQL statements executed."),
+    "query_errors_total": ("counter", "SQL statements that raised an error."),
+    "query_rows_total": ("counter", "Rows fetched from the server."),
+    "query_bytes_total": ("counter", "Approximate bytes of row data fetched (text/bytes length, 8 per other value)."),
+    "query_rows_affected_total": ("counter", "Rows inserted, updated or deleted."),
+    "slow_queries_total": ("counter", "Statements slower than the slow-query threshold."),
+    "dao_method_seconds": ("histogram", "Wall time of SmartLibManagerDAO methods."),
+    "dao_method_errors_total": ("counter", "SmartLibManagerDAO methods that raised."),
+    "ui_span_seconds": ("histogram", "UI handler spans: queue (click to worker), dao, render and total."),
+    "ui_errors_total": ("counter", "Background UI tasks that failed."),
+    "http_request_seconds": ("histogram", "smartlibrary_service request latency by route and status."),
+    "startup_seconds": ("histogram", "Desktop app startup milestones, in seconds since launch."),
+}
+
+_EXPLAINABLE = re.compile(r"^\s*(SELECT|WITH|INSERT|UPDATE|DELETE|VALUES|EXECUTE)\b", re.IGNORECASE)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "count", "sum")
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation
+        if not self.count:
+            return 0.0
+        target, seen = q * self.count, 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= target:
+                return bound
+        return float("inf")
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _render_labels(labels, extra=None):
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _row_bytes(row):
+    values = row.values() if isinstance(row, dict) else row
+    return sum(len(v) if isinstance(v, (str, bytes)) else 8 for v in values)
+
+
+class Metrics:
+    """Thread-safe registry of counters and histograms keyed by (name, labels).
+
+    slow_query_seconds=None turns the slow-query log off. Slow entries are kept
+    in slow_queries (most recent 100) and appended to slow_query_log when it is a
+    file path; otherwise a one-line summary is printed.
+    """
+
+    def __init__(self, slow_query_seconds=0.2, explain_slow_queries=True, slow_query_log=None, prefix="smartlibrary"):
+        self.slow_query_seconds = slow_query_seconds
+        self.explain_slow_queries = explain_slow_queries
+        self.slow_query_log = slow_query_log
+        self.prefix = prefix
+        self.slow_queries = deque(maxlen=100)
+        self._lock = threading.Lock()
+        self._histograms = {}  # (name, ((label, value), ...)) -> Histogram
+        self._counters = {}  # (name, ((label, value), ...)) -> number
+        self._local = threading.local()
+
+    # --- RECORDING ---
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    @property
+    def current_operation(self):
+        return getattr(self._local, "operation", None) or "other"
+
+    @contextmanager
+    def operation(self, name):
+        # Labels the queries run inside it; nested operations count towards the outermost one
+        if getattr(self._local, "operation", None):
+            yield
+            return
+        self._local.operation = name
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.inc("dao_method_errors_total", method=name)
+            raise
+        finally:
+            self._local.operation = None
+            self.observe("dao_method_seconds", time.perf_counter() - started, method=name)
+
+    def record_query(self, cursor, elapsed):
+        operation = self.current_operation
+        self.observe("query_seconds", elapsed, operation=operation)
+        self.inc("queries_total", operation=operation)
+        if cursor.description is None and cursor.rowcount > 0:
+            self.inc("query_rows_affected_total", cursor.rowcount, operation=operation)
+        if self.slow_query_seconds is not None and elapsed >= self.slow_query_seconds:
+            self._log_slow(cursor, elapsed, operation)
+
+    def record_rows(self, rows):
+        if rows:
+            operation = self.current_operation
+            self.inc("query_rows_total", len(rows), operation=operation)
+            self.inc("query_bytes_total", sum(_row_bytes(r) for r in rows), operation=operation)
+
+    def _log_slow(self, cursor, elapsed, operation):
+        sql = cursor.query.decode(errors="replace") if isinstance(cursor.query, bytes) else str(cursor.query or "")
+        plan = explain(cursor.connection, sql) if self.explain_slow_queries else None
+        self.slow_queries.append({"operation": operation, "seconds": elapsed, "sql": sql, "plan": plan,
+                                  "at": time.time()})
+        self.inc("slow_queries_total", operation=operation)
+        summary = f"Slow query ({elapsed * 1000:.0f} ms) in {operation}: {' '.join(sql.split())[:200]}"
+        if not self.slow_query_log:
+            print(summary)
+            return
+        with open(self.slow_query_log, "a", encoding="utf-8") as f:
+            f.write(f"-- {time.strftime('%Y-%m-%d %H:%M:%S')} {summary[:summary.index(':')]}\n{sql.strip()}\n")
+            if plan:
+                f.write("\n".join(f"--   {line}" for line in plan.splitlines()) + "\n")
+            f.write("\n")
+
+    # --- EXPORT ---
+    def summary(self):
+        # [(name, labels dict, count, mean, p50, p95, p99)] for quick inspection
+        with self._lock:
+            return [(name, dict(labels), h.count, h.sum / h.count if h.count else 0.0,
+                     h.quantile(0.5), h.quantile(0.95), h.quantile(0.99))
+                    for (name, labels), h in sorted(self._histograms.items())]
+
+    def to_prometheus(self, gauges=None):
+        # gauges: {name: value} or {name: [(labels dict, value), ...]} sampled by the caller
+        with self._lock:
+            histograms = {k: (list(h.counts), h.count, h.sum, h.buckets) for k, h in self._histograms.items()}
+            counters = dict(self._counters)
+
+        lines = []
+        by_name = {}
+        for (name, labels) in list(histograms) + list(counters):
+            by_name.setdefault(name, []).append(labels)
+        for name in sorted(by_name):
+            is_histogram = (name, by_name[name][0]) in histograms
+            kind, text = METRIC_HELP.get(name, ("histogram" if is_histogram else "counter", name))
+            full = f"{self.prefix}_{name}"
+            lines.append(f"# HELP {full} {text}")
+            lines.append(f"# TYPE {full} {kind}")
+            for labels in sorted(by_name[name]):
+                if (name, labels) in histograms:
+                    counts, count, total, buckets = histograms[(name, labels)]
+                    cumulative = 0
+                    for bound, n in zip(buckets + (float("inf"),), counts):
+                        cumulative += n
+                        le = "+Inf" if bound == float("inf") else repr(bound)
+                        lines.append(f"{full}_bucket{_render_labels(labels, ('le', le))} {cumulative}")
+                    lines.append(f"{full}_sum{_render_labels(labels)} {total}")
+                    lines.append(f"{full}_count{_render_labels(labels)} {count}")
+                else:
+                    lines.append(f"{full}{_render_labels(labels)} {counters[(name, labels)]}")
+
+        for name, value in sorted((gauges or {}).items()):
+            full = f"{self.prefix}_{name}"
+            lines.append(f"# TYPE {full} gauge")
+            samples = value if isinstance(value, list) else [({}, value)]
+            for labels, sample in samples:
+                lines.append(f"{full}{_render_labels(sorted(labels.items()))} {float(sample)}")
+        return "\n".join(lines) + "\n"
+
+
+def explain(conn, sql):
+    # Plan (without ANALYZE) of an already-run statement, inside a savepoint so a
+    # failing EXPLAIN cannot abort the caller's transaction.
+    if not _EXPLAINABLE.match(sql):
+        return None
+    in_transaction = conn.get_transaction_status() == extensions.TRANSACTION_STATUS_INTRANS
+    with conn.cursor() as cursor:
+        try:
+            if in_transaction:
+                cursor.execute("SAVEPOINT slow_query_explain")
+            cursor.execute("EXPLAIN " + sql)
+            plan = "\n".join(row[0] for row in cursor.fetchall())
+            if in_transaction:
+                cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+            return plan
+        except psycopg2.Error as e:
+            if in_transaction:
+                cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+            return f"EXPLAIN failed: {str(e).strip()}"
+
+
+class StartupProfiler:
+    """Milestones of one app launch, in seconds since started (a perf_counter()
+    value taken before the heavy imports). Each phase is recorded once, in
+    order, and also observed as startup_seconds{phase=...} once metrics is set.
+    """
+
+    def __init__(self, started, metrics=None):
+        self.started = started
+        self.metrics = metrics
+        self.marks = {}  # phase -> seconds since started
+
+    def mark(self, phase):
+        if phase not in self.marks:
+            self.marks[phase] = time.perf_counter() - self.started
+            if self.metrics:
+                self.metrics.observe("startup_seconds", self.marks[phase], phase=phase)
+        return self.marks[phase]
+
+    def report(self):
+        return "startup: " + ", ".join(f"{phase} {seconds:.3f}s" for phase, seconds in self.marks.items())
+
+
+def timed(method):
+    """Times a SmartLibManagerDAO method and labels the queries it runs with its name.
+
+    Generator methods are timed per item, so a paged iterator reports one
+    observation per page rather than the time the caller spent between pages.
+    """
+    name = method.__name__
+    if inspect.isgeneratorfunction(method):
+        @functools.wraps(method)
+        def generator_wrapper(self, *args, **kwargs):
+            items = method(self, *args, **kwargs)
+            while True:
+                with self.metrics.operation(name):
+                    item = next(items, StopIteration)
+                if item is StopIteration:
+                    return
+                yield item
+        return generator_wrapper
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.metrics.operation(name):
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+# --- CURSORS ---
+class InstrumentedCursorMixin:
+    metrics = None  # set per cursor by SmartLibManagerDAO._cursor
+
+    def execute(self, query, vars=None):
+        if self.metrics is None:
+            return super().execute(query, vars)
+        started = time.perf_counter()
+        try:
+            result = super().execute(query, vars)
+        except psycopg2.Error:
+            self.metrics.inc("query_errors_total", operation=self.metrics.current_operation)
+            raise
+        self.metrics.record_query(self, time.perf_counter() - started)
+        return result
+
+    def copy_expert(self, sql, file, size=8192):
+        if self.metrics is None:
+            return super().copy_expert(sql, file, size)
+        started = time.perf_counter()
+        try:
+            return super().copy_expert(sql, file, size)
+        finally:
+            operation = self.metrics.current_operation
+            self.metrics.observe("query_seconds", time.perf_counter() - started, operation=operation)
+            self.metrics.inc("queries_total", operation=operation)
+
+    def fetchone(self):
+        row = super().fetchone()
+        if self.metrics is not None and row is not None:
+            self.metrics.record_rows([row])
+        return row
+
+    def fetchmany(self, size=None):
+        rows = super().fetchmany(size) if size is not None else super().fetchmany()
+        if self.metrics is not None:
+            self.metrics.record_rows(rows)
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        if self.metrics is not None:
+            self.metrics.record_rows(rows)
+        return rows
+
+    def __iter__(self):
+        # Through fetchmany so rows are counted; FETCH FORWARD itersize on named cursors
+        while True:
+            rows = self.fetchmany(self.itersize)
+            if not rows:
+                return
+            yield from rows
+
+
+class InstrumentedDictCursor(InstrumentedCursorMixin, RealDictCursor):
+    pass
+
+
+class InstrumentedCursor(InstrumentedCursorMixin, extensions.cursor):
+    pass
@@ -0,0 +1,66 @@
+"""Apply the versioned SQL migrations in migrations/ that the database hasn't seen yet.
+
+    python smartlibrary_migrate.py           # apply everything pending
+    python smartlibrary_migrate.py --list    # show applied/pending versions
+
+Each file runs in its own transaction and is recorded in SchemaMigrations, so
+running the script again is a no-op.
+"""
+import argparse
+import os
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+
+def available_migrations():
+    return sorted(f for f in os.listdir(MIGRATIONS_DIR) if f.endswith(".sql"))
+
+
+def applied_migrations(dao):
+    with dao._cursor(commit=True) as cursor:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS SchemaMigrations (
+                version VARCHAR(100) PRIMARY KEY,
+                applied_at TIMESTAMP NOT NULL DEFAULT now()
+            )
+        """)
+        cursor.execute("SELECT version FROM SchemaMigrations")
+        return {row['version'] for row in cursor.fetchall()}
+
+
+def migrate(dao, log=print):
+    done = applied_migrations(dao)
+    applied = []
+    for version in available_migrations():
+        if version in done:
+            continue
+        with open(os.path.join(MIGRATIONS_DIR, version), encoding="utf-8") as f:
+            sql = f.read()
+        with dao._cursor(commit=True) as cursor:
+            cursor.execute(sql)
+            cursor.execute("INSERT INTO SchemaMigrations (version) VALUES (%s)", (version,))
+        log(f"applied {version}")
+        applied.append(version)
+    return applied
+
+
+def main():
+    from SmartLibManager_dao import SmartLibManagerDAO
+
+    parser = argparse.ArgumentParser(description="Apply SmartLibrary schema migrations.")
+    parser.add_argument("--dbname", help="override the database name from SmartLibManager_dao.py")
+    parser.add_argument("--list", action="store_true")
+    args = parser.parse_args()
+
+    dao = SmartLibManagerDAO(db_config={"dbname": args.dbname} if args.dbname else None)
+    if args.list:
+        done = applied_migrations(dao)
+        for version in available_migrations():
+            print(f"{'applied' if version in done else 'pending'}  {version}")
+    elif not migrate(dao):
+        print("database is up to date")
+    dao.close()
+
+
+if __name__ == '__main__':
+    main()
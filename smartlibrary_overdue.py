@@ -0,0 +1,228 @@
+"""Nightly overdue-loan job: fines and notices (needs migrations/0004_overdue_notices.sql).
+
+    python smartlibrary_overdue.py                        # notices as of today
+    python smartlibrary_overdue.py --as-of 2026-03-01 --workers 8 --batch-size 2000
+    python smartlibrary_overdue.py --restart              # redo today's run from the first loan
+
+Overdue loans are streamed, joined with their patron and book, through a named
+(server-side) cursor that fetches itersize rows at a time, so memory stays flat
+however many loans are overdue. Rows are grouped into batches whose fines and
+notices are written by a pool of worker threads, each batch in its own
+transaction. Notices are keyed by (loan, run date), so re-running a date never
+duplicates one, and OverdueRuns records how far the run got: an interrupted run
+picks up after the last loan whose batch (and every batch before it) committed.
+
+    30 2 * * *  cd /opt/smartlibrary && python smartlibrary_overdue.py
+"""
+import argparse
+import datetime
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+from smartlibrary_import import batched
+
+FINE_PER_DAY = Decimal("0.25")
+MAX_FINE = Decimal("10.00")
+GRACE_DAYS = 0
+RUN_LOCK_KEY = 4170017  # pg_advisory_lock key: one run at a time per database
+
+
+def compute_fine(days_overdue):
+    chargeable = max(0, days_overdue - GRACE_DAYS)
+    return min(MAX_FINE, FINE_PER_DAY * chargeable)
+
+
+def notice_message(full_name, title, due_date, days_overdue, fine):
+    return (f"Dear {full_name}, '{title}' was due on {due_date:%Y-%m-%d} and is {days_overdue} "
+            f"day{'s' if days_overdue != 1 else ''} overdue. Your current fine is ${fine:.2f}.")
+
+
+class OverdueReport:
+    def __init__(self, as_of, resumed_after=0):
+        self.as_of = as_of
+        self.resumed_after = resumed_after  # last_loan_id of the checkpoint this run started from
+        self.rows = 0
+        self.notices = 0
+        self.batches = 0
+        self.fines = Decimal("0.00")
+        self.already_done = False
+        self.interrupted = False
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        if self.already_done:
+            return f"run for {self.as_of} already finished; nothing to do (use --restart to redo it)"
+        resumed = f" (resumed after loan {self.resumed_after})" if self.resumed_after else ""
+        return (f"{self.as_of}: {self.rows} overdue loans, {self.notices} new notices, fines ${self.fines:.2f}, "
+                f"{self.batches} batches in {self.elapsed:.1f}s ({self.rows_per_second:.0f} rows/s){resumed}")
+
+
+class OverdueProcessor:
+    OVERDUE_SQL = """
+        SELECT l.id, l.user_id, u.full_name, l.book_id, b.title, l.due_date
+        FROM Loans l
+        JOIN Users u ON u.id = l.user_id
+        JOIN Books b ON b.id = l.book_id
+        WHERE l.return_date IS NULL AND l.due_date < %(as_of)s AND l.id > %(after)s
+        ORDER BY l.id
+    """
+
+    INSERT_NOTICES = """
+        INSERT INTO OverdueNotices (loan_id, notice_date, user_id, book_id, due_date, days_overdue, fine, message)
+        VALUES %s
+        ON CONFLICT (loan_id, notice_date) DO NOTHING
+        RETURNING loan_id
+    """
+
+    def __init__(self, dao, batch_size=1000, workers=4, itersize=5000, progress=None):
+        self.dao = dao
+        self.batch_size = batch_size
+        # The streaming cursor holds one pooled connection; leave it and one more free
+        self.workers = max(1, min(workers, dao.maxconn - 2))
+        self.itersize = itersize
+        self.progress = progress  # called with the OverdueReport after every checkpoint
+
+    def run(self, as_of=None, restart=False):
+        as_of = as_of or datetime.date.today()
+        with self.dao.pool.connection() as conn:
+            # Session-level lock on the streaming connection: a concurrent second run is
+            # refused instead of racing this one over the same checkpoint
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT pg_try_advisory_lock(%s)", (RUN_LOCK_KEY,))
+                if not cursor.fetchone()[0]:
+                    raise ValueError("Another overdue run is in progress.")
+            conn.commit()
+            try:
+                with self.dao.metrics.operation("overdue_notices"):
+                    return self._run(conn, as_of, restart)
+            finally:
+                conn.rollback()
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT pg_advisory_unlock(%s)", (RUN_LOCK_KEY,))
+                conn.commit()
+
+    def _start(self, as_of, restart):
+        with self.dao._cursor(commit=True) as cursor:
+            if restart:
+                cursor.execute("DELETE FROM OverdueRuns WHERE as_of = %s", (as_of,))
+            cursor.execute("INSERT INTO OverdueRuns (as_of) VALUES (%s) ON CONFLICT (as_of) DO NOTHING", (as_of,))
+            cursor.execute("SELECT last_loan_id, finished_at FROM OverdueRuns WHERE as_of = %s", (as_of,))
+            return cursor.fetchone()
+
+    def _checkpoint(self, as_of, last_loan_id, rows, notices, finished=False):
+        with self.dao._cursor(commit=True) as cursor:
+            cursor.execute("""
+                UPDATE OverdueRuns
+                SET last_loan_id = GREATEST(last_loan_id, %s), rows_processed = rows_processed + %s,
+                    notices_written = notices_written + %s, updated_at = now(),
+                    finished_at = CASE WHEN %s THEN now() ELSE finished_at END
+                WHERE as_of = %s
+            """, (last_loan_id, rows, notices, finished, as_of))
+
+    def _run(self, conn, as_of, restart):
+        state = self._start(as_of, restart)
+        report = OverdueReport(as_of, state['last_loan_id'])
+        if state['finished_at'] is not None:
+            report.already_done = True
+            return report
+
+        cursor = conn.cursor(name="overdue_loans", cursor_factory=self.dao.tuple_cursor_factory)
+        cursor.itersize = self.itersize
+        cursor.metrics = self.dao.metrics
+        cursor.execute(self.OVERDUE_SQL, {"as_of": as_of, "after": state['last_loan_id']})
+
+        # Batches are checkpointed in stream order as they finish, so at most
+        # 2 * workers batches are ever held in memory
+        pending = deque()
+
+        def drain(keep):
+            while len(pending) > keep:
+                future, last_loan_id, rows, fines = pending.popleft()
+                notices = future.result()
+                self._checkpoint(as_of, last_loan_id, rows, notices)
+                report.rows += rows
+                report.notices += notices
+                report.fines += fines
+                report.batches += 1
+                report.elapsed = time.perf_counter() - report.started
+                if self.progress:
+                    self.progress(report)
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="overdue") as executor:
+            try:
+                for batch in batched(cursor, self.batch_size):
+                    notices = [self._notice(row, as_of) for row in batch]
+                    future = executor.submit(self._write_batch, notices)
+                    pending.append((future, batch[-1][0], len(batch), sum(n[6] for n in notices)))
+                    drain(2 * self.workers)
+                drain(0)
+            except KeyboardInterrupt:
+                # Keep what the workers already wrote; the next run resumes from there
+                report.interrupted = True
+                for future, *_ in pending:
+                    future.cancel()
+                while pending and not pending[0][0].cancelled():
+                    drain(len(pending) - 1)
+            finally:
+                cursor.close()
+
+        if not report.interrupted:
+            self._checkpoint(as_of, 0, 0, 0, finished=True)
+        report.elapsed = time.perf_counter() - report.started
+        return report
+
+    @staticmethod
+    def _notice(row, as_of):
+        loan_id, user_id, full_name, book_id, title, due_date = row
+        days_overdue = (as_of - due_date).days
+        fine = compute_fine(days_overdue)
+        return (loan_id, as_of, user_id, book_id, due_date, days_overdue, fine,
+                notice_message(full_name, title, due_date, days_overdue, fine))
+
+    def _write_batch(self, notices):
+        with self.dao.metrics.operation("overdue_notices"), self.dao._cursor(commit=True) as cursor:
+            rows = execute_values(cursor, self.INSERT_NOTICES, notices, page_size=len(notices), fetch=True)
+        return len(rows)
+
+
+def main():
+    from SmartLibManager_dao import SmartLibManagerDAO
+
+    parser = argparse.ArgumentParser(description="Compute fines and write notices for overdue loans.")
+    parser.add_argument("--as-of", type=datetime.date.fromisoformat, help="run date (default today)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="notices per worker transaction")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--itersize", type=int, default=5000, help="rows fetched per server-side cursor round trip")
+    parser.add_argument("--restart", action="store_true", help="forget the checkpoint and start from the first loan")
+    parser.add_argument("--dbname", help="defaults to the DAO's database")
+    args = parser.parse_args()
+
+    dao = SmartLibManagerDAO(maxconn=args.workers + 2, db_config={"dbname": args.dbname} if args.dbname else None,
+                             listen_for_changes=False)
+    processor = OverdueProcessor(dao, args.batch_size, args.workers, args.itersize,
+                                 progress=lambda r: print(f"\r{r}", end="", flush=True))
+    try:
+        report = processor.run(args.as_of, args.restart)
+    except (ValueError, psycopg2.Error) as e:
+        print(f"\nOverdue run failed: {e}")
+        raise SystemExit(1)
+    finally:
+        dao.close()
+    print(f"\r{report}")
+    if report.interrupted:
+        print("Interrupted; run again to resume from the last checkpoint.")
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
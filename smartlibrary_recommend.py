@@ -0,0 +1,308 @@
+""""Readers also borrowed" recommendations from a sparse book x book co-occurrence index.
+
+    python smartlibrary_recommend.py --build      # full build from Loans (and LoansArchive)
+    python smartlibrary_recommend.py              # fold in loans made since the last run
+    python smartlibrary_recommend.py --book 42    # what readers of book 42 also borrowed
+    python smartlibrary_recommend.py --user 7     # suggestions for patron 7
+
+Needs numpy and scipy (pip install numpy scipy); without them the app simply
+shows no recommendations. The index is kept as a users x books incidence
+matrix B and the co-occurrence matrix C = B'B (C[i, j] = patrons who borrowed
+both i and j, C[i, i] = patrons who borrowed i). Each update folds in only the
+(patron, book) pairs it hasn't seen, as C += N'B + B'N + N'N over the patrons
+involved, and re-ranks only the books whose scores changed. Every book's top
+TOP_K neighbours by cosine similarity are stored as fixed-width .npy arrays,
+which readers memory-map, so a lookup is a row read. Run it from cron every
+few minutes:
+
+    */5 * * * *  cd /opt/smartlibrary && python smartlibrary_recommend.py
+"""
+import argparse
+import io
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+from scipy import sparse
+
+INDEX_DIR = os.environ.get("SMARTLIBRARY_RECOMMEND_INDEX",
+                           os.path.join(os.path.dirname(os.path.abspath(__file__)), "recommend_index"))
+TOP_K = 20
+# Loans commit out of id order, so every update re-reads this many ids below
+# its watermark; pairs already in the index are skipped
+OVERLAP_IDS = 10000
+
+
+# --- LOADING LOANS ---
+def read_pairs(dao, after_loan_id=0):
+    # (user_ids, book_ids, max_loan_id) of every loan with id > after_loan_id, via COPY
+    with dao._cursor() as cursor:
+        cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")  # max id and COPY see one snapshot
+        cursor.execute("SELECT to_regclass('loansarchive') IS NOT NULL AS archived")
+        tables = ["Loans", "LoansArchive"] if cursor.fetchone()['archived'] else ["Loans"]
+        cursor.execute(" UNION ALL ".join(f"SELECT max(id) AS id FROM {t}" for t in tables))
+        max_loan_id = max([row['id'] or 0 for row in cursor.fetchall()] + [after_loan_id])
+        buffer = io.BytesIO()
+        for table in tables:
+            cursor.copy_expert(f"COPY (SELECT user_id, book_id FROM {table} WHERE id > {int(after_loan_id)} "
+                               f"AND id <= {int(max_loan_id)}) TO STDOUT", buffer)
+    pairs = np.fromstring(buffer.getvalue().decode("ascii"), dtype=np.int64, sep=" ").reshape(-1, 2)
+    return pairs[:, 0], pairs[:, 1], max_loan_id
+
+
+# --- BUILDING ---
+def _top_neighbors(cooc, readers, rows, k):
+    # Top-k other books of each row by cosine similarity C[i, j] / sqrt(C[i, i] * C[j, j]),
+    # padded with -1 / 0.0; every row is ranked at once with one lexsort
+    sub = cooc[rows]
+    row_pos = np.repeat(np.arange(len(rows)), np.diff(sub.indptr))
+    inv = np.zeros(len(readers))
+    np.divide(1.0, np.sqrt(readers), out=inv, where=readers > 0)
+    scores = sub.data * inv[rows][row_pos] * inv[sub.indices]
+    scores[sub.indices == rows[row_pos]] = -1.0  # a book isn't its own recommendation
+    order = np.lexsort((-scores, row_pos))
+    rank = np.arange(len(order)) - sub.indptr[row_pos]
+    keep = (rank < k) & (scores[order] > 0)
+    neighbors = np.full((len(rows), k), -1, dtype=np.int32)
+    top_scores = np.zeros((len(rows), k), dtype=np.float32)
+    neighbors[row_pos[keep], rank[keep]] = sub.indices[order][keep]
+    top_scores[row_pos[keep], rank[keep]] = scores[order][keep]
+    return neighbors, top_scores
+
+
+class CoOccurrenceIndex:
+    """The writable side: B, C and the top-k arrays in memory, saved as .npy files.
+
+    Rows and columns are raw user and book ids, so no id mapping is stored;
+    the matrices grow when new ids show up.
+    """
+
+    def __init__(self, incidence=None, cooc=None, neighbors=None, scores=None, last_loan_id=0, k=TOP_K):
+        self.incidence = incidence if incidence is not None else sparse.csr_matrix((0, 0), dtype=np.int32)
+        self.cooc = cooc if cooc is not None else sparse.csr_matrix((0, 0), dtype=np.int32)
+        self.k = k
+        self.neighbors = neighbors if neighbors is not None else np.full((0, k), -1, dtype=np.int32)
+        self.scores = scores if scores is not None else np.zeros((0, k), dtype=np.float32)
+        self.last_loan_id = last_loan_id
+
+    @property
+    def readers(self):
+        return self.cooc.diagonal()
+
+    def _grow(self, n_users, n_books):
+        n_users = max(n_users, self.incidence.shape[0])
+        n_books = max(n_books, self.cooc.shape[0])
+        if (n_users, n_books) != self.incidence.shape:
+            self.incidence.resize((n_users, n_books))
+        if self.cooc.shape[0] < n_books:
+            self.cooc.resize((n_books, n_books))
+            extra = n_books - len(self.neighbors)
+            self.neighbors = np.vstack([self.neighbors, np.full((extra, self.k), -1, dtype=np.int32)])
+            self.scores = np.vstack([self.scores, np.zeros((extra, self.k), dtype=np.float32)])
+
+    def add_pairs(self, user_ids, book_ids, last_loan_id):
+        # Folds (user, book) loans into the index; returns how many pairs were new
+        self.last_loan_id = max(self.last_loan_id, last_loan_id)
+        if len(user_ids) == 0:
+            return 0
+        self._grow(int(user_ids.max()) + 1, int(book_ids.max()) + 1)
+        fresh = sparse.csr_matrix((np.ones(len(user_ids), dtype=np.int32), (user_ids, book_ids)),
+                                  shape=self.incidence.shape)
+        fresh.data[:] = 1  # re-borrowing a book doesn't count twice
+        fresh = fresh - fresh.multiply(self.incidence)
+        fresh.eliminate_zeros()
+        if fresh.nnz == 0:
+            return 0
+
+        patrons = np.unique(fresh.nonzero()[0])
+        old, new = self.incidence[patrons], fresh[patrons]
+        cross = new.T @ old
+        delta = (cross + cross.T + new.T @ new).tocsr()
+        self.cooc = (self.cooc + delta).tocsr()
+        self.incidence = (self.incidence + fresh).tocsr()
+
+        # Re-rank the books whose co-counts changed, and the books whose current top-k
+        # holds a book that gained readers (its score there can only have dropped;
+        # outside the top-k such a book stays out, so other rows keep their ranking)
+        changed = np.unique(fresh.indices)
+        rows = np.union1d(np.flatnonzero(np.diff(delta.indptr)),
+                          np.flatnonzero(np.isin(self.neighbors, changed).any(axis=1))).astype(np.int64)
+        self.neighbors[rows], self.scores[rows] = _top_neighbors(self.cooc, self.readers, rows, self.k)
+        return fresh.nnz
+
+    # --- PERSISTENCE ---
+    def save(self, index_dir=INDEX_DIR):
+        # Writes a new version directory, then points CURRENT at it, so readers never see a half-written index
+        os.makedirs(index_dir, exist_ok=True)
+        version = f"v{int(time.time() * 1000)}-{os.getpid()}"
+        path = os.path.join(index_dir, version)
+        os.makedirs(path)
+        arrays = {
+            "user_indptr": self.incidence.indptr, "user_books": self.incidence.indices,
+            "cooc_indptr": self.cooc.indptr, "cooc_indices": self.cooc.indices, "cooc_data": self.cooc.data,
+            "neighbors": self.neighbors, "scores": self.scores,
+        }
+        for name, array in arrays.items():
+            np.save(os.path.join(path, f"{name}.npy"), array)
+        meta = {"version": version, "last_loan_id": int(self.last_loan_id), "k": self.k,
+                "users": self.incidence.shape[0], "books": self.cooc.shape[0],
+                "pairs": int(self.incidence.nnz), "saved_at": time.time()}
+        with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        tmp = os.path.join(index_dir, f"CURRENT.{os.getpid()}")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(version)
+        os.replace(tmp, os.path.join(index_dir, "CURRENT"))
+
+        # Keep the previous version for readers that are still switching over
+        versions = sorted((d for d in os.listdir(index_dir) if d.startswith("v")),
+                          key=lambda d: os.path.getmtime(os.path.join(index_dir, d)))
+        for old in versions[:-2]:
+            shutil.rmtree(os.path.join(index_dir, old), ignore_errors=True)
+        return version
+
+    @classmethod
+    def load(cls, index_dir=INDEX_DIR):
+        path = current_version_path(index_dir)
+        if path is None:
+            return None
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        a = {name: np.load(os.path.join(path, f"{name}.npy"))
+             for name in ("user_indptr", "user_books", "cooc_indptr", "cooc_indices", "cooc_data",
+                          "neighbors", "scores")}
+        incidence = sparse.csr_matrix((np.ones(len(a["user_books"]), dtype=np.int32), a["user_books"],
+                                       a["user_indptr"]), shape=(meta["users"], meta["books"]))
+        cooc = sparse.csr_matrix((a["cooc_data"], a["cooc_indices"], a["cooc_indptr"]),
+                                 shape=(meta["books"], meta["books"]))
+        return cls(incidence, cooc, a["neighbors"], a["scores"], meta["last_loan_id"], meta["k"])
+
+
+def current_version_path(index_dir=INDEX_DIR):
+    try:
+        with open(os.path.join(index_dir, "CURRENT"), encoding="utf-8") as f:
+            return os.path.join(index_dir, f.read().strip())
+    except FileNotFoundError:
+        return None
+
+
+def build(dao, index_dir=INDEX_DIR, k=TOP_K):
+    index = CoOccurrenceIndex(k=k)
+    users, books, max_loan_id = read_pairs(dao)
+    index.add_pairs(users, books, max_loan_id)
+    index.save(index_dir)
+    return index
+
+
+def update(dao, index_dir=INDEX_DIR):
+    # Returns (index, new_pairs); builds from scratch when there is no index yet
+    index = CoOccurrenceIndex.load(index_dir)
+    if index is None:
+        index = build(dao, index_dir)
+        return index, int(index.incidence.nnz)
+    users, books, max_loan_id = read_pairs(dao, max(0, index.last_loan_id - OVERLAP_IDS))
+    previous = index.last_loan_id
+    added = index.add_pairs(users, books, max_loan_id)
+    if added or index.last_loan_id != previous:
+        index.save(index_dir)
+    return index, added
+
+
+# --- QUERIES ---
+class Recommender:
+    """Read side: memory-maps the current index version and answers lookups from it.
+
+    Checks at most every reload_interval seconds whether an update has
+    published a newer version. Thread-safe for readers; all methods return []
+    while no index has been built.
+    """
+
+    def __init__(self, index_dir=INDEX_DIR, reload_interval=5.0):
+        self.index_dir = index_dir
+        self.reload_interval = reload_interval
+        self._version = None
+        self._arrays = None
+        self._checked = 0.0
+
+    def _current(self):
+        now = time.monotonic()
+        if now - self._checked >= self.reload_interval:
+            self._checked = now
+            path = current_version_path(self.index_dir)
+            if path is not None and path != self._version:
+                try:
+                    self._arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+                                    for name in ("neighbors", "scores", "user_indptr", "user_books")}
+                    self._version = path
+                except FileNotFoundError:
+                    pass  # replaced while loading; the next check picks up the newer one
+        return self._arrays
+
+    @property
+    def available(self):
+        return self._current() is not None
+
+    def also_borrowed(self, book_id, k=5):
+        # [(book_id, score)] most borrowed by readers of book_id, best first
+        arrays = self._current()
+        if arrays is None or not 0 <= book_id < len(arrays["neighbors"]):
+            return []
+        neighbors, scores = arrays["neighbors"][book_id], arrays["scores"][book_id]
+        return [(int(b), float(s)) for b, s in zip(neighbors[:k], scores[:k]) if b >= 0]
+
+    def for_user(self, user_id, k=5):
+        # [(book_id, score)]: neighbours of the patron's books, summed, minus what they've read
+        arrays = self._current()
+        if arrays is None or not 0 <= user_id < len(arrays["user_indptr"]) - 1:
+            return []
+        indptr = arrays["user_indptr"]
+        history = np.asarray(arrays["user_books"][indptr[user_id]:indptr[user_id + 1]])
+        if len(history) == 0:
+            return []
+        candidates = np.asarray(arrays["neighbors"][history]).ravel()
+        weights = np.asarray(arrays["scores"][history]).ravel()
+        valid = (candidates >= 0) & ~np.isin(candidates, history)
+        books, inverse = np.unique(candidates[valid], return_inverse=True)
+        if len(books) == 0:
+            return []
+        totals = np.bincount(inverse, weights=weights[valid])
+        top = np.argsort(-totals, kind="stable")[:k]
+        return [(int(books[i]), float(totals[i])) for i in top]
+
+
+def main():
+    from SmartLibManager_dao import SmartLibManagerDAO
+
+    parser = argparse.ArgumentParser(description="Build or update the 'readers also borrowed' index.")
+    parser.add_argument("--build", action="store_true", help="rebuild from all loans instead of updating")
+    parser.add_argument("--book", type=int, help="print recommendations for this book id")
+    parser.add_argument("--user", type=int, help="print suggestions for this user id")
+    parser.add_argument("--index-dir", default=INDEX_DIR)
+    parser.add_argument("--dbname", help="defaults to the DAO's database")
+    args = parser.parse_args()
+
+    dao = SmartLibManagerDAO(db_config={"dbname": args.dbname} if args.dbname else None, listen_for_changes=False,
+                             recommend_index=args.index_dir)
+    try:
+        if args.book is not None or args.user is not None:
+            books = (dao.get_also_borrowed(args.book, 10) if args.book is not None
+                     else dao.get_recommendations(args.user, 10))
+            for book in books:
+                print(f"{book.id:>8}  {book.title}")
+            return
+        started = time.perf_counter()
+        if args.build:
+            index, added = build(dao, args.index_dir), None
+        else:
+            index, added = update(dao, args.index_dir)
+        print(f"{'built' if added is None else f'added {added} new pairs'} in {time.perf_counter() - started:.2f}s: "
+              f"{index.incidence.nnz} patron/book pairs, {index.cooc.nnz} co-occurrences, "
+              f"loans up to id {index.last_loan_id}")
+    finally:
+        dao.close()
+
+
+if __name__ == '__main__':
+    main()
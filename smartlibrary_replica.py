@@ -0,0 +1,412 @@
+"""Local SQLite read replica of the catalog and clubs for branch terminals
+(needs migrations/0005_replica_changes.sql on the primary).
+
+    python smartlibrary_replica.py                     # create or bring the local copy up to date
+    python smartlibrary_replica.py --search "tolkien"  # search the local copy
+    python smartlibrary_replica.py --prune 7           # on the server: drop change log rows older than 7 days
+
+With SmartLibManagerDAO(replica=...) (or SMARTLIBRARY_REPLICA set for the app)
+catalog browsing, search and the club list read a local copy of Books,
+Authors, BookAuthors and BookClubs (with member counts), so they cost no WAN
+round trip and keep working while the link is down. Everything else, and
+every write, still goes to PostgreSQL. A background thread keeps the copy
+current: it fetches the ReplicaChanges rows after the last one it applied and
+re-reads only those rows, on every NOTIFY and every sync_interval seconds. A
+replica that fell behind the pruned part of the log, or has never synced,
+copies everything in one snapshot.
+
+Search uses SQLite FTS5 over title, author names and genre with prefix
+matching, ranked by bm25; unlike the primary's pg_trgm search it is not typo
+tolerant. Prune the change log nightly on the server:
+
+    45 3 * * *  cd /opt/smartlibrary && python smartlibrary_replica.py --prune 7
+"""
+import argparse
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import psycopg2
+
+REPLICA_PATH = os.environ.get("SMARTLIBRARY_REPLICA",
+                              os.path.join(os.path.dirname(os.path.abspath(__file__)), "catalog_replica.sqlite3"))
+REPLICA_VERSION = 1
+# Change log rows commit out of seq order, so every sync re-reads this many seqs
+# below the newest one applied; seqs already applied are skipped
+OVERLAP_SEQ = 1000
+ITERSIZE = 5000
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS books (
+        id INTEGER PRIMARY KEY, title TEXT NOT NULL, genre TEXT, publication_year INTEGER,
+        available INTEGER NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_books_title_id ON books (title, id);
+    CREATE TABLE IF NOT EXISTS authors (id INTEGER PRIMARY KEY, name TEXT NOT NULL, bio TEXT);
+    CREATE TABLE IF NOT EXISTS book_authors (
+        book_id INTEGER NOT NULL, author_id INTEGER NOT NULL, PRIMARY KEY (book_id, author_id)
+    );
+    CREATE INDEX IF NOT EXISTS idx_book_authors_author ON book_authors (author_id);
+    CREATE TABLE IF NOT EXISTS book_clubs (
+        id INTEGER PRIMARY KEY, name TEXT NOT NULL, description TEXT, created_by INTEGER NOT NULL,
+        members INTEGER NOT NULL
+    );
+    CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5(title, authors, genre);
+    CREATE TABLE IF NOT EXISTS replica_state (key TEXT PRIMARY KEY, value);
+"""
+
+# Primary-side reads: (sqlite table, full copy SQL, delta SQL taking an id array)
+SOURCES = {
+    "books": ("books", "SELECT id, title, genre, publication_year, available FROM Books",
+              "SELECT id, title, genre, publication_year, available FROM Books WHERE id = ANY(%s)"),
+    "book_authors": ("book_authors", "SELECT book_id, author_id FROM BookAuthors",
+                     "SELECT book_id, author_id FROM BookAuthors WHERE book_id = ANY(%s)"),
+    "authors": ("authors", "SELECT id, name, bio FROM Authors",
+                "SELECT id, name, bio FROM Authors WHERE id = ANY(%s)"),
+    "clubs": ("book_clubs", """
+        SELECT bc.id, bc.name, bc.description, bc.created_by, COUNT(cm.user_id)
+        FROM BookClubs bc LEFT JOIN ClubMemberships cm ON cm.club_id = bc.id
+        GROUP BY bc.id
+    """, """
+        SELECT bc.id, bc.name, bc.description, bc.created_by, COUNT(cm.user_id)
+        FROM BookClubs bc LEFT JOIN ClubMemberships cm ON cm.club_id = bc.id
+        WHERE bc.id = ANY(%s)
+        GROUP BY bc.id
+    """),
+}
+
+BOOK_COLUMNS = "b.id, b.title, b.genre, b.publication_year, b.available != 0"
+
+
+def fts_query(text):
+    # Every word must match as a prefix of some word in title, authors or genre
+    words = re.findall(r"\w+", text or "")
+    return " ".join(f'"{w}"*' for w in words)
+
+
+class SyncReport:
+    def __init__(self, full):
+        self.full = full
+        self.changes = 0
+        self.rows = 0
+        self.entities = set()  # 'books' / 'clubs': what the DAO's caches should drop
+        self.elapsed = 0.0
+
+    def __str__(self):
+        kind = "full copy" if self.full else f"{self.changes} change(s)"
+        return f"{kind}, {self.rows} row(s) fetched in {self.elapsed:.2f}s"
+
+
+class CatalogReplica:
+    """The local copy: one writer connection for syncs, one reader connection per thread.
+
+    WAL mode lets readers keep searching while a sync writes.
+    """
+
+    def __init__(self, path=REPLICA_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._applied = set()  # seqs within OVERLAP_SEQ of last_seq, already applied
+        self.syncs = 0
+        self.full_syncs = 0
+        self.last_sync = None  # time.time() of the last successful sync
+        self._writer = self._connect()
+        with self._writer:
+            if self._state("version", REPLICA_VERSION, self._writer) != REPLICA_VERSION:
+                for table in ("books", "authors", "book_authors", "book_clubs", "books_fts", "replica_state"):
+                    self._writer.execute(f"DROP TABLE IF EXISTS {table}")
+            self._writer.executescript(SCHEMA)
+            self._writer.execute("INSERT OR REPLACE INTO replica_state VALUES ('version', ?)", (REPLICA_VERSION,))
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        return conn
+
+    def _reader(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def _state(self, key, default=None, conn=None):
+        try:
+            row = (conn or self._reader()).execute("SELECT value FROM replica_state WHERE key = ?", (key,)).fetchone()
+        except sqlite3.OperationalError:  # no replica_state table yet
+            return default
+        return row[0] if row else default
+
+    @property
+    def last_seq(self):
+        return self._state("last_seq")
+
+    def close(self):
+        self._writer.close()
+
+    # --- READS ---
+    def all_books(self):
+        return self._reader().execute(f"SELECT {BOOK_COLUMNS} FROM books b ORDER BY b.title, b.id").fetchall()
+
+    def books_page(self, last, page_size):
+        # Keyset page after last = (title, id), like the primary's books_next_page
+        if last is None:
+            sql, params = f"SELECT {BOOK_COLUMNS} FROM books b ORDER BY b.title, b.id LIMIT ?", (page_size,)
+        else:
+            sql = f"SELECT {BOOK_COLUMNS} FROM books b WHERE (b.title, b.id) > (?, ?) ORDER BY b.title, b.id LIMIT ?"
+            params = (last[0], last[1], page_size)
+        return self._reader().execute(sql, params).fetchall()
+
+    def search(self, text, limit=500):
+        query = fts_query(text)
+        if not query:
+            return []
+        return self._reader().execute(f"""
+            SELECT {BOOK_COLUMNS} FROM books_fts f JOIN books b ON b.id = f.rowid
+            WHERE books_fts MATCH ?
+            ORDER BY bm25(books_fts, 3.0, 2.0, 1.0), b.title, b.id
+            LIMIT ?
+        """, (query, limit)).fetchall()
+
+    def books_by_ids(self, ids):
+        placeholders = ",".join("?" * len(ids))
+        return self._reader().execute(f"SELECT {BOOK_COLUMNS} FROM books b WHERE b.id IN ({placeholders})",
+                                      list(ids)).fetchall()
+
+    def clubs_summary(self):
+        # Same keys as the primary's get_clubs_summary rows
+        cursor = self._reader().execute("SELECT id, name, description, members FROM book_clubs ORDER BY id")
+        return [dict(zip(("id", "name", "description", "members"), row)) for row in cursor]
+
+    def stats(self):
+        return {
+            "last_seq": self.last_seq or 0,
+            "syncs": self.syncs,
+            "full_syncs": self.full_syncs,
+            "age_s": time.time() - self.last_sync if self.last_sync else -1.0,
+        }
+
+    # --- SYNC ---
+    def sync(self, dao):
+        # Brings the copy up to date from the primary; returns a SyncReport
+        if dao.pool is None:
+            raise ValueError("Not connected to the database.")
+        started = time.perf_counter()
+        with self._write_lock, dao.pool.connection() as conn:
+            try:
+                with conn.cursor() as cursor:
+                    # The change log and the rows it names are read in one snapshot
+                    cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+                    cursor.execute("SELECT min(seq), max(seq) FROM ReplicaChanges")
+                    min_seq, max_seq = cursor.fetchone()
+                last_seq = self.last_seq
+                # Pruning always keeps the newest change, so a gap after last_seq means we fell behind
+                if last_seq is None or (min_seq is not None and min_seq > last_seq + 1):
+                    report = self._copy_all(dao, conn, max_seq or 0)
+                else:
+                    report = self._apply_changes(dao, conn, last_seq)
+            finally:
+                conn.rollback()
+        self.syncs += 1
+        self.last_sync = time.time()
+        report.elapsed = time.perf_counter() - started
+        return report
+
+    def _stream(self, dao, conn, sql, params=None):
+        cursor = conn.cursor(name="replica_rows", cursor_factory=dao.tuple_cursor_factory)
+        cursor.itersize = ITERSIZE
+        cursor.metrics = dao.metrics
+        try:
+            cursor.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(ITERSIZE)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cursor.close()
+
+    def _copy_all(self, dao, conn, max_seq):
+        report = SyncReport(full=True)
+        report.entities = {"books", "clubs"}
+        db = self._writer
+        db.execute("BEGIN")
+        try:
+            for name, (table, full_sql, _) in SOURCES.items():
+                db.execute(f"DELETE FROM {table}")
+                for rows in self._stream(dao, conn, full_sql):
+                    self._insert(table, rows)
+                    report.rows += len(rows)
+            db.execute("DELETE FROM books_fts")
+            self._index_books(None)
+            db.execute("INSERT OR REPLACE INTO replica_state VALUES ('last_seq', ?)", (max_seq,))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        with conn.cursor() as cursor:
+            # The copy already reflects every change in its snapshot
+            cursor.execute("SELECT seq FROM ReplicaChanges WHERE seq > %s", (max(0, max_seq - OVERLAP_SEQ),))
+            self._applied = {row[0] for row in cursor.fetchall()}
+        self.full_syncs += 1
+        return report
+
+    def _apply_changes(self, dao, conn, last_seq):
+        report = SyncReport(full=False)
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT seq, entity, row_id FROM ReplicaChanges WHERE seq > %s ORDER BY seq",
+                           (max(0, last_seq - OVERLAP_SEQ),))
+            changes = [row for row in cursor.fetchall() if row[0] not in self._applied]
+        if not changes:
+            return report
+        ids = {"books": set(), "authors": set(), "clubs": set()}
+        for _, entity, row_id in changes:
+            ids[entity].add(row_id)
+        report.changes = len(changes)
+
+        fetched = {}
+        with conn.cursor() as cursor:
+            for name, (table, _, delta_sql) in SOURCES.items():
+                key = "books" if name == "book_authors" else name
+                if ids[key]:
+                    cursor.execute(delta_sql, (sorted(ids[key]),))
+                    fetched[name] = cursor.fetchall()
+                    report.rows += len(fetched[name])
+
+        db = self._writer
+        db.execute("BEGIN")
+        try:
+            db.execute("CREATE TEMP TABLE IF NOT EXISTS sync_ids (id INTEGER PRIMARY KEY)")
+            for name, (table, _, _) in SOURCES.items():
+                key = "books" if name == "book_authors" else name
+                if not ids[key]:
+                    continue
+                column = "book_id" if name == "book_authors" else "id"
+                db.execute("DELETE FROM sync_ids")
+                db.executemany("INSERT INTO sync_ids VALUES (?)", [(i,) for i in ids[key]])
+                db.execute(f"DELETE FROM {table} WHERE {column} IN (SELECT id FROM sync_ids)")
+                self._insert(table, fetched[name])
+            if ids["books"] or ids["authors"]:
+                # Re-index the changed books and every book of a changed author
+                db.execute("DELETE FROM sync_ids")
+                db.executemany("INSERT INTO sync_ids VALUES (?)", [(i,) for i in ids["books"]])
+                if ids["authors"]:
+                    marks = ",".join("?" * len(ids["authors"]))
+                    db.execute(f"INSERT OR IGNORE INTO sync_ids SELECT book_id FROM book_authors "
+                               f"WHERE author_id IN ({marks})", sorted(ids["authors"]))
+                db.execute("DELETE FROM books_fts WHERE rowid IN (SELECT id FROM sync_ids)")
+                self._index_books("SELECT id FROM sync_ids")
+                report.entities.add("books")
+            if ids["clubs"]:
+                report.entities.add("clubs")
+            new_last = max(last_seq, changes[-1][0])
+            db.execute("INSERT OR REPLACE INTO replica_state VALUES ('last_seq', ?)", (new_last,))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        self._applied.update(seq for seq, _, _ in changes)
+        self._applied = {seq for seq in self._applied if seq > new_last - OVERLAP_SEQ}
+        return report
+
+    def _insert(self, table, rows):
+        if rows:
+            marks = ",".join("?" * len(rows[0]))
+            self._writer.executemany(f"INSERT OR REPLACE INTO {table} VALUES ({marks})", rows)
+
+    def _index_books(self, id_subquery):
+        where = f"WHERE b.id IN ({id_subquery})" if id_subquery else ""
+        self._writer.execute(f"""
+            INSERT INTO books_fts (rowid, title, authors, genre)
+            SELECT b.id, b.title, COALESCE(group_concat(a.name, ' '), ''), COALESCE(b.genre, '')
+            FROM books b
+            LEFT JOIN book_authors ba ON ba.book_id = b.id
+            LEFT JOIN authors a ON a.id = ba.author_id
+            {where}
+            GROUP BY b.id
+        """)
+
+
+class ReplicaSync(threading.Thread):
+    """Keeps a CatalogReplica current: syncs on request() (the DAO calls it on
+    NOTIFY) and every interval seconds. A failed sync (link down, or the local
+    file locked or full) is counted in failures and retried on the next round;
+    reads carry on from the local copy meanwhile.
+    """
+
+    def __init__(self, replica, dao, on_synced=None, interval=30.0):
+        super().__init__(name="catalog-replica", daemon=True)
+        self.replica = replica
+        self.dao = dao
+        self.on_synced = on_synced  # called with each SyncReport that changed something
+        self.interval = interval
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self.failures = 0
+
+    def request(self):
+        self._wake.set()
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake.set()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                report = self.replica.sync(self.dao)
+                if report.entities and self.on_synced:
+                    self.on_synced(report)
+            except (psycopg2.Error, sqlite3.Error, ValueError) as e:
+                self.failures += 1
+                print(f"Catalog replica sync failed ({e}); serving the local copy.")
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+
+def prune(dao, older_than_days=7):
+    # Drops change log rows older than the cutoff, always keeping the newest one so
+    # replicas can tell "nothing changed" from "fell behind"; returns rows deleted
+    with dao._cursor(commit=True) as cursor:
+        cursor.execute("""
+            DELETE FROM ReplicaChanges
+            WHERE changed_at < now() - %s * INTERVAL '1 day'
+              AND seq < (SELECT max(seq) FROM ReplicaChanges)
+        """, (older_than_days,))
+        return cursor.rowcount
+
+
+def main():
+    from SmartLibManager_dao import SmartLibManagerDAO
+
+    parser = argparse.ArgumentParser(description="Sync, search or prune the local catalog replica.")
+    parser.add_argument("--path", default=REPLICA_PATH)
+    parser.add_argument("--search", help="search the local copy instead of syncing")
+    parser.add_argument("--prune", type=int, metavar="DAYS", help="delete change log rows older than DAYS")
+    parser.add_argument("--dbname", help="defaults to the DAO's database")
+    args = parser.parse_args()
+
+    if args.search:
+        for row in CatalogReplica(args.path).search(args.search, limit=20):
+            print(f"{row[0]:>8}  {row[1]} ({row[2]}){'' if row[4] else '  [on loan]'}")
+        return
+
+    dao = SmartLibManagerDAO(db_config={"dbname": args.dbname} if args.dbname else None, listen_for_changes=False)
+    try:
+        if args.prune is not None:
+            print(f"pruned {prune(dao, args.prune)} change log row(s)")
+        else:
+            replica = CatalogReplica(args.path)
+            print(f"{args.path}: {replica.sync(dao)}")
+    except (psycopg2.Error, ValueError) as e:
+        print(f"Replica {'prune' if args.prune is not None else 'sync'} failed: {e}")
+        raise SystemExit(1)
+    finally:
+        dao.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+import re
+
+
+class CatalogSearch:
+    """Ranked catalog search over Books.search_vector / Books.search_text.
+
+    Full-text matches (title, author names, genre) come from the GIN tsvector
+    index; typo-tolerant matches come from the pg_trgm GIN index on search_text.
+    Each index contributes at most CANDIDATES matches (or the result limit, if
+    larger) before anything is ranked, so a common word that matches a large
+    share of the catalog costs a bounded rank-and-sort instead of one over every
+    match. Queries matching fewer books than that are ranked exactly.
+    """
+
+    BOOK_COLUMNS = "b.id, b.title, b.genre, b.publication_year, b.available"
+    MAX_QUERY_LENGTH = 200
+    CANDIDATES = 1000  # per index, before ranking
+
+    # Full-text candidates, then typo-tolerant ones the full-text side didn't already match
+    SEARCH_SQL = f"""
+        SELECT c.id, c.title, c.genre, c.publication_year, c.available
+        FROM websearch_to_tsquery('english', %(q)s) tsq
+        CROSS JOIN LATERAL (
+            (SELECT {BOOK_COLUMNS},
+                    ts_rank_cd(b.search_vector, tsq) + word_similarity(%(q)s, b.search_text) AS score
+             FROM Books b WHERE b.search_vector @@ tsq
+             LIMIT GREATEST(%(limit)s, {CANDIDATES}))
+            UNION ALL
+            (SELECT {BOOK_COLUMNS}, word_similarity(%(q)s, b.search_text) AS score
+             FROM Books b WHERE %(q)s <%% b.search_text AND NOT b.search_vector @@ tsq
+             LIMIT GREATEST(%(limit)s, {CANDIDATES}))
+        ) c
+        ORDER BY c.score DESC, c.title, c.id
+        LIMIT %(limit)s
+    """
+
+    # Several searches in one round trip: $1 is text[] of queries, $2 int[] of limits.
+    # Rows come back as (ord, BOOK_COLUMNS...) with ord the 1-based query position.
+    # Used by smartlibrary_service.SearchBatcher (asyncpg placeholders).
+    BATCH_SEARCH_SQL = f"""
+        SELECT q.ord, r.id, r.title, r.genre, r.publication_year, r.available
+        FROM unnest($1::text[], $2::int[]) WITH ORDINALITY q(text, lim, ord)
+        CROSS JOIN LATERAL (
+            SELECT c.* FROM websearch_to_tsquery('english', q.text) tsq
+            CROSS JOIN LATERAL (
+                (SELECT {BOOK_COLUMNS},
+                        ts_rank_cd(b.search_vector, tsq) + word_similarity(q.text, b.search_text) AS score
+                 FROM Books b WHERE b.search_vector @@ tsq
+                 LIMIT GREATEST(q.lim, {CANDIDATES}))
+                UNION ALL
+                (SELECT {BOOK_COLUMNS}, word_similarity(q.text, b.search_text) AS score
+                 FROM Books b WHERE q.text <% b.search_text AND NOT b.search_vector @@ tsq
+                 LIMIT GREATEST(q.lim, {CANDIDATES}))
+            ) c
+            ORDER BY c.score DESC, c.title, c.id
+            LIMIT q.lim
+        ) r
+        ORDER BY q.ord, r.score DESC, r.title, r.id
+    """
+
+    def __init__(self, cursor_factory, limit=500):
+        # cursor_factory returns a context manager yielding a cursor (SmartLibManagerDAO._cursor);
+        # rows come back in BOOK_COLUMNS order
+        self.cursor_factory = cursor_factory
+        self.limit = limit
+
+    @classmethod
+    def normalize(cls, text):
+        return re.sub(r"\s+", " ", text or "").strip()[:cls.MAX_QUERY_LENGTH]
+
+    def search(self, text, limit=None):
+        q = self.normalize(text)
+        if not q:
+            return []
+        # Not a prepared statement: its generic plan can't tell a common word (scan until
+        # CANDIDATES rows match) from a rare one (use the GIN index), so plan every call
+        with self.cursor_factory() as cursor:
+            cursor.execute(self.SEARCH_SQL, {"q": q, "limit": limit or self.limit})
+            return cursor.fetchall()
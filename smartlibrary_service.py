@@ -0,0 +1,523 @@
+"""Headless HTTP/JSON service for self-checkout kiosks and the web OPAC.
+
+    python smartlibrary_service.py --port 8080 --pool-size 10
+
+Endpoints (JSON bodies in and out):
+
+    POST /auth         {"username": ..., "password": ...}  or  {"token": ...}
+    GET  /search?q=dune&limit=50
+    POST /loans        {"token": ..., "book_id": 1}
+    POST /returns      {"token": ..., "loan_id": 12}
+    POST /clubs/join   {"token": ..., "club_id": 1}
+    GET  /dashboard
+    GET  /health       pool, queue and batching counters
+    GET  /metrics      request latency histograms in Prometheus text format
+
+Runs the same SQL as SmartLibManagerDAO through asyncpg (pip install asyncpg),
+which the desktop app does not need. Searches that arrive together are answered
+by one batched query, and once max_queue requests are already waiting for a
+database connection new ones are turned away with 503 instead of piling up.
+Password checks run in a process pool (smartlibrary_auth.PasswordHasher); a
+successful /auth returns a session token that later /auth calls can present
+instead of the password, skipping the hash; a token stops working once the
+account's password changes. The write endpoints act for the
+token's user: a missing or expired token is a 401, and a "user_id" naming
+anyone else is a 403.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import time
+from contextlib import asynccontextmanager
+from urllib.parse import parse_qs, urlsplit
+
+try:
+    import asyncpg
+except ImportError:  # only this service needs it
+    asyncpg = None
+
+from SmartLibManager_dao import DB_CONFIG, DASHBOARD_SQL, HOT_STATEMENTS, LOAN_DAYS
+from smartlibrary_auth import PasswordHasher, SessionCache
+from smartlibrary_metrics import Metrics
+from smartlibrary_search import CatalogSearch
+from smartlibrary_statements import Statement
+
+# asyncpg prepares and caches these per connection on first use
+SQL = {name: Statement(name, sql, params).server_sql for name, sql, params in HOT_STATEMENTS}
+SQL["join_club"] = "INSERT INTO ClubMemberships (club_id, user_id) VALUES ($1, $2)"
+SQL["return_own_loan"] = """
+    UPDATE Loans SET return_date = CURRENT_DATE
+    WHERE id = $1 AND user_id = $2 AND return_date IS NULL RETURNING book_id
+"""
+SQL["upgrade_password"] = "UPDATE Users SET password_hash = $1 WHERE username = $2 AND password_hash = $3"
+
+BOOK_FIELDS = ("id", "title", "genre", "publication_year", "available")
+MAX_BODY = 64 * 1024
+MAX_SEARCH_LIMIT = 100
+
+
+class Overloaded(Exception):
+    pass
+
+
+class ServiceError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class SearchBatcher:
+    """Coalesces searches that arrive within `window` seconds into one query.
+
+    Identical (q, limit) pairs share a single result; distinct ones are answered
+    together by CatalogSearch.BATCH_SEARCH_SQL, so a burst of kiosk searches
+    costs one round trip instead of one per request.
+    """
+
+    def __init__(self, run_batch, window=0.002, max_batch=32, max_pending=1024):
+        self.run_batch = run_batch  # async fn([(q, limit), ...]) -> [rows, ...] in the same order
+        self.window = window
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self._pending = {}  # (q, limit) -> Future
+        self._timer = None
+        self.requests = 0
+        self.coalesced = 0
+        self.batches = 0
+
+    async def search(self, q, limit):
+        self.requests += 1
+        key = (q, limit)
+        future = self._pending.get(key)
+        if future is not None:
+            self.coalesced += 1
+        else:
+            if len(self._pending) >= self.max_pending:
+                raise Overloaded()
+            future = asyncio.get_running_loop().create_future()
+            self._pending[key] = future
+            if len(self._pending) >= self.max_batch:
+                self._flush()
+            elif self._timer is None:
+                self._timer = asyncio.get_running_loop().call_later(self.window, self._flush)
+        return await asyncio.shield(future)
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, {}
+        if batch:
+            asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch):
+        self.batches += 1
+        keys = list(batch)
+        try:
+            results = await self.run_batch(keys)
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for key, rows in zip(keys, results):
+            if not batch[key].done():
+                batch[key].set_result(rows)
+
+    def stats(self):
+        return {"requests": self.requests, "coalesced": self.coalesced, "batches": self.batches,
+                "pending": len(self._pending)}
+
+
+class LibraryService:
+    """The kiosk-facing operations of SmartLibManagerDAO on an asyncpg pool.
+
+    Every database call runs under admitted(): at most pool_size calls hold a
+    connection, at most max_queue wait for one (each for up to queue_timeout
+    seconds), and anything beyond that raises Overloaded.
+    """
+
+    def __init__(self, db_config=None, pool_size=10, max_queue=256, queue_timeout=2.0,
+                 search_window=0.002, dashboard_ttl=2.0, hash_workers=None, session_ttl=900.0):
+        self.db_config = dict(DB_CONFIG)
+        if db_config:
+            self.db_config.update(db_config)
+        self.pool_size = pool_size
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.dashboard_ttl = dashboard_ttl
+        self.pool = None
+        self.batcher = SearchBatcher(self._search_batch, window=search_window)
+        self.hasher = PasswordHasher(hash_workers)
+        self.sessions = SessionCache(session_ttl)
+        self._slots = None
+        self.waiting = 0
+        self.rejected = 0
+        self._dashboard = None
+        self._dashboard_expires = 0.0
+        self._dashboard_task = None
+
+    async def start(self):
+        if asyncpg is None:
+            raise RuntimeError("smartlibrary_service needs asyncpg (pip install asyncpg).")
+        self._slots = asyncio.Semaphore(self.pool_size)
+        self.pool = await asyncpg.create_pool(
+            database=self.db_config["dbname"], user=self.db_config["user"],
+            password=self.db_config["password"], host=self.db_config["host"],
+            port=int(self.db_config["port"]), min_size=min(2, self.pool_size), max_size=self.pool_size)
+        self.hasher.start()
+
+    async def close(self):
+        if self.pool is not None:
+            await self.pool.close()
+        self.hasher.close()
+
+    @asynccontextmanager
+    async def admitted(self):
+        if self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise Overloaded()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise Overloaded()
+        finally:
+            self.waiting -= 1
+        try:
+            async with self.pool.acquire() as conn:
+                yield conn
+        finally:
+            self._slots.release()
+
+    # --- OPERATIONS ---
+    async def authenticate(self, username, password):
+        async with self.admitted() as conn:
+            row = await conn.fetchrow(SQL["user_by_username"], username)
+        if not row:
+            raise ServiceError(401, "Invalid username or password.")
+        # The hash runs in a worker process; no connection is held meanwhile
+        ok, new_hash = await asyncio.wrap_future(self.hasher.submit_check(password, row["password_hash"]))
+        if not ok:
+            raise ServiceError(401, "Invalid username or password.")
+        password_hash = row["password_hash"]
+        if new_hash:
+            async with self.admitted() as conn:
+                status = await conn.execute(SQL["upgrade_password"], new_hash, username, password_hash)
+            if status == "UPDATE 1":
+                password_hash = new_hash
+        user = {"id": row["id"], "username": row["username"], "full_name": row["full_name"],
+                "role": "librarian" if row["role_id"] == 1 else "member"}
+        # The session remembers the hash it was issued under (never sent to the client)
+        return dict(user, token=self.sessions.issue(dict(user, password_hash=password_hash)))
+
+    async def resume_session(self, token):
+        # The token's user, unless it expired or the password has changed since it was issued
+        session = self.sessions.get(token)
+        if session is not None:
+            async with self.admitted() as conn:
+                row = await conn.fetchrow(SQL["user_by_username"], session["username"])
+            if row is None or row["password_hash"] != session["password_hash"]:
+                self.sessions.revoke(token)
+                session = None
+        if session is None:
+            raise ServiceError(401, "Session expired, log in again.")
+        user = {k: v for k, v in session.items() if k != "password_hash"}
+        return dict(user, token=token)
+
+    async def search(self, text, limit=50):
+        q = CatalogSearch.normalize(text)
+        if not q:
+            return []
+        return await self.batcher.search(q, max(1, min(limit, MAX_SEARCH_LIMIT)))
+
+    async def _search_batch(self, keys):
+        async with self.admitted() as conn:
+            rows = await conn.fetch(CatalogSearch.BATCH_SEARCH_SQL,
+                                    [q for q, _ in keys], [limit for _, limit in keys])
+        results = [[] for _ in keys]
+        for row in rows:
+            results[row["ord"] - 1].append({f: row[f] for f in BOOK_FIELDS})
+        return results
+
+    async def borrow(self, book_id, user_id):
+        # The loan triggers reject a book that is already on loan and a member's 4th active loan
+        borrow_date = datetime.date.today()
+        due_date = borrow_date + datetime.timedelta(days=LOAN_DAYS)
+        async with self.admitted() as conn:
+            try:
+                loan_id = await conn.fetchval(SQL["create_loan"], book_id, user_id, borrow_date, due_date)
+            except asyncpg.PostgresError as e:
+                raise ServiceError(409, e.message)
+        self._dashboard = None
+        return {"loan_id": loan_id, "due_date": due_date.isoformat()}
+
+    async def return_loan(self, loan_id, user_id):
+        async with self.admitted() as conn:
+            book_id = await conn.fetchval(SQL["return_own_loan"], loan_id, user_id)
+        if book_id is None:
+            raise ServiceError(404, "No active loan found for this ID.")
+        self._dashboard = None
+        return {"loan_id": loan_id, "book_id": book_id}
+
+    async def join_club(self, club_id, user_id):
+        async with self.admitted() as conn:
+            try:
+                await conn.execute(SQL["join_club"], club_id, user_id)
+            except asyncpg.PostgresError:
+                raise ServiceError(409, "Could not join club (Already a member or invalid ID).")
+        return {"club_id": club_id, "user_id": user_id}
+
+    async def dashboard(self):
+        # Callers within dashboard_ttl of each other, or while a load is running, share one query
+        if self._dashboard is not None and time.monotonic() < self._dashboard_expires:
+            return self._dashboard
+        if self._dashboard_task is None:
+            self._dashboard_task = asyncio.ensure_future(self._load_dashboard())
+        return await asyncio.shield(self._dashboard_task)
+
+    async def _load_dashboard(self):
+        try:
+            async with self.admitted() as conn:
+                row = await conn.fetchrow(DASHBOARD_SQL)
+            if row:
+                snapshot = {"total_books": row["total_books"], "members": row["members"],
+                            "active_loans": row["active_loans"], "top_books": json.loads(row["top_books"])}
+            else:
+                snapshot = {"total_books": 0, "members": 0, "active_loans": 0, "top_books": []}
+            self._dashboard = snapshot
+            self._dashboard_expires = time.monotonic() + self.dashboard_ttl
+            return snapshot
+        finally:
+            self._dashboard_task = None
+
+    def stats(self):
+        return {
+            "pool": {"size": self.pool.get_size() if self.pool else 0,
+                     "idle": self.pool.get_idle_size() if self.pool else 0, "max": self.pool_size},
+            "waiting": self.waiting,
+            "max_queue": self.max_queue,
+            "rejected": self.rejected,
+            "search": self.batcher.stats(),
+            "auth": self.hasher.stats(),
+            "sessions": self.sessions.stats(),
+        }
+
+
+# --- HTTP ---
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 403: "Forbidden", 404: "Not Found",
+               405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large",
+               500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+def _int_field(body, name):
+    value = body.get(name)
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ServiceError(400, f"'{name}' must be an integer.")
+    return value
+
+
+async def _session_user_id(service, body):
+    # The user a write request acts for: the token's, which an explicit user_id must match
+    token = body.get("token")
+    if not isinstance(token, str) or not token:
+        raise ServiceError(401, "Log in first: 'token' is required.")
+    user_id = (await service.resume_session(token))["id"]
+    if "user_id" in body and _int_field(body, "user_id") != user_id:
+        raise ServiceError(403, "Cannot act for another user.")
+    return user_id
+
+
+class HttpFrontend:
+    """Minimal HTTP/1.1 server (keep-alive, JSON only) in front of LibraryService."""
+
+    def __init__(self, service, metrics=None):
+        self.service = service
+        self.metrics = metrics or Metrics()
+        self.routes = {
+            ("POST", "/auth"): self.handle_auth,
+            ("GET", "/search"): self.handle_search,
+            ("POST", "/loans"): self.handle_borrow,
+            ("POST", "/returns"): self.handle_return,
+            ("POST", "/clubs/join"): self.handle_join_club,
+            ("GET", "/dashboard"): self.handle_dashboard,
+            ("GET", "/health"): self.handle_health,
+            ("GET", "/metrics"): self.handle_metrics,
+        }
+        self.requests = 0
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, target, headers, body = request
+                status, payload = await self.dispatch(method, target, body)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                self._write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ServiceError as e:
+            self._write_response(writer, e.status, {"error": e.message}, keep_alive=False)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _readline(reader):
+        try:
+            return await reader.readline()
+        except ValueError:  # longer than the stream's buffer limit
+            raise ServiceError(400, "Request line or header too long.")
+
+    async def _read_request(self, reader):
+        line = await self._readline(reader)
+        if not line:
+            return None
+        try:
+            method, target, _ = line.decode("latin-1").split(" ", 2)
+        except ValueError:
+            raise ServiceError(400, "Malformed request line.")
+        headers = {}
+        while True:
+            line = await self._readline(reader)
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            raise ServiceError(400, "Invalid Content-Length.")
+        if length < 0 or length > MAX_BODY:
+            raise ServiceError(413, "Request body too large.")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), target, headers, body
+
+    def _write_response(self, writer, status, payload, keep_alive):
+        if isinstance(payload, str):
+            data, content_type = payload.encode(), "text/plain; version=0.0.4"
+        else:
+            data, content_type = json.dumps(payload).encode(), "application/json"
+        head = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}",
+                f"Content-Type: {content_type}",
+                f"Content-Length: {len(data)}",
+                "Connection: keep-alive" if keep_alive else "Connection: close"]
+        if status == 503:
+            head.append("Retry-After: 1")
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + data)
+
+    async def dispatch(self, method, target, body):
+        self.requests += 1
+        url = urlsplit(target)
+        started = time.perf_counter()
+        status, payload = await self._dispatch(method, url, body)
+        route = url.path if (method, url.path) in self.routes else "unmatched"
+        self.metrics.observe("http_request_seconds", time.perf_counter() - started, route=route, status=status)
+        return status, payload
+
+    async def _dispatch(self, method, url, body):
+        handler = self.routes.get((method, url.path))
+        if handler is None:
+            if any(path == url.path for _, path in self.routes):
+                return 405, {"error": "Method not allowed."}
+            return 404, {"error": "Not found."}
+        try:
+            if method == "POST":
+                try:
+                    body = json.loads(body or b"{}")
+                except ValueError:
+                    raise ServiceError(400, "Body must be JSON.")
+                if not isinstance(body, dict):
+                    raise ServiceError(400, "Body must be a JSON object.")
+                return 200, await handler(body)
+            return 200, await handler(parse_qs(url.query))
+        except ServiceError as e:
+            return e.status, {"error": e.message}
+        except Overloaded:
+            return 503, {"error": "Service overloaded, retry shortly."}
+        except Exception as e:
+            print(f"Error handling {method} {url.path}: {e}")
+            return 500, {"error": "Internal error."}
+
+    async def handle_auth(self, body):
+        if "token" in body:
+            return await self.service.resume_session(str(body["token"]))
+        return await self.service.authenticate(str(body.get("username", "")), str(body.get("password", "")))
+
+    async def handle_search(self, query):
+        try:
+            limit = int(query.get("limit", ["50"])[0])
+        except ValueError:
+            raise ServiceError(400, "'limit' must be an integer.")
+        return {"results": await self.service.search(query.get("q", [""])[0], limit)}
+
+    async def handle_borrow(self, body):
+        user_id = await _session_user_id(self.service, body)
+        return await self.service.borrow(_int_field(body, "book_id"), user_id)
+
+    async def handle_return(self, body):
+        user_id = await _session_user_id(self.service, body)
+        return await self.service.return_loan(_int_field(body, "loan_id"), user_id)
+
+    async def handle_join_club(self, body):
+        user_id = await _session_user_id(self.service, body)
+        return await self.service.join_club(_int_field(body, "club_id"), user_id)
+
+    async def handle_dashboard(self, _query):
+        return await self.service.dashboard()
+
+    async def handle_health(self, _query):
+        return dict(self.service.stats(), requests=self.requests)
+
+    async def handle_metrics(self, _query):
+        stats = self.service.stats()
+        return self.metrics.to_prometheus({
+            "service_pool_size": stats["pool"]["size"], "service_pool_idle": stats["pool"]["idle"],
+            "service_waiting": stats["waiting"], "service_rejected": stats["rejected"],
+            "service_search_batches": stats["search"]["batches"],
+            "service_search_coalesced": stats["search"]["coalesced"],
+            "service_auth_checks": stats["auth"]["checks"], "service_auth_upgrades": stats["auth"]["upgrades"],
+            "service_sessions": stats["sessions"]["size"],
+        })
+
+
+async def serve(args):
+    service = LibraryService(db_config={"dbname": args.dbname} if args.dbname else None,
+                             pool_size=args.pool_size, max_queue=args.max_queue,
+                             queue_timeout=args.queue_timeout, search_window=args.search_window / 1000)
+    await service.start()
+    frontend = HttpFrontend(service)
+    server = await asyncio.start_server(frontend.handle_connection, args.host, args.port, backlog=1024)
+    print(f"SmartLibrary service listening on http://{args.host}:{args.port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SmartLibrary HTTP/JSON service for kiosks.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--dbname", help="defaults to the DAO's database")
+    parser.add_argument("--pool-size", type=int, default=10)
+    parser.add_argument("--max-queue", type=int, default=256, help="requests allowed to wait for a connection")
+    parser.add_argument("--queue-timeout", type=float, default=2.0, help="seconds before a waiting request gets 503")
+    parser.add_argument("--search-window", type=float, default=2.0, help="search batching window in ms")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
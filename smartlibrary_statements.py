@@ -0,0 +1,115 @@
+import re
+
+import psycopg2
+from psycopg2 import errors, extensions
+
+_NAMED_PARAM = re.compile(r"%\((\w+)\)s")
+
+# Errors that mean a prepared statement no longer matches the server: it was
+# deallocated, or the schema changed underneath it ("cached plan must not change
+# result type"), or re-preparing it hits a dropped column/table.
+STALE_STATEMENT_ERRORS = (
+    errors.InvalidSqlStatementName,
+    errors.FeatureNotSupported,
+    errors.UndefinedColumn,
+    errors.UndefinedTable,
+    errors.UndefinedFunction,
+)
+
+
+class PreparingConnection(extensions.connection):
+    """psycopg2 connection that remembers which statements it has PREPAREd."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+        self.unpreparable = set()
+
+
+class Statement:
+    def __init__(self, name, sql, params):
+        # sql uses psycopg2 named placeholders (%(name)s); params is [(name, pg_type), ...]
+        self.name = name
+        self.sql = sql
+        self.param_names = [p for p, _ in params]
+        positions = {p: i + 1 for i, p in enumerate(self.param_names)}
+        # $n form, as used by PREPARE and by asyncpg
+        self.server_sql = _NAMED_PARAM.sub(lambda m: f"${positions[m.group(1)]}", sql).replace("%%", "%")
+        types = ", ".join(t for _, t in params)
+        self.prepare_sql = (f"PREPARE {name} ({types}) AS {self.server_sql}" if params
+                            else f"PREPARE {name} AS {self.server_sql}")
+        placeholders = ", ".join(f"%({p})s" for p in self.param_names)
+        self.execute_sql = f"EXECUTE {name} ({placeholders})" if params else f"EXECUTE {name}"
+
+
+class StatementRegistry:
+    """Server-side prepared statements for the DAO's hot queries.
+
+    Each statement is PREPAREd once per connection (eagerly when the pool opens
+    a connection, lazily if that was missed) and then run with EXECUTE, so the
+    server skips parsing and planning. When a prepared statement turns out to be
+    stale the transaction is rolled back, the statement is deallocated and the
+    query is re-run as plain SQL; the next call prepares it again.
+
+    Because a failure rolls the transaction back, execute() must be the first
+    statement of its transaction, which is how the DAO uses it.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.statements = {}
+        self.fallbacks = 0
+        self.prepares = 0
+
+    def register(self, name, sql, params=()):
+        self.statements[name] = Statement(name, sql, list(params))
+
+    def prepare_all(self, conn):
+        if not self.enabled or not isinstance(conn, PreparingConnection):
+            return
+        with conn.cursor() as cursor:
+            for statement in self.statements.values():
+                self._prepare(conn, cursor, statement)
+        conn.commit()
+
+    def _prepare(self, conn, cursor, statement):
+        cursor.execute("SAVEPOINT prepare_statement")
+        try:
+            cursor.execute(statement.prepare_sql)
+        except psycopg2.Error:
+            cursor.execute("ROLLBACK TO SAVEPOINT prepare_statement")
+            conn.unpreparable.add(statement.name)
+            return False
+        cursor.execute("RELEASE SAVEPOINT prepare_statement")
+        conn.prepared.add(statement.name)
+        self.prepares += 1
+        return True
+
+    def execute(self, cursor, name, params=None):
+        statement = self.statements[name]
+        params = params or {}
+        conn = cursor.connection
+        if (not self.enabled or not isinstance(conn, PreparingConnection)
+                or name in conn.unpreparable):
+            cursor.execute(statement.sql, params)
+            return
+
+        if name not in conn.prepared and not self._prepare(conn, cursor, statement):
+            cursor.execute(statement.sql, params)
+            return
+        try:
+            cursor.execute(statement.execute_sql, params)
+        except STALE_STATEMENT_ERRORS:
+            conn.rollback()
+            conn.prepared.discard(name)
+            try:
+                cursor.execute(f"DEALLOCATE {name}")
+            except psycopg2.Error:
+                pass
+            conn.rollback()
+            self.fallbacks += 1
+            cursor.execute(statement.sql, params)
+
+    def stats(self):
+        return {"enabled": self.enabled, "statements": len(self.statements),
+                "prepares": self.prepares, "fallbacks": self.fallbacks}
@@ -0,0 +1,339 @@
+"""Trending books per day, week and month from streaming heavy-hitter sketches.
+
+    python smartlibrary_trending.py                       # top 10 of every window
+    python smartlibrary_trending.py --window week --genre Fantasy -k 5
+
+Every calendar day of loans gets a bucket holding a Count-Min sketch (approximate
+loan count of any book) and Space-Saving summaries (the day's most borrowed
+books, overall and per genre). A window (today, the last 7 days, the last 30
+days) keeps the sum of its buckets' Count-Min sketches and a bounded leader
+board per genre fed with those estimates, so a top-k query reads a few hundred
+entries at most however many loans there are. Memory is fixed by the sketch
+sizes and MAX_DAYS buckets. When the day changes, expired buckets are dropped and
+the window leaders are re-ranked from the remaining buckets' heavy hitters.
+
+Counts are estimates: Count-Min only over-counts, by at most e / width of the
+window's loans with probability 1 - e^-depth. benchmarks/trending_accuracy.py
+compares them with the exact GROUP BY.
+"""
+import argparse
+import datetime
+import heapq
+import random
+import threading
+from array import array
+
+WINDOWS = {"day": 1, "week": 7, "month": 30}
+MAX_DAYS = max(WINDOWS.values())
+CMS_WIDTH = 4096
+CMS_DEPTH = 4
+CAPACITY = 200  # books tracked per bucket summary and per window leader board
+GENRE_CAPACITY = 50
+PRIME = (1 << 61) - 1
+# Loans commit out of id order, so every catch-up re-reads this many ids below
+# the newest one seen; ids already counted are skipped
+OVERLAP_IDS = 1000
+
+
+# --- SKETCHES ---
+class CountMinSketch:
+    """depth rows of width counters; estimate(key) never under-counts.
+
+    Sketches built with the same width, depth and seed can be added and
+    subtracted cell by cell, which is how windows are kept.
+    """
+
+    def __init__(self, width=CMS_WIDTH, depth=CMS_DEPTH, seed=17):
+        self.width = width
+        self.depth = depth
+        self.seed = seed
+        rng = random.Random(seed)
+        self._hashes = [(rng.randrange(1, PRIME), rng.randrange(PRIME)) for _ in range(depth)]
+        self.rows = [array("q", bytes(8 * width)) for _ in range(depth)]
+        self.total = 0
+
+    def _cells(self, key):
+        return [((a * key + b) % PRIME) % self.width for a, b in self._hashes]
+
+    def add(self, key, count=1):
+        for row, cell in zip(self.rows, self._cells(key)):
+            row[cell] += count
+        self.total += count
+
+    def estimate(self, key):
+        return min(row[cell] for row, cell in zip(self.rows, self._cells(key)))
+
+    def merge(self, other, sign=1):
+        for row, other_row in zip(self.rows, other.rows):
+            for cell, value in enumerate(other_row):
+                if value:
+                    row[cell] += sign * value
+        self.total += sign * other.total
+
+    def empty_copy(self):
+        return CountMinSketch(self.width, self.depth, self.seed)
+
+    def nbytes(self):
+        return sum(row.itemsize * len(row) for row in self.rows)
+
+
+class SpaceSaving:
+    """Top-capacity heavy hitters of a stream (Metwally et al.).
+
+    A new key that finds the summary full replaces the key with the smallest
+    count and inherits that count as its error, so count - error <= true count
+    <= count. offer() instead sets a key's score from outside (a window's
+    Count-Min estimate) and keeps the capacity highest.
+    """
+
+    def __init__(self, capacity=CAPACITY):
+        self.capacity = capacity
+        self.counts = {}  # key -> (count, error)
+        self._heap = []  # (count, key), lazily deleted; stale entries are skipped on pop
+        self._ranked = None
+
+    def __len__(self):
+        return len(self.counts)
+
+    def add(self, key, count=1):
+        entry = self.counts.get(key)
+        if entry is not None:
+            self._set(key, entry[0] + count, entry[1])
+        elif len(self.counts) < self.capacity:
+            self._set(key, count, 0)
+        else:
+            floor = self._pop_min()
+            self._set(key, floor + count, floor)
+
+    def offer(self, key, score):
+        entry = self.counts.get(key)
+        if entry is not None or len(self.counts) < self.capacity:
+            if entry is None or score > entry[0]:
+                self._set(key, score, 0)
+        elif score > self._min():
+            self._pop_min()
+            self._set(key, score, 0)
+
+    def _set(self, key, count, error):
+        self.counts[key] = (count, error)
+        heapq.heappush(self._heap, (count, key))
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(c, k) for k, (c, _) in self.counts.items()]
+            heapq.heapify(self._heap)
+        self._ranked = None
+
+    def _min(self):
+        while True:
+            count, key = self._heap[0]
+            entry = self.counts.get(key)
+            if entry is not None and entry[0] == count:
+                return count
+            heapq.heappop(self._heap)
+
+    def _pop_min(self):
+        count = self._min()
+        del self.counts[heapq.heappop(self._heap)[1]]
+        return count
+
+    def top(self, k):
+        # [(key, count)] highest first; ranked once per change, so repeated reads are a slice
+        if self._ranked is None:
+            self._ranked = sorted(((key, count) for key, (count, _) in self.counts.items()),
+                                  key=lambda item: (-item[1], item[0]))
+        return self._ranked[:k]
+
+
+# --- WINDOWS ---
+class _Bucket:
+    # One calendar day of loans
+    def __init__(self, cms):
+        self.cms = cms
+        self.heavy = {None: SpaceSaving(CAPACITY)}  # None = all genres
+
+    def add(self, book_id, genre):
+        self.cms.add(book_id)
+        self.heavy[None].add(book_id)
+        if genre not in self.heavy:
+            self.heavy[genre] = SpaceSaving(GENRE_CAPACITY)
+        self.heavy[genre].add(book_id)
+
+
+class _Window:
+    def __init__(self, days, cms):
+        self.days = days
+        self.cms = cms
+        self.leaders = {}  # genre (None = all) -> SpaceSaving of Count-Min estimates
+
+    def offer(self, book_id, genre):
+        estimate = self.cms.estimate(book_id)
+        for key, capacity in ((None, CAPACITY), (genre, GENRE_CAPACITY)):
+            if key not in self.leaders:
+                self.leaders[key] = SpaceSaving(capacity)
+            self.leaders[key].offer(book_id, estimate)
+
+
+class TrendingBooks:
+    """Top-k most borrowed books per window and per genre, fed one loan at a time.
+
+    Thread-safe: the DAO feeds it from whichever thread catches up on loans
+    while the GUI reads it. clock returns today's date (injectable for tests
+    and benchmarks).
+    """
+
+    def __init__(self, windows=None, width=CMS_WIDTH, depth=CMS_DEPTH, clock=datetime.date.today):
+        self.windows_days = dict(windows or WINDOWS)
+        self.max_days = max(self.windows_days.values())
+        self.clock = clock
+        self._template = CountMinSketch(width, depth)
+        self._lock = threading.Lock()
+        self.today = clock()
+        self.buckets = {}  # date -> _Bucket
+        self.windows = {name: _Window(days, self._template.empty_copy()) for name, days in self.windows_days.items()}
+        self.last_loan_id = 0
+        self._recent_ids = set()  # ids within OVERLAP_IDS of last_loan_id, already counted
+        self.loans = 0
+
+    @property
+    def since(self):
+        # Oldest borrow date any window still covers
+        return self.today - datetime.timedelta(days=self.max_days - 1)
+
+    def add(self, book_id, genre=None, day=None):
+        with self._lock:
+            self._add(book_id, genre, day or self.today)
+
+    def _add(self, book_id, genre, day):
+        if day > self.today:
+            self._advance(day)
+        age = (self.today - day).days
+        if age >= self.max_days:
+            return
+        bucket = self.buckets.get(day)
+        if bucket is None:
+            bucket = self.buckets[day] = _Bucket(self._template.empty_copy())
+        bucket.add(book_id, genre)
+        for window in self.windows.values():
+            if age < window.days:
+                window.cms.add(book_id)
+                window.offer(book_id, genre)
+        self.loans += 1
+
+    def record_loans(self, rows):
+        # rows of (loan_id, book_id, genre, borrow_date); loans already counted are skipped
+        with self._lock:
+            for loan_id, book_id, genre, borrow_date in rows:
+                if loan_id <= self.last_loan_id - OVERLAP_IDS or loan_id in self._recent_ids:
+                    continue
+                self._recent_ids.add(loan_id)
+                self.last_loan_id = max(self.last_loan_id, loan_id)
+                self._add(book_id, genre, borrow_date)
+            floor = self.last_loan_id - OVERLAP_IDS
+            self._recent_ids = {loan_id for loan_id in self._recent_ids if loan_id > floor}
+
+    def _advance(self, today):
+        # A new day: drop expired buckets, rebuild each window's sketch from its
+        # buckets and re-rank its leaders from their heavy hitters
+        self.today = today
+        for day in [d for d in self.buckets if (today - d).days >= self.max_days]:
+            del self.buckets[day]
+        for window in self.windows.values():
+            window.cms = self._template.empty_copy()
+            window.leaders = {}
+            live = [b for d, b in self.buckets.items() if (today - d).days < window.days]
+            for bucket in live:
+                window.cms.merge(bucket.cms)
+            for bucket in live:
+                for genre, heavy in bucket.heavy.items():
+                    for book_id in heavy.counts:
+                        capacity = CAPACITY if genre is None else GENRE_CAPACITY
+                        if genre not in window.leaders:
+                            window.leaders[genre] = SpaceSaving(capacity)
+                        window.leaders[genre].offer(book_id, window.cms.estimate(book_id))
+
+    def top(self, window="week", k=5, genre=None):
+        # [(book_id, estimated loans)] most borrowed first
+        if window not in self.windows:
+            raise ValueError(f"Unknown window '{window}' (expected one of {', '.join(self.windows)}).")
+        with self._lock:
+            today = self.clock()
+            if today > self.today:
+                self._advance(today)
+            leaders = self.windows[window].leaders.get(genre)
+            return leaders.top(k) if leaders is not None else []
+
+    def estimate(self, book_id, window="week"):
+        with self._lock:
+            return self.windows[window].cms.estimate(book_id)
+
+    def genres(self):
+        with self._lock:
+            return sorted({g for w in self.windows.values() for g in w.leaders if g is not None})
+
+    def stats(self):
+        with self._lock:
+            return {
+                "loans": self.loans,
+                "last_loan_id": self.last_loan_id,
+                "buckets": len(self.buckets),
+                "sketch_bytes": sum(b.cms.nbytes() for b in self.buckets.values())
+                + sum(w.cms.nbytes() for w in self.windows.values()),
+            }
+
+
+# --- LOADING LOANS ---
+LOANS_SQL = """
+    SELECT l.id, l.book_id, b.genre, l.borrow_date
+    FROM Loans l JOIN Books b ON b.id = l.book_id
+    WHERE l.id > %(after)s AND l.borrow_date >= %(since)s
+    ORDER BY l.id
+"""
+
+
+def catch_up(dao, trending, itersize=10000):
+    # Feeds loans made since the last call (on the first call, the last MAX_DAYS
+    # days of them) through a server-side cursor; returns how many rows were read
+    if dao.pool is None:
+        raise ValueError("Not connected to the database.")
+    rows = 0
+    with dao.pool.connection() as conn:
+        try:
+            cursor = conn.cursor(name="trending_loans", cursor_factory=dao.tuple_cursor_factory)
+            cursor.itersize = itersize
+            cursor.metrics = dao.metrics
+            cursor.execute(LOANS_SQL, {"after": max(0, trending.last_loan_id - OVERLAP_IDS),
+                                       "since": trending.since})
+            while True:
+                batch = cursor.fetchmany(itersize)
+                if not batch:
+                    break
+                trending.record_loans(batch)
+                rows += len(batch)
+            cursor.close()
+        finally:
+            conn.rollback()
+    return rows
+
+
+def main():
+    from SmartLibManager_dao import SmartLibManagerDAO
+
+    parser = argparse.ArgumentParser(description="Show the most borrowed books per window.")
+    parser.add_argument("--window", choices=list(WINDOWS), help="default: every window")
+    parser.add_argument("--genre")
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--dbname", help="defaults to the DAO's database")
+    args = parser.parse_args()
+
+    dao = SmartLibManagerDAO(db_config={"dbname": args.dbname} if args.dbname else None, listen_for_changes=False)
+    try:
+        for window in [args.window] if args.window else list(WINDOWS):
+            print(f"Trending this {window}" + (f" in {args.genre}" if args.genre else "") + ":")
+            ranked, _ = dao.get_trending_books(window, k=args.k, genre=args.genre)
+            for book, count in ranked:
+                print(f"  ~{count:>6}  {book.title} ({book.genre})")
+    finally:
+        dao.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+import threading
+import time
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+
+class _TaskSignals(QObject):
+    # (task, succeeded, result or exception); emitted from the worker thread and
+    # delivered on the GUI thread through a queued connection.
+    done = pyqtSignal(object, bool, object)
+
+
+class DaoTask(QRunnable):
+    def __init__(self, executor, key, generation, fn, args, kwargs):
+        super().__init__()
+        self.setAutoDelete(False)  # the executor keeps the Python reference until done
+        self.executor = executor
+        self.key = key
+        self.generation = generation
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.on_result = None
+        self.on_error = None
+        self.span = None
+        self.started = False
+        self.cancelled = False
+        self.signals = _TaskSignals()
+        # perf_counter timestamps for the UI span: submitted -> run -> finished -> rendered
+        self.submitted_at = time.perf_counter()
+        self.run_at = self.finished_at = None
+
+    def run(self):
+        if not self.executor._claim(self):
+            self.signals.done.emit(self, False, None)
+            return
+        self.run_at = time.perf_counter()
+        try:
+            result = self.fn(*self.args, **self.kwargs)
+        except Exception as e:
+            self.finished_at = time.perf_counter()
+            self.signals.done.emit(self, False, e)
+        else:
+            self.finished_at = time.perf_counter()
+            self.signals.done.emit(self, True, result)
+
+
+class DaoExecutor(QObject):
+    """Runs DAO calls on a QThreadPool and hands results back on the GUI thread.
+
+    Tasks submitted with the same key supersede each other: a queued task that
+    has not started yet is cancelled, and a running one has its result dropped.
+    With coalesce=True a new submission is folded into an identical one that is
+    still waiting in the queue instead.
+
+    Tasks submitted with span=<handler name> are recorded in metrics as
+    ui_span_seconds with phase queue (submit to worker), dao (the call itself),
+    render (the on_result/on_error callback on the GUI thread) and total.
+    """
+
+    def __init__(self, max_threads=4, parent=None, metrics=None):
+        super().__init__(parent)
+        self.metrics = metrics
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads)
+        self._lock = threading.Lock()
+        self._tasks = set()
+        self._generation = {}
+        self._latest = {}  # key -> most recently submitted task
+
+    def submit(self, key, fn, *args, on_result=None, on_error=None, coalesce=False, span=None, **kwargs):
+        with self._lock:
+            latest = self._latest.get(key) if key is not None else None
+            if latest is not None and not latest.started and not latest.cancelled:
+                if coalesce:
+                    return latest
+                latest.cancelled = True
+            generation = self._generation.get(key, 0) + 1
+            task = DaoTask(self, key, generation, fn, args, kwargs)
+            task.on_result = on_result
+            task.on_error = on_error
+            task.span = span
+            if key is not None:
+                self._generation[key] = generation
+                self._latest[key] = task
+            self._tasks.add(task)
+
+        task.signals.done.connect(self._on_done)
+        self.pool.start(task)
+        return task
+
+    def cancel(self, key):
+        with self._lock:
+            self._generation[key] = self._generation.get(key, 0) + 1
+            latest = self._latest.pop(key, None)
+            if latest is not None and not latest.started:
+                latest.cancelled = True
+
+    def is_busy(self, key):
+        with self._lock:
+            latest = self._latest.get(key)
+            return latest is not None and not latest.cancelled
+
+    def _claim(self, task):
+        # Called from the worker thread right before the task body runs.
+        with self._lock:
+            if task.cancelled:
+                return False
+            task.started = True
+            return True
+
+    def _on_done(self, task, ok, value):
+        with self._lock:
+            self._tasks.discard(task)
+            stale = task.cancelled or (task.key is not None and self._generation.get(task.key) != task.generation)
+            if self._latest.get(task.key) is task:
+                del self._latest[task.key]
+        if stale:
+            return
+        if not ok and value is not None and self.metrics and task.span:
+            self.metrics.inc("ui_errors_total", handler=task.span)
+        if ok:
+            if task.on_result:
+                task.on_result(value)
+        elif value is not None:
+            if task.on_error:
+                task.on_error(value)
+            else:
+                print(f"Background database call failed: {value}")
+        if self.metrics and task.span and task.run_at is not None:
+            rendered = time.perf_counter()
+            for phase, seconds in (("queue", task.run_at - task.submitted_at),
+                                   ("dao", task.finished_at - task.run_at),
+                                   ("render", rendered - task.finished_at),
+                                   ("total", rendered - task.submitted_at)):
+                self.metrics.observe("ui_span_seconds", seconds, handler=task.span, phase=phase)
+
+    def shutdown(self, timeout_ms=3000):
+        with self._lock:
+            for task in self._tasks:
+                if not task.started:
+                    task.cancelled = True
+        self.pool.waitForDone(timeout_ms)
@@ -1,11 +1,20 @@
+import time
+
+STARTED = time.perf_counter()  # launch, for the startup profile; taken before the heavy imports
+
+import os
+import re
 import sys
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                              QLabel, QLineEdit, QPushButton, QMessageBox,
-                             QTabWidget, QTableWidget, QTableWidgetItem, QHeaderView,
-                             QFormLayout, QGroupBox, QInputDialog)
-from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QFont, QColor
+                             QTabWidget, QTableWidget, QTableWidgetItem, QTableView, QHeaderView,
+                             QFormLayout, QGroupBox, QInputDialog, QFileDialog, QComboBox)
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtGui import QFont
 from SmartLibManager_dao import SmartLibManagerDAO
+from smartlibrary_catalog_model import CatalogTableModel
+from smartlibrary_metrics import StartupProfiler
+from smartlibrary_worker import DaoExecutor
 
 # Styling
 STYLE = """
@@ -20,21 +29,44 @@ STYLE = """
         border-radius: 10px; font-weight: bold; font-size: 14px;
     }
     QPushButton:hover { background-color: #778da9; }
-    QTableWidget { background-color: #1b263b; color: #e0e1dd; gridline-color: #33415c; }
+    QTableWidget, QTableView { background-color: #1b263b; color: #e0e1dd; gridline-color: #33415c; }
     QHeaderView::section { background-color: #415a77; color: white; padding: 12px; font-weight: bold; }
     QGroupBox { color: #778da9; border: 2px solid #415a77; border-radius: 12px; margin-top: 20px; font-weight: bold;}
 """
 
 
+def parse_ids(text):
+    # "3, 7 12" -> [3, 7, 12]; raises ValueError on anything that isn't an integer
+    return [int(part) for part in re.split(r"[,\s]+", text.strip()) if part]
+
+
+def summarize_results(results, label, key):
+    ok = [r for r in results if r["error"] is None]
+    lines = [f"{len(ok)} of {len(results)} {label}."]
+    lines += [f"ID {r[key]}: {r['error']}" for r in results if r["error"] is not None]
+    return "\n".join(lines)
+
+
 class SmartLibraryApp(QMainWindow):
     def __init__(self):
         super().__init__()
-        self.dao = SmartLibManagerDAO()
+        # SMARTLIBRARY_REPLICA=<file> reads the catalog and clubs from a local copy (branch terminals).
+        # The database connects in the background once the login form is up; DAO calls made
+        # before that (a quick login) wait for it.
+        self.dao = SmartLibManagerDAO(replica=os.environ.get("SMARTLIBRARY_REPLICA"), connect=False)
+        # Milestones land in startup_seconds; SMARTLIBRARY_PROFILE_STARTUP=1 also prints them
+        self.profiler = StartupProfiler(STARTED, self.dao.metrics)
+        self.profiler.mark("imports")
+        # Every DAO call runs on this pool; results come back through Qt signals
+        self.executor = DaoExecutor(parent=self, metrics=self.dao.metrics)
         self.current_user = None
+        self._tab_builders = {}  # placeholder page -> (name, create_*_tab) until first shown
+        self._built_tabs = set()
         self.setWindowTitle("SmartLibrary System")
         self.setGeometry(100, 100, 1100, 700)
         self.setStyleSheet(STYLE)
         self.init_login()
+        QTimer.singleShot(0, self.on_login_screen_shown)  # runs once the event loop has painted the form
 
         # Dashboard elements initialized here to be accessible for refresh
         self.stat_widgets = {}  # Stores the QLabel objects for the counts
@@ -58,27 +90,46 @@ class SmartLibraryApp(QMainWindow):
         self.password_edit.setPlaceholderText("Password")
         self.password_edit.setEchoMode(QLineEdit.Password)
 
-        login_btn = QPushButton("LOGIN")
-        login_btn.clicked.connect(self.authenticate)
+        self.login_btn = QPushButton("LOGIN")
+        self.login_btn.clicked.connect(self.authenticate)
 
         layout.addWidget(title)
         layout.addWidget(self.username_edit)
         layout.addWidget(self.password_edit)
-        layout.addWidget(login_btn)
+        layout.addWidget(self.login_btn)
         widget.setLayout(layout)
 
+    def on_login_screen_shown(self):
+        self.profiler.mark("login_screen")
+        # password-hashing processes and the connection pool start while the login form is up
+        self.executor.submit(None, self.dao.hasher.start, span="start_hasher")
+        self.executor.submit("connect", self.dao.connect, span="connect", on_result=self.on_connected)
+
+    def on_connected(self, _):
+        if self.dao.pool is not None:  # connect() reports a failure itself and leaves the pool unset
+            self.profiler.mark("connected")
+
     def authenticate(self):
         u = self.username_edit.text()
         p = self.password_edit.text()
-        user = self.dao.authenticate_user(u, p)
+        self.login_btn.setEnabled(False)
+        self.executor.submit("login", self.dao.authenticate_user, u, p, span="authenticate",
+                             on_result=self.on_authenticated, on_error=self.on_login_failed)
 
+    def on_authenticated(self, user):
+        self.login_btn.setEnabled(True)
         if user:
             self.current_user = user
+            self.profiler.mark("logged_in")
             QMessageBox.information(self, "Success", f"Welcome {user.full_name}!")
             self.show_main_interface()
         else:
             QMessageBox.warning(self, "Error", "Invalid credentials")
 
+    def on_login_failed(self, error):
+        self.login_btn.setEnabled(True)
+        QMessageBox.critical(self, "Error", str(error))
+
     def show_main_interface(self):
         # ... (Main interface setup code remains the same)
         self.centralWidget().deleteLater()
@@ -89,19 +140,64 @@ class SmartLibraryApp(QMainWindow):
         header.setStyleSheet("font-size: 18px; color: #778da9; padding: 10px;")
         layout.addWidget(header)
 
+        # Each tab is built, and runs its queries, the first time it is shown
         self.tabs = QTabWidget()
-        self.tabs.addTab(self.create_catalog_tab(), "Catalog")
-        self.tabs.addTab(self.create_loan_tab(), "Borrow/Return")
+        self._add_lazy_tab("catalog", self.create_catalog_tab, "Catalog")
+        self._add_lazy_tab("loans", self.create_loan_tab, "Borrow/Return")
         if self.current_user.role_id == 1:
-            self.tabs.addTab(self.create_admin_tab(), "Admin: Add Book")
-        self.tabs.addTab(self.create_club_tab(), "Clubs")
-        self.tabs.addTab(self.create_dashboard_tab(), "Dashboard")
+            self._add_lazy_tab("admin", self.create_admin_tab, "Admin: Add Book")
+        self._add_lazy_tab("clubs", self.create_club_tab, "Clubs")
+        self._add_lazy_tab("dashboard", self.create_dashboard_tab, "Dashboard")
+        self.tabs.currentChanged.connect(self.build_current_tab)
 
         layout.addWidget(self.tabs)
 
         container = QWidget()
         container.setLayout(layout)
         self.setCentralWidget(container)
+        self.build_current_tab()
+        self.catalog_model.page_loaded.connect(self.on_first_tab_shown)
+
+    def _add_lazy_tab(self, name, builder, title):
+        page = QWidget()
+        page_layout = QVBoxLayout()
+        page_layout.setContentsMargins(0, 0, 0, 0)
+        page.setLayout(page_layout)
+        self._tab_builders[page] = (name, builder)
+        self.tabs.addTab(page, title)
+
+    def build_current_tab(self, *_):
+        entry = self._tab_builders.pop(self.tabs.currentWidget(), None)
+        if entry is None:
+            return  # already built
+        name, builder = entry
+        self._built_tabs.add(name)  # before builder(), whose initial load checks it
+        self.tabs.currentWidget().layout().addWidget(builder())
+
+    def on_first_tab_shown(self):
+        self.catalog_model.page_loaded.disconnect(self.on_first_tab_shown)
+        self.profiler.mark("first_tab")
+        if os.environ.get("SMARTLIBRARY_PROFILE_STARTUP"):
+            print(self.profiler.report())
+        self.prefetch_tabs()
+
+    def prefetch_tabs(self):
+        # Warms the DAO caches behind the tabs not opened yet, one query after another on a
+        # single worker so the catalog's own paging isn't crowded out
+        calls = []
+        if "clubs" not in self._built_tabs:
+            calls.append(self.dao.get_clubs_summary)
+        if "dashboard" not in self._built_tabs:
+            user_id = self.current_user.id
+            calls += [self.dao.sync_trending, lambda: self.dao.get_recommendations(user_id)]
+
+        def run_all():
+            for call in calls:
+                call()
+
+        if calls:
+            self.executor.submit("prefetch", run_all, span="prefetch",
+                                 on_error=lambda e: print(f"Error prefetching tabs: {e}"))
 
     def create_catalog_tab(self):
         # ... (Catalog tab creation code remains the same)
@@ -111,40 +207,60 @@ class SmartLibraryApp(QMainWindow):
         # Search
         search_layout = QHBoxLayout()
         self.search_bar = QLineEdit()
-        self.search_bar.setPlaceholderText("Search title...")
+        self.search_bar.setPlaceholderText("Search title, author or genre...")
         btn_search = QPushButton("Search")
         btn_search.clicked.connect(self.load_catalog)
+        self.search_bar.returnPressed.connect(self.load_catalog)
+        # Search as you type; each new search supersedes the one still in flight
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(250)
+        self.search_timer.timeout.connect(self.load_catalog)
+        self.search_bar.textChanged.connect(self.search_timer.start)
         search_layout.addWidget(self.search_bar)
         search_layout.addWidget(btn_search)
 
-        # Table
-        self.book_table = QTableWidget(0, 5)
-        self.book_table.setHorizontalHeaderLabels(["ID", "Title", "Genre", "Year", "Status"])
+        # Table (rows are paged in from the DAO as the user scrolls)
+        self.catalog_model = CatalogTableModel(self.dao, self.executor, parent=self)
+        self.book_table = QTableView()
+        self.book_table.setModel(self.catalog_model)
+        self.book_table.verticalHeader().setVisible(False)
         self.book_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.book_table.setSelectionBehavior(QTableView.SelectRows)
+        self.book_table.selectionModel().currentRowChanged.connect(self.load_also_borrowed)
+
+        # "Readers also borrowed" for the selected book
+        self.also_borrowed_label = QLabel("<i>Select a book to see what its readers also borrowed.</i>")
+        self.also_borrowed_label.setWordWrap(True)
+        self.also_borrowed_label.setStyleSheet("color: #e0e1dd; padding: 6px;")
 
         layout.addLayout(search_layout)
         layout.addWidget(self.book_table)
+        layout.addWidget(self.also_borrowed_label)
         widget.setLayout(layout)
         self.load_catalog()
         return widget
 
     def load_catalog(self):
-        # ... (load_catalog code remains the same)
+        if "catalog" not in self._built_tabs:
+            return  # loads when first shown
         query = self.search_bar.text()
-        books = self.dao.get_all_books(query)
-        self.book_table.setRowCount(len(books))
-        for i, b in enumerate(books):
-            status = "Available" if b.available else "Borrowed"
-            color = "#4CAF50" if b.available else "#F44336"
-
-            self.book_table.setItem(i, 0, QTableWidgetItem(str(b.id)))
-            self.book_table.setItem(i, 1, QTableWidgetItem(b.title))
-            self.book_table.setItem(i, 2, QTableWidgetItem(b.genre))
-            self.book_table.setItem(i, 3, QTableWidgetItem(str(b.publication_year)))
-
-            status_item = QTableWidgetItem(status)
-            status_item.setBackground(QColor(color))
-            self.book_table.setItem(i, 4, status_item)
+        self.catalog_model.load(query)
+
+    def load_also_borrowed(self, current, _previous):
+        if not current.isValid():
+            return
+        book = self.catalog_model.book_at(current.row())
+        self.executor.submit("also_borrowed", self.dao.get_also_borrowed, book.id, span="load_also_borrowed",
+                             on_result=lambda books: self.show_also_borrowed(book, books),
+                             on_error=lambda e: print(f"Error loading recommendations: {e}"))
+
+    def show_also_borrowed(self, book, books):
+        if books:
+            titles = ", ".join(b.title for b in books)
+            self.also_borrowed_label.setText(f"<b>Readers of {book.title} also borrowed:</b> {titles}")
+        else:
+            self.also_borrowed_label.setText(f"<i>No recommendations for {book.title} yet.</i>")
 
     def create_loan_tab(self):
         # ... (Loan tab creation code remains the same)
@@ -155,15 +271,15 @@ class SmartLibraryApp(QMainWindow):
         form = QFormLayout()
 
         self.loan_book_id = QLineEdit()
-        self.loan_book_id.setPlaceholderText("Book ID")
+        self.loan_book_id.setPlaceholderText("Book ID(s), e.g. 3, 7, 12")
 
         btn_borrow = QPushButton("Borrow Book")
         btn_borrow.clicked.connect(self.handle_borrow)
 
-        btn_return = QPushButton("Return Book (By Loan ID)")
+        btn_return = QPushButton("Return Book(s) (By Loan ID)")
         btn_return.clicked.connect(self.handle_return)
 
-        form.addRow("Book ID (to borrow):", self.loan_book_id)
+        form.addRow("Book ID(s) (to borrow):", self.loan_book_id)
         form.addRow(btn_borrow)
         form.addRow(QLabel(" --- OR --- "))
         form.addRow(btn_return)
@@ -176,25 +292,42 @@ class SmartLibraryApp(QMainWindow):
 
     def handle_borrow(self):
         try:
-            bid = int(self.loan_book_id.text())
-            # Use current logged in user ID
-            self.dao.create_loan(bid, self.current_user.id)
-            QMessageBox.information(self, "Success", "Book Borrowed! Due in 7 days.")
-            self.load_catalog()
-            self.refresh_dashboard_data()  # 🔥 NEW: Refresh Dashboard
-        except Exception as e:
+            book_ids = parse_ids(self.loan_book_id.text())
+        except ValueError as e:
             QMessageBox.critical(self, "Error", str(e))
+            return
+        if not book_ids:
+            return
+        # Use current logged in user ID; the whole list is borrowed in one transaction
+        pairs = [(bid, self.current_user.id) for bid in book_ids]
+        self.executor.submit(None, self.dao.create_loans, pairs, span="handle_borrow",
+                             on_result=lambda results: self.on_loans_changed(
+                                 results, "books borrowed (due in 7 days)", "book_id"),
+                             on_error=self.show_error)
 
     def handle_return(self):
-        lid, ok = QInputDialog.getText(self, "Return", "Enter Loan ID:")
+        lid, ok = QInputDialog.getText(self, "Return", "Enter Loan ID(s):")
         if ok and lid:
             try:
-                self.dao.return_loan(int(lid))
-                QMessageBox.information(self, "Success", "Book Returned.")
-                self.load_catalog()
-                self.refresh_dashboard_data()  # 🔥 NEW: Refresh Dashboard
-            except Exception as e:
+                loan_ids = parse_ids(lid)
+            except ValueError as e:
                 QMessageBox.critical(self, "Error", str(e))
+                return
+            self.executor.submit(None, self.dao.return_loans, loan_ids, span="handle_return",
+                                 on_result=lambda results: self.on_loans_changed(results, "books returned", "loan_id"),
+                                 on_error=self.show_error)
+
+    def on_loans_changed(self, results, label, key):
+        message = summarize_results(results, label, key)
+        if any(r["error"] is None for r in results):
+            QMessageBox.information(self, "Success", message)
+            self.load_catalog()
+            self.refresh_dashboard_data()  # 🔥 NEW: Refresh Dashboard
+        else:
+            QMessageBox.critical(self, "Error", message)
+
+    def show_error(self, error):
+        QMessageBox.critical(self, "Error", str(error))
 
     def create_admin_tab(self):
         # ... (Admin tab creation code remains the same)
@@ -217,19 +350,71 @@ class SmartLibraryApp(QMainWindow):
 
         box.setLayout(form)
         layout.addWidget(box)
+
+        import_box = QGroupBox("Bulk Import (CSV, JSONL or MARC)")
+        import_layout = QVBoxLayout()
+        self.import_btn = QPushButton("Import Books from File...")
+        self.import_btn.clicked.connect(self.handle_import_books)
+        import_layout.addWidget(self.import_btn)
+        import_box.setLayout(import_layout)
+        layout.addWidget(import_box)
+
+        metrics_box = QGroupBox("Performance Metrics")
+        metrics_layout = QVBoxLayout()
+        metrics_btn = QPushButton("Export Metrics (Prometheus)...")
+        metrics_btn.clicked.connect(self.handle_export_metrics)
+        metrics_layout.addWidget(metrics_btn)
+        metrics_box.setLayout(metrics_layout)
+        layout.addWidget(metrics_box)
+
         layout.addStretch()
         widget.setLayout(layout)
         return widget
 
+    def handle_import_books(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Import Books", "", "Book files (*.csv *.jsonl *.marc);;All files (*)")
+        if not path:
+            return
+        self.import_btn.setEnabled(False)
+        from smartlibrary_import import BookImporter  # only librarians who import pay for loading it
+        importer = BookImporter(self.dao)
+        self.executor.submit(None, importer.import_file, path, span="handle_import_books",
+                             on_result=self.on_books_imported, on_error=self.on_import_failed)
+
+    def handle_export_metrics(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Export Metrics", "smartlibrary.prom", "Prometheus text (*.prom *.txt)")
+        if not path:
+            return
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.dao.metrics_text())
+        slow = len(self.dao.metrics.slow_queries)
+        QMessageBox.information(self, "Metrics Exported", f"Metrics written to {path}.\n{slow} slow queries logged this session.")
+
+    def on_books_imported(self, report):
+        self.import_btn.setEnabled(True)
+        details = "".join(f"\nline {n}: {msg}" for n, msg in report.errors[:10])
+        QMessageBox.information(self, "Import Finished", f"{report}{details}")
+        self.load_catalog()
+        self.refresh_dashboard_data()
+
+    def on_import_failed(self, error):
+        self.import_btn.setEnabled(True)
+        self.show_error(error)
+
     def handle_add_book(self):
         try:
-            self.dao.create_book(self.new_title.text(), self.new_genre.text(), int(self.new_year.text()))
-            QMessageBox.information(self, "Success", "Book Added.")
-            self.load_catalog()
-            self.refresh_dashboard_data()  # 🔥 NEW: Refresh Dashboard
-            self.new_title.clear()
-        except Exception as e:
+            year = int(self.new_year.text())
+        except ValueError as e:
             QMessageBox.critical(self, "Error", str(e))
+            return
+        self.executor.submit(None, self.dao.create_book, self.new_title.text(), self.new_genre.text(), year,
+                             span="handle_add_book", on_result=self.on_book_added, on_error=self.show_error)
+
+    def on_book_added(self, book_id):
+        QMessageBox.information(self, "Success", "Book Added.")
+        self.load_catalog()
+        self.refresh_dashboard_data()  # 🔥 NEW: Refresh Dashboard
+        self.new_title.clear()
 
     def create_club_tab(self):
         # ... (Club tab creation code remains the same)
@@ -256,8 +441,11 @@ class SmartLibraryApp(QMainWindow):
         return widget
 
     def load_clubs(self):
-        # ... (load_clubs code remains the same)
-        clubs = self.dao.get_clubs_summary()
+        # Several clicks while a fetch is still queued share that one fetch
+        self.executor.submit("clubs", self.dao.get_clubs_summary, coalesce=True, span="load_clubs",
+                             on_result=self.show_clubs, on_error=self.show_error)
+
+    def show_clubs(self, clubs):
         self.club_table.setRowCount(len(clubs))
         for i, c in enumerate(clubs):
             self.club_table.setItem(i, 0, QTableWidgetItem(str(c['id'])))
@@ -270,11 +458,16 @@ class SmartLibraryApp(QMainWindow):
         cid, ok = QInputDialog.getText(self, "Join", "Enter Club ID to join:")
         if ok and cid:
             try:
-                self.dao.join_club(int(cid), self.current_user.id)
-                QMessageBox.information(self, "Success", "Joined Club!")
-                self.load_clubs()
-            except Exception as e:
+                club_id = int(cid)
+            except ValueError as e:
                 QMessageBox.critical(self, "Error", str(e))
+                return
+            self.executor.submit(None, self.dao.join_club, club_id, self.current_user.id, span="handle_join_club",
+                                 on_result=self.on_club_joined, on_error=self.show_error)
+
+    def on_club_joined(self, _):
+        QMessageBox.information(self, "Success", "Joined Club!")
+        self.load_clubs()
 
     def create_dashboard_tab(self):
         widget = QWidget()
@@ -300,6 +493,26 @@ class SmartLibraryApp(QMainWindow):
         # Text Summary
         self.summary_label.setStyleSheet("font-size: 14px; margin-top: 20px; color: #e0e1dd;")
         self.dashboard_layout.addWidget(self.summary_label)
+        self.recommendations_label = QLabel()
+        self.recommendations_label.setStyleSheet("font-size: 14px; margin-top: 10px; color: #e0e1dd;")
+        self.dashboard_layout.addWidget(self.recommendations_label)
+
+        # Trending: most borrowed today / this week / this month, optionally per genre
+        trending_controls = QHBoxLayout()
+        self.trending_window = QComboBox()
+        self.trending_window.addItems(["week", "day", "month"])
+        self.trending_genre = QComboBox()
+        self.trending_genre.addItem("All genres")
+        self.trending_window.currentTextChanged.connect(self.load_trending)
+        self.trending_genre.currentTextChanged.connect(self.load_trending)
+        trending_controls.addWidget(QLabel("Trending this"))
+        trending_controls.addWidget(self.trending_window)
+        trending_controls.addWidget(self.trending_genre)
+        trending_controls.addStretch()
+        self.dashboard_layout.addLayout(trending_controls)
+        self.trending_label = QLabel()
+        self.trending_label.setStyleSheet("font-size: 14px; color: #e0e1dd;")
+        self.dashboard_layout.addWidget(self.trending_label)
         self.dashboard_layout.addStretch()
 
         widget.setLayout(self.dashboard_layout)
@@ -307,32 +520,75 @@ class SmartLibraryApp(QMainWindow):
         return widget
 
     def refresh_dashboard_data(self):
-        try:
-            # Update Quick Stats
-            count_books = self.dao.get_count("SELECT COUNT(*) as count FROM Books")
-            count_members = self.dao.get_count("SELECT COUNT(*) as count FROM Users WHERE role_id=2")
-            count_loans = self.dao.get_count("SELECT COUNT(*) as count FROM Loans WHERE return_date IS NULL")
-
-            self.stat_widgets["Total Books"].setText(f"Total Books\n{count_books}")
-            self.stat_widgets["Members"].setText(f"Members\n{count_members}")
-            self.stat_widgets["Active Loans"].setText(f"Active Loans\n{count_loans}")
-
-            # Update Top Books
-            top_books_data = self.dao.get_top_books()
-            txt = "<h3>Top Borrowed Books</h3>"
-            if top_books_data:
-                for b in top_books_data:
-                    txt += f"• {b['title']} ({b['count']} times)<br>"
-            else:
-                txt += "<i>No loans recorded yet.</i>"
-
-            self.summary_label.setText(txt)
-
-        except Exception as e:
-            # Handle potential connection issues when refreshing
-            print(f"Error refreshing dashboard: {e}")
-            pass
+        if "dashboard" not in self._built_tabs:
+            return  # loads when first shown
+        # Refreshes requested while one is still queued collapse into it
+        # Failures are counted in ui_errors_total{handler="refresh_dashboard_data"}
+        self.executor.submit("dashboard", self.dao.get_dashboard_snapshot, coalesce=True, span="refresh_dashboard_data",
+                             on_result=self.show_dashboard,
+                             on_error=lambda e: print(f"Error refreshing dashboard: {e}"))
+        self.executor.submit("recommendations", self.dao.get_recommendations, self.current_user.id, coalesce=True,
+                             span="refresh_recommendations", on_result=self.show_recommendations,
+                             on_error=lambda e: print(f"Error loading recommendations: {e}"))
+        self.load_trending()
+
+    def load_trending(self, *_):
+        # A newer choice of window or genre supersedes a request still queued
+        window = self.trending_window.currentText()
+        genre = self.trending_genre.currentText()
+        genre = None if genre == "All genres" else genre
+        self.executor.submit("trending", self.dao.get_trending_books, window, 5, genre, span="refresh_trending",
+                             on_result=self.show_trending,
+                             on_error=lambda e: print(f"Error loading trending books: {e}"))
+
+    def show_dashboard(self, snapshot):
+        # Update Quick Stats (one round trip, served from the DAO's short-lived cache)
+        self.stat_widgets["Total Books"].setText(f"Total Books\n{snapshot['total_books']}")
+        self.stat_widgets["Members"].setText(f"Members\n{snapshot['members']}")
+        self.stat_widgets["Active Loans"].setText(f"Active Loans\n{snapshot['active_loans']}")
+
+        # Update Top Books
+        top_books_data = snapshot['top_books']
+        txt = "<h3>Top Borrowed Books</h3>"
+        if top_books_data:
+            for b in top_books_data:
+                txt += f"• {b['title']} ({b['count']} times)<br>"
+        else:
+            txt += "<i>No loans recorded yet.</i>"
+
+        self.summary_label.setText(txt)
 
+    def show_recommendations(self, books):
+        txt = "<h3>Recommended for You</h3>"
+        if books:
+            for b in books:
+                txt += f"• {b.title} ({b.genre})<br>"
+        else:
+            txt += "<i>Borrow a few books to get recommendations.</i>"
+        self.recommendations_label.setText(txt)
+
+    def show_trending(self, result):
+        ranked, genres = result
+        txt = ""
+        if ranked:
+            for book, count in ranked:
+                txt += f"• {book.title} (~{count} loans)<br>"
+        else:
+            txt += "<i>No loans in this period.</i>"
+        self.trending_label.setText(txt)
+
+        # Offer the genres seen so far without disturbing the current choice
+        known = {self.trending_genre.itemText(i) for i in range(self.trending_genre.count())}
+        self.trending_genre.blockSignals(True)
+        for genre in genres:
+            if genre not in known:
+                self.trending_genre.addItem(genre)
+        self.trending_genre.blockSignals(False)
+
+    def closeEvent(self, event):
+        self.executor.shutdown()
+        self.dao.close()
+        super().closeEvent(event)
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)